@@ -1,42 +1,42 @@
 import os
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, url_for, session, flash, g
-from dotenv import load_dotenv
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, g, jsonify
+from werkzeug.security import generate_password_hash
 import click
+import functools
 
-from db.core import get_db
+from db.core import get_db, close_db
 from db.schema import init_db
 from db import users as users_repo
 from db import games as games_repo
 from db import hands as hands_repo
+from db import meta as meta_repo
+from db import outbox as outbox_repo
+from db import archive as archive_repo
+from db.identity_cache import user_cache
+from db.transactions import DatabaseBusy, write_policy
+from db.group_commit import group_commit
+from db.tenants import TenantRegistry, parse_tenants
 
-from services.scores import compute_score
-from services.get_day_heatmap import get_day_heatmap
-from services.statistics import (
-    get_global_statistics,
-    get_player_statistics,
-    get_contract_statistics,
-    get_trump_statistics,
-    get_special_events_statistics,
-    get_player_vs_player_statistics,
-    get_player_taking_statistics,
-    get_score_distribution,
-    get_team_performance
-)
-from services.duo_ranking import get_duo_rankings
-from services.email_service import (
-	send_test_email,
-	send_account_activated_email,
-	send_email_update_confirmation,
-	send_password_reset_email,
-)
-
-from services.recaptcha_check import verify_recaptcha
+# Services used by individual routes or CLI commands (statistics, duo ranking, emails,
+# reCAPTCHA...) are imported where they are used, so that workers and CLI commands
+# only pay for what they run. See "flask startup-report".
+from services.password_hashing import PasswordHasher, HashPoolBusy
+from services.rate_limit import SlidingWindowLimiter
+from services.startup import StartupTimings
+from services.tenancy import TenantMiddleware, TenantSessionInterface, current_tenant
+from services.http_cache import conditional_get
+from services.fragment_cache import FragmentCacheExtension, fragment_store
+from services.assets import build_assets, load_manifest, asset_url, send_asset, compress_response, DIST_DIRNAME
 
 def create_app():
-	# Load environment variables from .env if present
-	load_dotenv()
+	timings = StartupTimings()
+	# Load environment variables from the .env next to this file, if present
+	env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+	if os.path.exists(env_path):
+		from dotenv import load_dotenv
+		load_dotenv(env_path)
+	timings.mark('dotenv')
 
 	app = Flask(__name__)
 	# In production, use a strong random secret and store securely
@@ -76,6 +76,26 @@ def create_app():
 			return bool(default)
 		return val.strip().lower() in ('1', 'true', 'yes', 'on')
 
+	# Multi-club: one SQLite file per club ("club1,club2" or "club1=/chemin/club1.db"); empty = single DATABASE
+	app.config['TENANTS'] = os.environ.get('TENANTS', '')
+	app.config['TENANT_DB_DIR'] = os.environ.get('TENANT_DB_DIR', os.path.join(app.root_path, 'data/clubs'))
+	if not os.path.isabs(app.config['TENANT_DB_DIR']):
+		app.config['TENANT_DB_DIR'] = os.path.join(app.root_path, app.config['TENANT_DB_DIR'])
+	# Club routing: 'prefix' (/club1/...) or 'subdomain' (club1.TENANT_BASE_DOMAIN)
+	app.config['TENANT_ROUTING'] = os.environ.get('TENANT_ROUTING', 'prefix').strip().lower()
+	app.config['TENANT_BASE_DOMAIN'] = os.environ.get('TENANT_BASE_DOMAIN', '')
+	app.config['TENANT_POOL_SIZE'] = _get_int_env('TENANT_POOL_SIZE', 4)
+	app.config['TENANT_IDLE_TIMEOUT'] = _get_float_env('TENANT_IDLE_TIMEOUT', 300.0)
+	# Concurrent writes: how long SQLite waits for the write lock (ms), then how many times a
+	# write is retried, after a random pause of up to SQLITE_WRITE_BACKOFF_MS doubling per retry
+	app.config['SQLITE_BUSY_TIMEOUT_MS'] = _get_int_env('SQLITE_BUSY_TIMEOUT_MS', 5000)
+	app.config['SQLITE_WRITE_ATTEMPTS'] = _get_int_env('SQLITE_WRITE_ATTEMPTS', 5)
+	app.config['SQLITE_WRITE_BACKOFF_MS'] = _get_float_env('SQLITE_WRITE_BACKOFF_MS', 20.0)
+	# Optional single writer thread per database, committing the writes of a short window together
+	app.config['SQLITE_GROUP_COMMIT'] = _get_bool_env('SQLITE_GROUP_COMMIT', False)
+	app.config['SQLITE_GROUP_COMMIT_WINDOW_MS'] = _get_float_env('SQLITE_GROUP_COMMIT_WINDOW_MS', 5.0)
+	app.config['SQLITE_GROUP_COMMIT_MAX_BATCH'] = _get_int_env('SQLITE_GROUP_COMMIT_MAX_BATCH', 64)
+
 	app.config['DUO_RANKING_ALPHA'] = _get_float_env('DUO_RANKING_ALPHA', 2.0)
 	app.config['DUO_RANKING_LAMBDA'] = _get_float_env('DUO_RANKING_LAMBDA', -0.1)
 	app.config['DUO_RANKING_K'] = _get_float_env('DUO_RANKING_K', 0.3)
@@ -88,16 +108,138 @@ def create_app():
 	app.config['RECAPTCHA_SECRET_KEY'] = os.environ.get('RECAPTCHA_SECRET_KEY', '')
 	app.config['RECAPTCHA_ID'] = os.environ.get('RECAPTCHA_ID', '')
 	app.config['RECAPTCHA_API_KEY'] = os.environ.get('RECAPTCHA_API_KEY', '')
+	# URL de l'API d'évaluation (vide = API Google, voir services.recaptcha_check.DEFAULT_ENDPOINT)
+	app.config['RECAPTCHA_ENDPOINT'] = os.environ.get('RECAPTCHA_ENDPOINT', '')
+	app.config['RECAPTCHA_CONNECT_TIMEOUT'] = _get_float_env('RECAPTCHA_CONNECT_TIMEOUT', 2.0)
+	app.config['RECAPTCHA_READ_TIMEOUT'] = _get_float_env('RECAPTCHA_READ_TIMEOUT', 3.0)
+	app.config['RECAPTCHA_FAILURE_THRESHOLD'] = _get_int_env('RECAPTCHA_FAILURE_THRESHOLD', 5)
+	app.config['RECAPTCHA_RESET_TIMEOUT'] = _get_float_env('RECAPTCHA_RESET_TIMEOUT', 30.0)
+	# Politique quand l'API est indisponible: true = inscription acceptée, false = refusée
+	app.config['RECAPTCHA_FAIL_OPEN'] = _get_bool_env('RECAPTCHA_FAIL_OPEN', True)
+	app.config['RECAPTCHA_MIN_SCORE'] = _get_float_env('RECAPTCHA_MIN_SCORE', 0.3)
+	# Pool de hachage des mots de passe (pbkdf2) et limitation des tentatives d'authentification
+	app.config['PASSWORD_HASH_WORKERS'] = _get_int_env('PASSWORD_HASH_WORKERS', 2)
+	app.config['PASSWORD_HASH_QUEUE'] = _get_int_env('PASSWORD_HASH_QUEUE', 8)
+	app.config['PASSWORD_HASH_TIMEOUT'] = _get_float_env('PASSWORD_HASH_TIMEOUT', 10.0)
+	app.config['PASSWORD_HASH_PROCESSES'] = _get_bool_env('PASSWORD_HASH_PROCESSES', False)
+	app.config['AUTH_RATE_LIMIT_WINDOW'] = _get_float_env('AUTH_RATE_LIMIT_WINDOW', 300.0)
+	app.config['AUTH_RATE_LIMIT_USER'] = _get_int_env('AUTH_RATE_LIMIT_USER', 5)
+	app.config['AUTH_RATE_LIMIT_IP'] = _get_int_env('AUTH_RATE_LIMIT_IP', 20)
+	# max-age (secondes) des pages publiques validées par ETag; 0 = revalidation systématique
+	app.config['HTTP_CACHE_MAX_AGE'] = _get_int_env('HTTP_CACHE_MAX_AGE', 0)
+	# Nombre maximal de fragments de templates conservés en mémoire (par processus)
+	app.config['FRAGMENT_CACHE_SIZE'] = _get_int_env('FRAGMENT_CACHE_SIZE', 256)
+	# Cache des identités utilisateurs (par processus): nombre d'entrées et durée de vie en secondes; 0 = désactivé
+	app.config['USER_CACHE_SIZE'] = _get_int_env('USER_CACHE_SIZE', 512)
+	app.config['USER_CACHE_TTL'] = _get_float_env('USER_CACHE_TTL', 60.0)
+	app.config['ADMIN_USERS_PER_PAGE'] = _get_int_env('ADMIN_USERS_PER_PAGE', 50)
+	# Game search page size and the duration (ms) above which a search is logged as slow
+	app.config['GAME_SEARCH_PER_PAGE'] = _get_int_env('GAME_SEARCH_PER_PAGE', 30)
+	app.config['GAME_SEARCH_SLOW_MS'] = _get_float_env('GAME_SEARCH_SLOW_MS', 200.0)
+	# Number of players (most games first) shown in the head-to-head heatmap of /statistiques
+	app.config['HEAD_TO_HEAD_MAX_PLAYERS'] = _get_int_env('HEAD_TO_HEAD_MAX_PLAYERS', 20)
+	# Win probability of ongoing games: simulated endings per estimate, and minimum number of
+	# past hands of each duo to simulate from the two duos' history instead of the whole club (0 = never)
+	app.config['WIN_PROBABILITY_SIMULATIONS'] = _get_int_env('WIN_PROBABILITY_SIMULATIONS', 5000)
+	app.config['WIN_PROBABILITY_MIN_SAMPLES'] = _get_int_env('WIN_PROBABILITY_MIN_SAMPLES', 30)
+	# Maximum number of hands accepted in one POST /games/<id>/hands.json (offline queue flush)
+	app.config['HANDS_BATCH_MAX'] = _get_int_env('HANDS_BATCH_MAX', 50)
+	# Width (points) of the buckets of the taker points histogram on /statistiques
+	app.config['STATS_HISTOGRAM_WIDTH'] = _get_int_env('STATS_HISTOGRAM_WIDTH', 10)
+	# First month (1-12) of the season used by /statistiques?window=season
+	app.config['STATS_SEASON_START_MONTH'] = _get_int_env('STATS_SEASON_START_MONTH', 9)
+	# Compression gzip des réponses HTML/JSON au-delà de COMPRESS_MIN_SIZE octets (0 = désactivée)
+	app.config['COMPRESS_MIN_SIZE'] = _get_int_env('COMPRESS_MIN_SIZE', 1024)
+	app.config['COMPRESS_LEVEL'] = _get_int_env('COMPRESS_LEVEL', 6)
+	# File d'envoi des emails: thread d'envoi dans chaque processus web (désactiver si "flask outbox run" tourne à part)
+	app.config['EMAIL_OUTBOX_WORKER'] = _get_bool_env('EMAIL_OUTBOX_WORKER', True)
+	app.config['EMAIL_OUTBOX_POLL_INTERVAL'] = _get_float_env('EMAIL_OUTBOX_POLL_INTERVAL', 5.0)
+	app.config['EMAIL_OUTBOX_BATCH_SIZE'] = _get_int_env('EMAIL_OUTBOX_BATCH_SIZE', 50)
+	app.config['EMAIL_OUTBOX_MAX_ATTEMPTS'] = _get_int_env('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+	app.config['EMAIL_OUTBOX_RETRY_BASE'] = _get_float_env('EMAIL_OUTBOX_RETRY_BASE', 60.0)
+	# Manifeste des ressources empreintées produit par "flask assets build"
+	app.config['ASSET_MANIFEST'] = load_manifest(app.static_folder)
+	# Budget (ms) du démarrage à froid (import + create_app) vérifié par "flask startup-report --check"
+	app.config['STARTUP_BUDGET_MS'] = _get_float_env('STARTUP_BUDGET_MS', 1000.0)
+	# Finished games untouched for this many days are moved to the archive by "flask archive run"
+	app.config['ARCHIVE_AFTER_DAYS'] = _get_int_env('ARCHIVE_AFTER_DAYS', 365)
+	timings.mark('config')
+
+	tenants = parse_tenants(app.config['TENANTS'], app.config['TENANT_DB_DIR'])
+	if tenants:
+		if app.config['TENANT_ROUTING'] not in ('prefix', 'subdomain'):
+			raise ValueError(f"TENANT_ROUTING invalide: {app.config['TENANT_ROUTING']!r} (prefix ou subdomain)")
+		registry = app.extensions['tenants'] = TenantRegistry(
+			tenants,
+			pool_size=app.config['TENANT_POOL_SIZE'],
+			idle_timeout=app.config['TENANT_IDLE_TIMEOUT'],
+		)
+		app.wsgi_app = TenantMiddleware(
+			app.wsgi_app, registry,
+			routing=app.config['TENANT_ROUTING'],
+			base_domain=app.config['TENANT_BASE_DOMAIN'],
+		)
+		if app.config['TENANT_ROUTING'] == 'prefix':
+			app.session_interface = TenantSessionInterface()
+
+	recaptcha_clients = {}
+
+	def get_recaptcha():
+		"""reCAPTCHA client, created on first use (keeps requests out of the startup path)."""
+		client = recaptcha_clients.get('client')
+		if client is None:
+			from services.recaptcha_check import RecaptchaClient, DEFAULT_ENDPOINT
+			client = recaptcha_clients.setdefault('client', RecaptchaClient(
+				app.config['RECAPTCHA_SITE_KEY'],
+				app.config['RECAPTCHA_API_KEY'],
+				app.config['RECAPTCHA_ID'],
+				endpoint=app.config['RECAPTCHA_ENDPOINT'] or DEFAULT_ENDPOINT,
+				connect_timeout=app.config['RECAPTCHA_CONNECT_TIMEOUT'],
+				read_timeout=app.config['RECAPTCHA_READ_TIMEOUT'],
+				failure_threshold=app.config['RECAPTCHA_FAILURE_THRESHOLD'],
+				reset_timeout=app.config['RECAPTCHA_RESET_TIMEOUT'],
+				fail_open=app.config['RECAPTCHA_FAIL_OPEN'],
+				min_score=app.config['RECAPTCHA_MIN_SCORE'],
+			))
+		return client
+
+	password_hasher = PasswordHasher(
+		max_workers=app.config['PASSWORD_HASH_WORKERS'],
+		max_queue=app.config['PASSWORD_HASH_QUEUE'],
+		timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+		use_processes=app.config['PASSWORD_HASH_PROCESSES'],
+	)
+	user_limiter = SlidingWindowLimiter(app.config['AUTH_RATE_LIMIT_USER'], app.config['AUTH_RATE_LIMIT_WINDOW'])
+	ip_limiter = SlidingWindowLimiter(app.config['AUTH_RATE_LIMIT_IP'], app.config['AUTH_RATE_LIMIT_WINDOW'])
+	timings.mark('services')
+
+	def auth_attempt_allowed(username=None) -> bool:
+		"""Count an authentication attempt against the IP (and username) windows, before any hash work."""
+		if not ip_limiter.hit(f"ip:{request.remote_addr or ''}"):
+			return False
+		if username is not None and not user_limiter.hit(f"user:{g.get('tenant') or ''}:{username.lower()}"):
+			return False
+		return True
 
 	@app.before_request
 	def before_request():
+		g.tenant = current_tenant()
+		# A session opened on another club's database must not be reused here
+		if session.get('user_id') and session.get('tenant') != g.tenant:
+			session.clear()
 		g.db = get_db(app)
+		if app.config['EMAIL_OUTBOX_WORKER']:
+			from services.email_outbox import start_outbox_worker
+			start_outbox_worker(app)
+
+	@app.after_request
+	def after_request(response):
+		if app.config['COMPRESS_MIN_SIZE'] > 0:
+			response = compress_response(response, app.config['COMPRESS_MIN_SIZE'], app.config['COMPRESS_LEVEL'])
+		return response
 
-	@app.teardown_request
-	def teardown_request(exception):
-		db = getattr(g, 'db', None)
-		if db is not None:
-			db.close()
+	# Closes the connection, or hands it back to the club's pool (requests and CLI commands)
+	app.teardown_appcontext(close_db)
 
 	def fr_datetime(value):
 		if not value:
@@ -113,12 +255,87 @@ def create_app():
 			return str(value).replace('T', ' ')
 
 	app.jinja_env.filters['fr_datetime'] = fr_datetime
+	app.jinja_env.add_extension(FragmentCacheExtension)
+	app.jinja_env.globals['asset_url'] = asset_url
+	fragment_store.max_entries = app.config['FRAGMENT_CACHE_SIZE']
+	user_cache.configure(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+	write_policy.configure(
+		app.config['SQLITE_BUSY_TIMEOUT_MS'],
+		app.config['SQLITE_WRITE_ATTEMPTS'],
+		app.config['SQLITE_WRITE_BACKOFF_MS'],
+	)
+	group_commit.configure(
+		app.config['SQLITE_GROUP_COMMIT'],
+		app.config['SQLITE_GROUP_COMMIT_WINDOW_MS'],
+		app.config['SQLITE_GROUP_COMMIT_MAX_BATCH'],
+	)
 	# Expose site key globally to Jinja templates
 	app.jinja_env.globals['RECAPTCHA_SITE_KEY'] = app.config['RECAPTCHA_SITE_KEY']
+	timings.mark('jinja')
+
+	@app.errorhandler(DatabaseBusy)
+	def database_busy(exc):
+		app.logger.warning("Écriture abandonnée, base occupée: %s", exc)
+		if request.path.endswith('.json') or request.is_json:
+			return jsonify({'errors': ['Serveur occupé, veuillez réessayer dans un instant.']}), 503, {'Retry-After': '1'}
+		flash('Serveur occupé, veuillez réessayer dans un instant.', 'warning')
+		return redirect(request.referrer or url_for('index'))
+
+	# ----- HTTP validators (cheap queries evaluated before the views) -----
+	def data_version_validator(*_args, **_kwargs):
+		version, _updated_at = meta_repo.get_data_version(g.db)
+		return (version,)
+
+	def index_validator():
+		version, _updated_at = meta_repo.get_data_version(g.db)
+		# The heatmap covers the current month
+		return (version, datetime.now().strftime('%Y-%m'))
+
+	def statistics_validator():
+		version, _updated_at = meta_repo.get_data_version(g.db)
+		# Relative windows (month, 3m, season...) move with the current month
+		return (version, request.args.get('window', ''), datetime.now().strftime('%Y-%m'))
+
+	def win_probability(game: dict):
+		"""Monte Carlo estimate for an ongoing game (None once finished or archived)."""
+		if game.get('state', 'en_cours') != 'en_cours' or game.get('archived_at'):
+			return None
+		from services.win_probability import win_probability_cache
+		data_version, _updated_at = meta_repo.get_data_version(g.db)
+		return win_probability_cache.get(
+			g.db,
+			game,
+			data_version,
+			simulations=app.config['WIN_PROBABILITY_SIMULATIONS'],
+			min_samples=app.config['WIN_PROBABILITY_MIN_SAMPLES'],
+		)
+
+	def histogram_validator():
+		version, _updated_at = meta_repo.get_data_version(g.db)
+		return (version, request.query_string, datetime.now().strftime('%Y-%m'))
+
+	def search_validator():
+		version, _updated_at = meta_repo.get_data_version(g.db)
+		# Results depend on the filters and the page cursor
+		return (version, request.query_string)
+
+	def game_validator(game_id: int):
+		row = games_repo.get_game_version(g.db, game_id)
+		if row is None:
+			return None
+		# updated_at has one-second resolution: only the per-game version tells apart two
+		# writes within the same second
+		return (game_id, row[0])
 
 	# ----- Routes -----
+	@app.route('/assets/<path:filename>')
+	def send_asset_file(filename: str):
+		return send_asset(os.path.join(app.static_folder, DIST_DIRNAME), filename)
+
 	@app.route('/')
+	@conditional_get(index_validator)
 	def index():
+		from services.get_day_heatmap import get_day_heatmap
 		return render_template('index.html', heatmap_data=get_day_heatmap(g.db))
 
 	@app.route('/login', methods=['GET', 'POST'])
@@ -130,14 +347,25 @@ def create_app():
 				flash('Identifiants invalides.', 'danger')
 				return render_template('login.html')
 
+			if not auth_attempt_allowed(username):
+				flash('Trop de tentatives de connexion, veuillez réessayer dans quelques minutes.', 'danger')
+				return render_template('login.html'), 429
+
 			row = users_repo.find_user_by_username(g.db, username)
-			if row and check_password_hash(row[2], password):
+			try:
+				password_ok = bool(row) and password_hasher.check(row[2], password)
+			except HashPoolBusy:
+				flash('Serveur occupé, veuillez réessayer dans un instant.', 'warning')
+				return render_template('login.html'), 503
+			if password_ok:
+				user_limiter.reset(f"user:{g.get('tenant') or ''}:{username.lower()}")
 				if(not(row[3])):
 					flash('Votre compte est en cours de validation', 'success')
 					return render_template('login.html')
 				session.permanent = True
 				session.clear()
 				session['user_id'] = row[0]
+				session['tenant'] = g.tenant
 				session['user'] = row[1]
 				session['is_admin'] = bool(row[4]) if len(row) > 4 else False
 				flash('Connexion réussie.', 'success')
@@ -168,7 +396,8 @@ def create_app():
 					# Build absolute URL
 					reset_url = url_for('reset_password', token=token, _external=True)
 					try:
-						send_password_reset_email(email, username=username, reset_url=reset_url)
+						from services.email_service import send_password_reset_email
+						send_password_reset_email(email, username=username, reset_url=reset_url, db=g.db)
 					except Exception:
 						pass
 				# else: silently do nothing to avoid leaking policy
@@ -203,7 +432,14 @@ def create_app():
 			if password != password_confirm:
 				flash('Les mots de passe ne correspondent pas.', 'danger')
 				return render_template('reset_password.html', token=token, username=username)
-			password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+			if not auth_attempt_allowed():
+				flash('Trop de tentatives, veuillez réessayer dans quelques minutes.', 'danger')
+				return render_template('reset_password.html', token=token, username=username), 429
+			try:
+				password_hash = password_hasher.generate(password)
+			except HashPoolBusy:
+				flash('Serveur occupé, veuillez réessayer dans un instant.', 'warning')
+				return render_template('reset_password.html', token=token, username=username), 503
 			users_repo.update_user_password_hash(g.db, user_id, password_hash)
 			users_repo.clear_reset_token(g.db, user_id)
 			flash('Votre mot de passe a été mis à jour. Vous pouvez vous connecter.', 'success')
@@ -218,10 +454,17 @@ def create_app():
 			password = request.form.get('password', '').strip()
 			password_confirm = request.form.get('password_confirm', '').strip()
 			recaptacha_token = request.form.get('recaptcha_token', '')
+
+			if not auth_attempt_allowed():
+				flash('Trop de tentatives, veuillez réessayer dans quelques minutes.', 'danger')
+				return render_template('register.html'), 429
 			
-			resp = verify_recaptcha(app.config['RECAPTCHA_SITE_KEY'], app.config['RECAPTCHA_API_KEY'], app.config['RECAPTCHA_ID'], recaptacha_token, "REGISTER")
-			if resp["riskAnalysis"]["score"] <= 0.3:
-				flash('Bip Bop, tu es probablement un BOT', 'danger')
+			verdict = get_recaptcha().verify(recaptacha_token, "REGISTER")
+			if not verdict.allowed:
+				if verdict.reason == 'unavailable':
+					flash('Vérification anti-robot indisponible, veuillez réessayer plus tard.', 'warning')
+				else:
+					flash('Bip Bop, tu es probablement un BOT', 'danger')
 				return render_template('register.html')
 			
 			if not email or not username or not password:
@@ -250,7 +493,11 @@ def create_app():
 				flash('Un compte utilise déjà cet email.', 'danger')
 				return render_template('register.html')
 			
-			password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+			try:
+				password_hash = password_hasher.generate(password)
+			except HashPoolBusy:
+				flash('Serveur occupé, veuillez réessayer dans un instant.', 'warning')
+				return render_template('register.html'), 503
 			now = datetime.utcnow().isoformat(timespec='seconds')
 			user_id = users_repo.create_inactive_user(g.db, username, password_hash, now, email=email)
 			
@@ -282,25 +529,70 @@ def create_app():
 		return True
 
 	@app.route('/games')
+	@conditional_get(data_version_validator)
 	def games_list():
 		rows = games_repo.list_games(g.db)
-		games = [
-			{
-				'id': r[0],
-				'created_at': r[1],
-				'updated_at': r[2],
-				'state': r[3],
-				'score_a': r[4],
-				'score_b': r[5],
-				'target_points': r[6],
-				'team_a': r[7] or '-',
-				'team_b': r[8] or '-',
-			}
-			for r in rows
-		]
+		games = [game_summary(r) for r in rows]
 		return render_template('games.html', games=games)
 
+	def game_summary(r):
+		return {
+			'id': r[0],
+			'created_at': r[1],
+			'updated_at': r[2],
+			'state': r[3],
+			'score_a': r[4],
+			'score_b': r[5],
+			'target_points': r[6],
+			'team_a': r[7] or '-',
+			'team_b': r[8] or '-',
+		}
+
+	def run_game_search():
+		from services.game_search import parse_filters, run_search
+		filters, errors = parse_filters(request.args)
+		result = run_search(
+			g.db, filters, max(1, app.config['GAME_SEARCH_PER_PAGE']),
+			cursor=request.args.get('after'), slow_ms=app.config['GAME_SEARCH_SLOW_MS'],
+		)
+		if result['slow']:
+			app.logger.warning("Recherche de parties lente (%.1f ms): %s", result['elapsed_ms'], request.query_string.decode('utf-8', 'replace'))
+		return filters, errors, result
+
+	@app.route('/games/search')
+	@conditional_get(search_validator)
+	def games_search():
+		filters, errors, result = run_game_search()
+		for error in errors:
+			flash(error, 'warning')
+		next_args = request.args.to_dict(flat=False)
+		next_args['after'] = result['next_cursor']
+		return render_template(
+			'games_search.html',
+			games=[game_summary(r) for r in result['rows']],
+			filters=filters,
+			players=users_repo.get_active_users(g.db),
+			states=('en_cours', 'terminee', 'annulee'),
+			elapsed_ms=result['elapsed_ms'],
+			next_url=url_for('games_search', **next_args) if result['next_cursor'] else None,
+			first_url=url_for('games_search', **{k: v for k, v in request.args.to_dict(flat=False).items() if k != 'after'}),
+			is_first_page=not request.args.get('after'),
+		)
+
+	@app.route('/games/search.json')
+	@conditional_get(search_validator)
+	def games_search_json():
+		_filters, errors, result = run_game_search()
+		if errors:
+			return jsonify({'errors': errors}), 400
+		return jsonify({
+			'games': [game_summary(r) for r in result['rows']],
+			'next_cursor': result['next_cursor'],
+			'elapsed_ms': result['elapsed_ms'],
+		})
+
 	@app.route('/games/<int:game_id>', methods=['GET', 'POST'])
+	@conditional_get(game_validator)
 	def game_detail(game_id: int):
 		game_row = games_repo.load_game_basics(g.db, game_id)
 		if not game_row:
@@ -315,11 +607,16 @@ def create_app():
 			'score_a': game_row[5],
 			'score_b': game_row[6],
 			'target_points': game_row[7],
+			'archived_at': game_row[8],
+			'version': game_row[9],
 		}
 		players = games_repo.load_players(g.db, game_id)
 		team_a = [p for p in players if p[2] == 'A']
 		team_b = [p for p in players if p[2] == 'B']
-		hands = hands_repo.list_hands(g.db, game_id)
+		if game['archived_at']:
+			hands = archive_repo.list_archived_hands(g.db, game_id)
+		else:
+			hands = hands_repo.list_hands(g.db, game_id)
 
 		if request.method == 'POST':
 			if not login_required():
@@ -331,98 +628,17 @@ def create_app():
 			if not games_repo.is_participant(g.db, game_id, user_id):
 				flash("Seuls les joueurs de la partie peuvent ajouter des manches.", 'danger')
 				return redirect(url_for('game_detail', game_id=game_id))
+			from services.hand_entry import InvalidHand, build_hand, form_fields
 			try:
-				taker_user_id = int(request.form.get('taker_user_id') or 0) or None
-				pre_score_a = int(request.form.get('score_team_a') or 0)
-				pre_score_b = int(request.form.get('score_team_b') or 0)
-			except ValueError:
-				flash('Scores invalides.', 'danger')
+				hand = build_hand(form_fields(request.form), players)
+			except InvalidHand as exc:
+				flash(str(exc), exc.category)
 				return redirect(url_for('game_detail', game_id=game_id))
-			contract_raw = (request.form.get('contract') or '').strip()
-			trump = (request.form.get('trump') or '').strip() or None
-			coinche = 1 if (request.form.get('coinche') == 'on') else 0
-			surcoinche = 1 if (request.form.get('surcoinche') == 'on') else 0
-			try:
-				belote_a = int(request.form.get('belote_a') or 0)
-				belote_b = int(request.form.get('belote_b') or 0)
-			except ValueError:
-				flash('Belotes invalides.', 'danger')
-				return redirect(url_for('game_detail', game_id=game_id))
-			general = 1 if (request.form.get('general') == 'on') else 0
-			special_contracts = {'Capot', 'Générale'}
-			contract = None
-			if contract_raw:
-				if contract_raw in special_contracts:
-					contract = contract_raw
-				else:
-					try:
-						c_val = int(contract_raw)
-						if c_val < 80 or c_val > 180 or (c_val % 10 != 0):
-							raise ValueError()
-						contract = str(c_val)
-					except ValueError:
-						flash('Contrat invalide: choisissez un nombre entre 80 et 180 (pas de 10) ou un contrat spécial.', 'danger')
-						return redirect(url_for('game_detail', game_id=game_id))
-			trump_norm = (trump or '').strip().lower()
-			if trump_norm == 'sans atout':
-				if belote_a > 0 or belote_b > 0:
-					flash('En Sans atout, aucune belote n\'est autorisée.', 'warning')
-					return redirect(url_for('game_detail', game_id=game_id))
-			elif trump_norm == 'tout atout':
-				if (belote_a + belote_b) > 4:
-					flash('En Tout atout, il ne peut y avoir que 4 belotes au total (cumulé A+B).', 'warning')
-					return redirect(url_for('game_detail', game_id=game_id))
-			else:
-				if (belote_a + belote_b) > 1:
-					flash('Avec un atout couleur, une seule belote au total (A+B) est autorisée.', 'warning')
-					return redirect(url_for('game_detail', game_id=game_id))
-			if taker_user_id and not games_repo.is_participant(g.db, game_id, taker_user_id):
-				flash("Le preneur doit être un joueur de la partie.", 'danger')
-				return redirect(url_for('game_detail', game_id=game_id))
-			taker_team = None
-			if taker_user_id:
-				for p in players:
-					if p[0] == taker_user_id:
-						taker_team = p[2]
-						break
-			if not contract:
-				flash('Veuillez choisir un contrat.', 'warning')
-				return redirect(url_for('game_detail', game_id=game_id))
-			if not taker_team:
-				flash('Veuillez choisir un preneur.', 'warning')
-				return redirect(url_for('game_detail', game_id=game_id))
-			computed_scores = compute_score({
-				"A": {
-					"pre_score": pre_score_a,
-					"belote": belote_a
-				},
-				"B": {
-					"pre_score": pre_score_b,
-					"belote": belote_b
-				},
-				"coinche": coinche,
-				"surcoinche": surcoinche,
-				"general": general,
-				"taker_team": taker_team,
-				"contract": contract,
-				"trump": trump
-			})
-			score_a = int(computed_scores.get("A", 0))
-			score_b = int(computed_scores.get("B", 0))
-			capot_team = None
-			if pre_score_a == 162 and pre_score_b == 0:
-				capot_team = 'A'
-			elif pre_score_b == 162 and pre_score_a == 0:
-				capot_team = 'B'
-
-			number = hands_repo.next_hand_number(g.db, game_id)
+
 			now = datetime.utcnow().isoformat(timespec='seconds')
-			hands_repo.insert_hand(
-				g.db, game_id, number, taker_user_id, contract, trump,
-				score_a, score_b, pre_score_a, pre_score_b,
-				coinche, surcoinche, capot_team, belote_a, belote_b, general, now
-			)
-			games_repo.recompute_totals_and_update_game(g.db, game_id, game['target_points'], now)
+			if hands_repo.add_hand(g.db, game_id, game['target_points'], hand, now) is None:
+				flash("La partie est déjà terminée.", 'warning')
+				return redirect(url_for('game_detail', game_id=game_id))
 			flash('Manche ajoutée.', 'success')
 			return redirect(url_for('game_detail', game_id=game_id))
 
@@ -434,11 +650,62 @@ def create_app():
 			team_a=team_a,
 			team_b=team_b,
 			hands=hands,
-			can_add_hand=(user_id and game['state'] == 'en_cours' and is_participant),
+			win_probability=win_probability(game),
+			can_add_hand=bool(user_id and game['state'] == 'en_cours' and is_participant),
 			is_participant=is_participant,
 			players=players,
 		)
 
+	@app.route('/games/<int:game_id>/scores.json')
+	@conditional_get(game_validator)
+	def game_score_series(game_id: int):
+		"""Cumulative scores per hand for the progression chart (compact parallel arrays)."""
+		game_row = games_repo.load_game_basics(g.db, game_id)
+		if not game_row:
+			return jsonify({'error': 'Partie introuvable.'}), 404
+		if game_row[8]:
+			numbers, team_a, team_b = archive_repo.archived_cumulative_scores(g.db, game_id)
+		else:
+			numbers, team_a, team_b = hands_repo.cumulative_scores(g.db, game_id)
+		return jsonify({'hands': numbers, 'a': team_a, 'b': team_b})
+
+	@app.route('/games/<int:game_id>/hands.json', methods=['POST'])
+	def submit_hands(game_id: int):
+		"""Batch of hands entered offline: {"hands": [{"key", <hand form fields>}, ...]}.
+
+		Each hand carries a client-generated key; resending a batch (lost response, flaky
+		network) never records a hand twice. Valid hands are inserted in one transaction and
+		the game totals updated once. Answers {"results": {key: {"status", ...}}, "game"}.
+		"""
+		user_id = session.get('user_id')
+		if not user_id:
+			return jsonify({'error': 'Veuillez vous connecter pour continuer.'}), 401
+		game_row = games_repo.load_game_basics(g.db, game_id)
+		if not game_row:
+			return jsonify({'error': 'Partie introuvable.'}), 404
+		if not games_repo.is_participant(g.db, game_id, user_id):
+			return jsonify({'error': 'Seuls les joueurs de la partie peuvent ajouter des manches.'}), 403
+		if game_row[8]:
+			return jsonify({'error': 'Partie archivée : lecture seule.'}), 409
+		payload = request.get_json(silent=True)
+		from services.hand_entry import InvalidHand, build_batch
+		try:
+			hands, results = build_batch(
+				payload.get('hands') if isinstance(payload, dict) else None,
+				games_repo.load_players(g.db, game_id),
+				app.config['HANDS_BATCH_MAX'],
+			)
+		except InvalidHand as exc:
+			return jsonify({'error': str(exc)}), 400
+		if hands:
+			now = datetime.utcnow().isoformat(timespec='seconds')
+			results.update(hands_repo.insert_hands(g.db, game_id, game_row[7], hands, now))
+		game_row = games_repo.load_game_basics(g.db, game_id)
+		return jsonify({
+			'results': results,
+			'game': {'state': game_row[4], 'score_a': game_row[5], 'score_b': game_row[6], 'target_points': game_row[7]},
+		})
+
 	@app.route('/games/<int:game_id>/hands/<int:hand_id>/delete', methods=['POST'])
 	def delete_hand(game_id: int, hand_id: int):
 		if not session.get('user_id'):
@@ -467,6 +734,10 @@ def create_app():
 		if not games_repo.is_participant(g.db, game_id, user_id):
 			flash("Seuls les membres de la partie peuvent modifier l'objectif.", 'danger')
 			return redirect(url_for('game_detail', game_id=game_id))
+		game_row = games_repo.load_game_basics(g.db, game_id)
+		if game_row and game_row[8]:
+			flash('Partie archivée : lecture seule.', 'warning')
+			return redirect(url_for('game_detail', game_id=game_id))
 		
 		try:
 			new_target = int(request.form.get('target_points', 1000))
@@ -501,90 +772,25 @@ def create_app():
 		if not game_row:
 			flash('Partie introuvable.', 'warning')
 			return redirect(url_for('games_list'))
+		if game_row[8]:
+			flash('Partie archivée : lecture seule.', 'warning')
+			return redirect(url_for('game_detail', game_id=game_id))
 		hand = hands_repo.get_hand(g.db, hand_id)
 		if not hand or hand[1] != game_id:
 			flash('Manche introuvable.', 'warning')
 			return redirect(url_for('game_detail', game_id=game_id))
 		players = games_repo.load_players(g.db, game_id)
 		if request.method == 'POST':
+			from services.hand_entry import InvalidHand, build_hand, form_fields
 			try:
-				taker_user_id = int(request.form.get('taker_user_id') or 0) or None
-				pre_score_a = int(request.form.get('score_team_a') or 0)
-				pre_score_b = int(request.form.get('score_team_b') or 0)
-			except ValueError:
-				flash('Scores invalides.', 'danger')
-				return redirect(url_for('edit_hand', game_id=game_id, hand_id=hand_id))
-			contract_raw = (request.form.get('contract') or '').strip()
-			trump = (request.form.get('trump') or '').strip() or None
-			coinche = 1 if (request.form.get('coinche') == 'on') else 0
-			surcoinche = 1 if (request.form.get('surcoinche') == 'on') else 0
-			try:
-				belote_a = int(request.form.get('belote_a') or 0)
-				belote_b = int(request.form.get('belote_b') or 0)
-			except ValueError:
-				flash('Belotes invalides.', 'danger')
-				return redirect(url_for('edit_hand', game_id=game_id, hand_id=hand_id))
-			general = 1 if (request.form.get('general') == 'on') else 0
-			special_contracts = {'Capot', 'Générale'}
-			contract = None
-			if contract_raw:
-				if contract_raw in special_contracts:
-					contract = contract_raw
-				else:
-					try:
-						c_val = int(contract_raw)
-						if c_val < 80 or c_val > 180 or (c_val % 10 != 0):
-							raise ValueError()
-						contract = str(c_val)
-					except ValueError:
-						flash('Contrat invalide: choisissez un nombre entre 80 et 180 (pas de 10) ou un contrat spécial.', 'danger')
-						return redirect(url_for('edit_hand', game_id=game_id, hand_id=hand_id))
-			trump_norm = (trump or '').strip().lower()
-			if trump_norm == 'sans atout':
-				if belote_a > 0 or belote_b > 0:
-					flash('En Sans atout, aucune belote n\'est autorisée.', 'warning')
-					return redirect(url_for('edit_hand', game_id=game_id, hand_id=hand_id))
-			elif trump_norm == 'tout atout':
-				if (belote_a + belote_b) > 4:
-					flash('En Tout atout, il ne peut y avoir que 4 belotes au total (cumulé A+B).', 'warning')
-					return redirect(url_for('edit_hand', game_id=game_id, hand_id=hand_id))
-			else:
-				if (belote_a + belote_b) > 1:
-					flash('Avec un atout couleur, une seule belote au total (A+B) est autorisée.', 'warning')
-					return redirect(url_for('edit_hand', game_id=game_id, hand_id=hand_id))
-			taker_team = None
-			if taker_user_id:
-				for p in players:
-					if p[0] == taker_user_id:
-						taker_team = p[2]
-						break
-			if not contract:
-				flash('Veuillez choisir un contrat.', 'warning')
-				return redirect(url_for('edit_hand', game_id=game_id, hand_id=hand_id))
-			if not taker_team:
-				flash('Veuillez choisir un preneur.', 'warning')
+				edited = build_hand(form_fields(request.form), players)
+			except InvalidHand as exc:
+				flash(str(exc), exc.category)
 				return redirect(url_for('edit_hand', game_id=game_id, hand_id=hand_id))
-			computed = compute_score({
-				"A": {"pre_score": pre_score_a, "belote": belote_a},
-				"B": {"pre_score": pre_score_b, "belote": belote_b},
-				"coinche": coinche,
-				"surcoinche": surcoinche,
-				"general": general,
-				"taker_team": taker_team,
-				"contract": contract,
-				"trump": trump,
-			})
-			score_a = int(computed.get("A", 0))
-			score_b = int(computed.get("B", 0))
-			capot_team = None
-			if pre_score_a == 162 and pre_score_b == 0:
-				capot_team = 'A'
-			elif pre_score_b == 162 and pre_score_a == 0:
-				capot_team = 'B'
 			hands_repo.update_hand(
-				g.db, hand_id, taker_user_id, contract, trump,
-				score_a, score_b, pre_score_a, pre_score_b,
-				coinche, surcoinche, capot_team, belote_a, belote_b, general
+				g.db, hand_id, edited['taker_user_id'], edited['contract'], edited['trump'],
+				edited['score_a'], edited['score_b'], edited['pre_a'], edited['pre_b'],
+				edited['coinche'], edited['surcoinche'], edited['capot_team'], edited['belote_a'], edited['belote_b'], edited['general']
 			)
 			now = datetime.utcnow().isoformat(timespec='seconds')
 			games_repo.recompute_totals_and_update_game(g.db, game_id, game_row[7], now)
@@ -658,9 +864,10 @@ def create_app():
 				success = users_repo.update_user_email(g.db, user_id, new_email)
 				if success:
 					flash('Adresse email mise à jour.', 'success')
-					# Send confirmation email to the new address (best-effort)
+					# Queue confirmation email to the new address (best-effort)
 					try:
-						send_email_update_confirmation(new_email, username=username, old_email=current_email)
+						from services.email_service import send_email_update_confirmation
+						send_email_update_confirmation(new_email, username=username, old_email=current_email, db=g.db)
 					except Exception:
 						pass
 				else:
@@ -698,9 +905,12 @@ def create_app():
 				'target_points': r[5],
 				'team_a': r[6] or '-',
 				'team_b': r[7] or '-',
+				'version': r[8],
 			}
 			for r in rows
 		]
+		for game in ongoing:
+			game['win_probability'] = win_probability(game)
 		from services.statistics import get_player_statistics, get_player_vs_player_statistics, get_player_taking_statistics
 		player_stats = get_player_statistics(g.db)
 		personal_stats = get_player_vs_player_statistics(g.db, user_id)
@@ -739,6 +949,7 @@ def create_app():
 			flash("Aucune adresse email définie pour votre compte.", 'warning')
 			return redirect(url_for('profile'))
 		try:
+			from services.email_service import send_test_email
 			send_test_email(email, username=username)
 			flash("Email de test envoyé !", 'success')
 		except Exception as e:
@@ -746,15 +957,39 @@ def create_app():
 		return redirect(url_for('profile'))
 
 	@app.route('/statistiques')
+	@conditional_get(statistics_validator)
 	def statistics():
-		global_stats = get_global_statistics(g.db)
-		player_stats = get_player_statistics(g.db)
-		contract_stats = get_contract_statistics(g.db)
-		trump_stats = get_trump_statistics(g.db)
-		special_events = get_special_events_statistics(g.db)
-		taking_stats = get_player_taking_statistics(g.db)
-		score_dist = get_score_distribution(g.db)
-		team_perf = get_team_performance(g.db)
+		from services.statistics import (
+			WINDOW_CHOICES,
+			parse_window,
+			get_global_statistics,
+			get_player_statistics,
+			get_contract_statistics,
+			get_trump_statistics,
+			get_special_events_statistics,
+			get_player_taking_statistics,
+			get_score_distribution,
+			get_team_performance,
+		)
+		from services.duo_ranking import get_duo_rankings
+		from services.head_to_head import head_to_head_cache, player_view, heatmap
+		data_version, _updated_at = meta_repo.get_data_version(g.db)
+		window_arg = request.args.get('window', '')
+		try:
+			window = parse_window(window_arg, season_start_month=app.config['STATS_SEASON_START_MONTH'])
+		except ValueError:
+			flash('Période invalide, statistiques affichées depuis toujours.', 'warning')
+			window_arg, window = '', None
+		# Cache key of the windowed fragments: the resolved months, not the raw argument
+		window_key = '..'.join(window) if window else 'all'
+		global_stats = get_global_statistics(g.db, window)
+		player_stats = get_player_statistics(g.db, window)
+		contract_stats = get_contract_statistics(g.db, window)
+		trump_stats = get_trump_statistics(g.db, window)
+		special_events = get_special_events_statistics(g.db, window)
+		taking_stats = get_player_taking_statistics(g.db, window)
+		score_dist = get_score_distribution(g.db, window, width=app.config['STATS_HISTOGRAM_WIDTH'])
+		team_perf = get_team_performance(g.db, window)
 		duo_rankings = get_duo_rankings(
 			g.db,
 			alpha=app.config['DUO_RANKING_ALPHA'],
@@ -766,12 +1001,19 @@ def create_app():
 			limit=app.config['DUO_RANKING_LIMIT'],
 		)
 		
+		# Every pair of players in one pass, reused until the data changes
+		matchups = head_to_head_cache.get(g.db, data_version)
 		personal_stats = None
 		if session.get('user_id'):
-			personal_stats = get_player_vs_player_statistics(g.db, session.get('user_id'))
+			personal_stats = player_view(matchups, session.get('user_id'))
 		
 		return render_template(
 			'statistics.html',
+			data_version=data_version,
+			window=window,
+			window_arg=window_arg,
+			window_key=window_key,
+			window_choices=WINDOW_CHOICES,
 			global_stats=global_stats,
 			player_stats=player_stats,
 			contract_stats=contract_stats,
@@ -782,9 +1024,24 @@ def create_app():
 			team_perf=team_perf,
 			duo_rankings=duo_rankings,
 			duo_show_raw=app.config['DUO_RANKING_SHOW_RAW'],
+			head_to_head=heatmap(matchups, app.config['HEAD_TO_HEAD_MAX_PLAYERS']),
 			personal_stats=personal_stats
 		)
 
+	@app.route('/statistiques/histogram.json')
+	@conditional_get(histogram_validator)
+	def statistics_histogram():
+		"""Taker points histogram for Chart.js: ?by=taker|trump|contract, width=, window= as on /statistiques."""
+		from services.statistics import parse_window
+		from services.histograms import taker_points_histogram
+		by = request.args.get('by') or None
+		width = request.args.get('width', app.config['STATS_HISTOGRAM_WIDTH'], type=int)
+		try:
+			window = parse_window(request.args.get('window', ''), season_start_month=app.config['STATS_SEASON_START_MONTH'])
+			return jsonify(taker_points_histogram(g.db, width=width or 1, by=by, window=window))
+		except ValueError as exc:
+			return jsonify({'errors': [str(exc)]}), 400
+
 	@app.route('/calcul-score')
 	def score_details():
 		class DuoCfg:
@@ -809,8 +1066,59 @@ def create_app():
 	def admin_panel():
 		if not admin_required():
 			return redirect(url_for('index'))
-		users = users_repo.list_all_users(g.db)
-		return render_template('admin.html', users=users)
+		search = (request.args.get('q') or '').strip()
+		per_page = max(1, app.config['ADMIN_USERS_PER_PAGE'])
+		total_users, pending_users, matching_users = users_repo.count_users(g.db, search or None)
+		page_count = max(1, -(-matching_users // per_page))
+		page = min(max(1, request.args.get('page', 1, type=int)), page_count)
+		users = users_repo.list_users_page(g.db, search or None, limit=per_page, offset=(page - 1) * per_page)
+		return render_template(
+			'admin.html',
+			users=users,
+			search=search,
+			page=page,
+			page_count=page_count,
+			total_users=total_users,
+			pending_users=pending_users,
+			matching_users=matching_users,
+			outbox_counts=outbox_repo.count_by_status(g.db),
+			outbox_recent=outbox_repo.list_recent_emails(g.db, limit=20),
+		)
+
+	@app.route('/admin/outbox/retry', methods=['POST'])
+	def retry_outbox():
+		if not admin_required():
+			return redirect(url_for('index'))
+		count = outbox_repo.retry_failed_emails(g.db, datetime.utcnow().isoformat(timespec='seconds'))
+		flash(f"{count} email(s) remis en file d'envoi.", 'info')
+		return redirect(url_for('admin_panel'))
+
+	@app.route('/admin/metrics')
+	def admin_metrics():
+		if not admin_required():
+			return redirect(url_for('index'))
+		from services.game_search import search_timings
+		from services.head_to_head import head_to_head_cache
+		from services.win_probability import win_probability_cache
+		from db.projections import status as projections_status
+		return jsonify({
+			'fragment_cache': fragment_store.stats(),
+			'user_cache': user_cache.stats(),
+			'recaptcha': recaptcha_clients['client'].stats() if 'client' in recaptcha_clients else None,
+			'password_hashing': password_hasher.stats(),
+			'auth_rate_limit': {'user': user_limiter.stats(), 'ip': ip_limiter.stats()},
+			'tenants': app.extensions['tenants'].stats() if 'tenants' in app.extensions else None,
+			'game_search': search_timings.stats(),
+			'head_to_head': head_to_head_cache.stats(),
+			'win_probability': win_probability_cache.stats(),
+			'writes': write_policy.stats(),
+			'group_commit': group_commit.stats(),
+			'events': projections_status(g.db),
+		})
+
+	def admin_panel_url():
+		"""Admin panel URL keeping the search and page the action was submitted from."""
+		return url_for('admin_panel', q=request.args.get('q') or None, page=request.args.get('page', type=int))
 
 	@app.route('/admin/toggle_user/<int:user_id>', methods=['POST'])
 	def toggle_user(user_id: int):
@@ -828,19 +1136,20 @@ def create_app():
 			old_active = int(u[3]) if u[3] is not None else None
 		success = users_repo.toggle_user_status(g.db, user_id)
 		if success:
-			# If user transitioned to active, attempt to send activation email (non-blocking)
+			# If user transitioned to active, queue the activation email (sent in background)
 			new_active = None
 			if old_active is not None:
 				new_active = 0 if old_active == 1 else 1
 			if new_active == 1 and email:
 				try:
-					send_account_activated_email(email, username=username)
+					from services.email_service import send_account_activated_email
+					send_account_activated_email(email, username=username, db=g.db)
 				except Exception:
 					pass
 			flash('Statut utilisateur modifié.', 'success')
 		else:
 			flash('Erreur lors de la modification.', 'danger')
-		return redirect(url_for('admin_panel'))
+		return redirect(admin_panel_url())
 
 	@app.route('/admin/delete_user/<int:user_id>', methods=['POST'])
 	def delete_user(user_id: int):
@@ -849,12 +1158,12 @@ def create_app():
 			return redirect(url_for('index'))
 		if session.get('user_id') == user_id:
 			flash("Vous ne pouvez pas supprimer votre propre compte depuis l'admin.", 'warning')
-			return redirect(url_for('admin_panel'))
+			return redirect(admin_panel_url())
 		# Ensure user exists
 		u = users_repo.find_user_by_id(g.db, user_id)
 		if not u:
 			flash("Utilisateur introuvable.", 'warning')
-			return redirect(url_for('admin_panel'))
+			return redirect(admin_panel_url())
 		# Try deletion with referential checks
 		ok = users_repo.delete_user_if_no_references(g.db, user_id)
 		if ok:
@@ -862,7 +1171,7 @@ def create_app():
 		else:
 			flash("Impossible de supprimer cet utilisateur car il est référencé dans des parties ou des manches.", 'danger')
 			# TODO
-		return redirect(url_for('admin_panel'))
+		return redirect(admin_panel_url())
 
 	@app.route('/admin/delete_game/<int:game_id>', methods=['POST'])
 	def delete_game(game_id: int):
@@ -874,7 +1183,10 @@ def create_app():
 			flash('Partie introuvable.', 'warning')
 			return redirect(url_for('games_list'))
 		
-		success = games_repo.delete_game(g.db, game_id)
+		if game_row[8]:
+			success = archive_repo.delete_archived_game(g.db, game_id)
+		else:
+			success = games_repo.delete_game(g.db, game_id)
 		if success:
 			flash('Partie supprimée avec succès.', 'success')
 		else:
@@ -882,22 +1194,453 @@ def create_app():
 		
 		return redirect(url_for('games_list'))
 
+	def club_command(f):
+		"""Add --club/--all-clubs to a CLI command, which then runs once per selected club."""
+		@click.option('--club', default=None, help='Club visé (multi-club)')
+		@click.option('--all-clubs', is_flag=True, help='Exécute la commande pour chaque club')
+		@functools.wraps(f)
+		def wrapper(*args, club=None, all_clubs=False, **kwargs):
+			registry = app.extensions.get('tenants')
+			if registry is None:
+				if club or all_clubs:
+					raise click.UsageError('Aucun club configuré (TENANTS).')
+				return f(*args, **kwargs)
+			if all_clubs:
+				slugs = registry.slugs()
+			elif club in registry:
+				slugs = [club]
+			else:
+				raise click.UsageError(f"Précisez --club ({', '.join(registry.slugs())}) ou --all-clubs.")
+			for slug in slugs:
+				if len(slugs) > 1:
+					print(f"[{slug}]")
+				with app.app_context():
+					g.tenant = slug
+					f(*args, **kwargs)
+		return wrapper
+
+	@app.cli.group('clubs')
+	def clubs_command():
+		"""Clubs hébergés (multi-club)."""
+
+	@clubs_command.command('list')
+	def clubs_list_command():
+		"""Liste les clubs configurés et leur base de données."""
+		registry = app.extensions.get('tenants')
+		if registry is None:
+			print(f"Multi-club désactivé (TENANTS vide). Base unique: {app.config['DATABASE']}")
+			return
+		for slug in registry.slugs():
+			path = registry.path(slug)
+			size = f"{os.path.getsize(path) / 1024:.0f} Ko" if os.path.exists(path) else 'non créée'
+			print(f"{slug:<20} {path} ({size})")
+
 	@app.cli.command('init-db')
+	@club_command
 	def init_db_command():
 		init_db(app)
 		print('Base de données initialisée.')
 
 	@app.cli.command('sync-db')
+	@club_command
 	def sync_db_command():
 		"""Synchronise le schéma de la base sans altérer les données (idempotent)."""
 		init_db(app)
 		print('Schéma synchronisé (aucune donnée modifiée).')
 
+	@app.cli.group('assets')
+	def assets_command():
+		"""Gestion des ressources statiques (css/js)."""
+
+	@assets_command.command('build')
+	def assets_build_command():
+		"""Empreinte les fichiers css/js et écrit leurs variantes précompressées dans static/dist."""
+		manifest = build_assets(app.static_folder)
+		for source, hashed in sorted(manifest.items()):
+			print(f"{source} -> {hashed}")
+		print(f"{len(manifest)} ressource(s) construite(s). Redémarrez l'application pour prendre en compte le manifeste.")
+
+	@app.cli.group('outbox')
+	def outbox_command():
+		"""File d'envoi des emails."""
+
+	def _process_outbox_once(db):
+		from services.email_outbox import process_outbox
+		return process_outbox(
+			db,
+			batch_size=app.config['EMAIL_OUTBOX_BATCH_SIZE'],
+			max_attempts=app.config['EMAIL_OUTBOX_MAX_ATTEMPTS'],
+			retry_base=app.config['EMAIL_OUTBOX_RETRY_BASE'],
+		)
+
+	@outbox_command.command('flush')
+	@club_command
+	def outbox_flush_command():
+		"""Envoie tous les emails dus puis s'arrête."""
+		totals = {'sent': 0, 'retried': 0, 'failed': 0}
+		db = get_db(app)
+		while True:
+			result = _process_outbox_once(db)
+			for key, value in result.items():
+				totals[key] += value
+			if sum(result.values()) < app.config['EMAIL_OUTBOX_BATCH_SIZE']:
+				break
+		print(f"Envoyés: {totals['sent']}, reportés: {totals['retried']}, en échec: {totals['failed']}")
+
+	@outbox_command.command('run')
+	def outbox_run_command():
+		"""Lance l'expéditeur en avant-plan (à utiliser avec EMAIL_OUTBOX_WORKER=false)."""
+		from services.email_outbox import start_outbox_worker
+		worker = start_outbox_worker(app)
+		print("Expéditeur d'emails démarré (Ctrl+C pour arrêter).")
+		try:
+			while worker.is_alive():
+				worker.join(1.0)
+		except KeyboardInterrupt:
+			worker.stop()
+
+	@outbox_command.command('status')
+	@club_command
+	def outbox_status_command():
+		"""Affiche le nombre d'emails par état."""
+		counts = outbox_repo.count_by_status(get_db(app))
+		for status in ('pending', 'sending', 'sent', 'failed'):
+			print(f"{status}: {counts.get(status, 0)}")
+
+	@app.cli.group('archive')
+	def archive_command():
+		"""Archivage des parties terminées anciennes."""
+
+	@archive_command.command('run')
+	@click.option('--older-than-days', type=int, default=None, help='Âge minimal (jours depuis la dernière modification), ARCHIVE_AFTER_DAYS par défaut')
+	@click.option('--limit', type=int, default=None, help='Nombre maximal de parties archivées')
+	@click.option('--dry-run', is_flag=True, help='Compte les parties concernées sans rien déplacer')
+	@club_command
+	def archive_run_command(older_than_days, limit, dry_run: bool):
+		"""Déplace les manches des parties terminées anciennes vers la base d'archive."""
+		days = app.config['ARCHIVE_AFTER_DAYS'] if older_than_days is None else older_than_days
+		now = datetime.utcnow()
+		cutoff = (now - timedelta(days=days)).isoformat(timespec='seconds')
+		db = get_db(app)
+		if dry_run:
+			count = archive_repo.count_archivable_games(db, cutoff)
+			print(f"{count} partie(s) terminée(s) avant le {cutoff} à archiver.")
+			return
+		result = archive_repo.archive_games(db, cutoff, now.isoformat(timespec='seconds'), limit=limit)
+		print(f"Parties archivées: {result['games']}, manches déplacées: {result['hands']}")
+
+	@archive_command.command('status')
+	@club_command
+	def archive_status_command():
+		"""Affiche le contenu de la base d'archive."""
+		status = archive_repo.archive_status(get_db(app))
+		print(f"Archive: {status['archive_path']} ({status['archive_size'] / 1024:.0f} Ko)")
+		print(f"Parties archivées: {status['archived_games']}, manches archivées: {status['archived_hands']}, manches actives: {status['hands']}")
+
+	@archive_command.command('restore')
+	@click.argument('game_ids', type=int, nargs=-1, required=True)
+	@club_command
+	def archive_restore_command(game_ids):
+		"""Remet les manches de parties archivées dans la base principale."""
+		result = archive_repo.restore_games(get_db(app), game_ids)
+		print(f"Parties restaurées: {result['games']}, manches restaurées: {result['hands']}")
+
+	@app.cli.group('stats')
+	def stats_command():
+		"""Agrégats des statistiques."""
+
+	@stats_command.command('rebuild-rollups')
+	@club_command
+	def stats_rebuild_rollups_command():
+		"""Recalcule les agrégats mensuels (monthly_rollups) depuis les parties et les manches."""
+		from db.rollups import rebuild_monthly_rollups
+		count = rebuild_monthly_rollups(get_db(app))
+		print(f"Agrégats mensuels recalculés: {count} ligne(s)")
+
+	@app.cli.group('events')
+	def events_command():
+		"""Journal d'événements des parties et projections."""
+
+	def _projection_names(names):
+		from db.projections import PROJECTIONS
+		unknown = [name for name in names if name not in PROJECTIONS]
+		if unknown:
+			raise click.UsageError(f"Projection inconnue: {', '.join(unknown)} (disponibles: {', '.join(PROJECTIONS)})")
+		return [PROJECTIONS[name] for name in (names or PROJECTIONS)]
+
+	@events_command.command('status')
+	@club_command
+	def events_status_command():
+		"""Affiche la taille du journal et le retard de chaque projection."""
+		from db.events import count_by_type
+		from db.projections import status
+		db = get_db(app)
+		state = status(db)
+		counts = count_by_type(db)
+		print(f"Événements: {state['last_event']} ({', '.join(f'{k}: {v}' for k, v in sorted(counts.items())) or 'aucun'})")
+		for name, projection in state['projections'].items():
+			print(f"{name:<20} position {projection['position']}, retard {projection['lag']}")
+
+	@events_command.command('project')
+	@click.argument('names', nargs=-1)
+	@click.option('--batch-size', default=500, show_default=True, help='Événements appliqués par transaction')
+	@club_command
+	def events_project_command(names, batch_size: int):
+		"""Applique aux projections les événements arrivés depuis leur position."""
+		from db.projections import catch_up
+		db = get_db(app)
+		for projection in _projection_names(names):
+			print(f"{projection.name}: {catch_up(db, projection, batch_size)} événement(s) appliqué(s)")
+
+	@events_command.command('replay')
+	@click.argument('names', nargs=-1)
+	@click.option('--batch-size', default=500, show_default=True, help='Événements appliqués par transaction')
+	@club_command
+	def events_replay_command(names, batch_size: int):
+		"""Reconstruit les projections en rejouant tout le journal."""
+		from db.projections import replay
+		db = get_db(app)
+		for projection in _projection_names(names):
+			print(f"{projection.name}: reconstruite à partir de {replay(db, projection, batch_size)} événement(s)")
+
+	@events_command.command('verify')
+	@club_command
+	def events_verify_command():
+		"""Compare la projection duo_notes (après rattrapage) aux parties terminées de la table games."""
+		from db.projections import PROJECTIONS, catch_up, verify_duo_notes
+		db = get_db(app)
+		catch_up(db, PROJECTIONS['duo_notes'])
+		mismatches = verify_duo_notes(db)
+		for (game_id, team), projected, actual in mismatches[:20]:
+			print(f"Partie {game_id}, équipe {team}: projection {projected}, table games {actual}")
+		print(f"{len(mismatches)} écart(s)")
+		if mismatches:
+			raise SystemExit(1)
+
+	@app.cli.command('bench-win-probability')
+	@click.option('--simulations', type=int, default=None, help='Fins de partie simulées par estimation, WIN_PROBABILITY_SIMULATIONS par défaut')
+	@click.option('--target', default=1000, show_default=True, help='Objectif de la partie simulée (départ à 0-0)')
+	@click.option('--repeat', default=5, show_default=True, help='Nombre de mesures')
+	@club_command
+	def bench_win_probability_command(simulations, target: int, repeat: int):
+		"""Mesure le temps d'une estimation de probabilité de victoire sur les manches du club."""
+		import time
+		from services.win_probability import benchmark, load_hand_samples
+		started = time.perf_counter()
+		samples = load_hand_samples(get_db(app))
+		load_ms = (time.perf_counter() - started) * 1000
+		if not samples.club:
+			print("Aucune manche jouée : rien à simuler.")
+			return
+		simulations = simulations or app.config['WIN_PROBABILITY_SIMULATIONS']
+		result = benchmark(samples.club, simulations, repeat=repeat, target=target)
+		print(f"Chargement des manches : {len(samples.club) // 2} manche(s) en {load_ms:.1f} ms")
+		print(f"{simulations} parties simulées (objectif {target}) : {result['best_ms']:.1f} ms (moyenne {result['mean_ms']:.1f} ms)")
+		print(f"Débit : {result['games_per_s']} parties/s")
+
+	@app.cli.command('stress-writes')
+	@click.option('--threads', default=32, show_default=True, help="Nombre d'écrivains simultanés")
+	@click.option('--writes', default=20, show_default=True, help='Écritures par écrivain')
+	@click.option('--tables', default=8, show_default=True, help='Parties jouées en parallèle')
+	def stress_writes_command(threads: int, writes: int, tables: int):
+		"""Écritures concurrentes sur une base jetable : attentes, reprises et cohérence."""
+		from services.write_stress import run_write_stress
+		result = run_write_stress(threads=threads, writes=writes, tables=tables)
+		counters = result['counters']
+		print(f"{result['operations']} écritures par {result['threads']} threads en {result['elapsed_s']} s ({result['ops_per_s']} /s)")
+		print(f"Manches: {counters['hands']}, admin: {counters['admin']}, abandons (base occupée): {counters['busy']}, erreurs: {counters['errors']}")
+		for error in result['errors']:
+			print(f"  {error}")
+		writes_stats = result['writes']
+		print(f"Reprises: {writes_stats['retries']}, échecs: {writes_stats['failures']}")
+		for name, op in writes_stats['operations'].items():
+			print(f"  {name:<40} {op['calls']:6d} appels {op['retries']:5d} reprises  attente moy. {op['avg_wait_ms']:8.2f} ms  max {op['max_wait_ms']:8.2f} ms")
+		consistent = result['hands_consistent'] and result['numbers_consistent'] and result['rollups_consistent']
+		print(
+			f"Cohérence: manches {'OK' if result['hands_consistent'] else 'KO'}, "
+			f"numéros {'OK' if result['numbers_consistent'] else 'KO'}, "
+			f"agrégats {'OK' if result['rollups_consistent'] else 'KO'}"
+		)
+		if not consistent or counters['errors']:
+			raise SystemExit(1)
+
+	@app.cli.group('bench')
+	def bench_command():
+		"""Micro-benchmarks des fonctions chaudes (scores, classement des duos, heatmap, filtres)."""
+
+	def _print_bench_comparison(rows, threshold: float):
+		for key, before, after, change, regressed in rows:
+			flag = f'  <-- régression (> {threshold:g} %)' if regressed else ''
+			print(f"  {key:<50} {before:>10.4f} -> {after:>10.4f} ms ({change:+.1f} %){flag}")
+
+	@bench_command.command('run')
+	@click.option('--filter', 'names', multiple=True, help='Ne lance que les benchmarks dont le nom contient ce texte (répétable)')
+	@click.option('--repeat', default=5, show_default=True, help='Séries de mesures par benchmark')
+	@click.option('--min-time', default=0.2, show_default=True, help='Durée minimale (s) d\'une série')
+	@click.option('--quick', is_flag=True, help='Uniquement la plus petite taille de chaque benchmark')
+	@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Écrit les résultats JSON dans ce fichier (référence)')
+	@click.option('--compare', 'baseline_path', type=click.Path(exists=True, dir_okay=False), default=None, help='Référence à comparer (code 1 en cas de régression)')
+	@click.option('--threshold', default=25.0, show_default=True, help='Ralentissement toléré (%) par rapport à la référence')
+	def bench_run_command(names, repeat: int, min_time: float, quick: bool, output, baseline_path, threshold: float):
+		"""Mesure les fonctions chaudes sur des entrées générées de plusieurs tailles."""
+		import json
+		from services.benchmarks import compare_results, run_benchmarks
+		results = run_benchmarks({'fr_datetime': fr_datetime}, names=names, repeat=repeat, min_time=min_time, quick=quick)
+		for key, result in results['results'].items():
+			print(f"{key:<50} {result['best_ms']:>10.4f} ms (médiane {result['median_ms']:.4f} ms, {result['per_item_us']:.3f} µs par {result['unit']})")
+		if output:
+			with open(output, 'w', encoding='utf-8') as fh:
+				json.dump(results, fh, indent=2, ensure_ascii=False)
+			print(f"Résultats écrits dans {output}")
+		if baseline_path:
+			with open(baseline_path, encoding='utf-8') as fh:
+				rows = compare_results(json.load(fh), results, threshold)
+			print(f"Comparaison avec {baseline_path}:")
+			_print_bench_comparison(rows, threshold)
+			if any(row[4] for row in rows):
+				raise SystemExit(1)
+
+	@bench_command.command('compare')
+	@click.argument('baseline_path', type=click.Path(exists=True, dir_okay=False))
+	@click.argument('results_path', type=click.Path(exists=True, dir_okay=False))
+	@click.option('--threshold', default=25.0, show_default=True, help='Ralentissement toléré (%) par rapport à la référence')
+	def bench_compare_command(baseline_path, results_path, threshold: float):
+		"""Compare deux résultats de bench run --output (code 1 en cas de régression)."""
+		import json
+		from services.benchmarks import compare_results
+		with open(baseline_path, encoding='utf-8') as fh:
+			baseline = json.load(fh)
+		with open(results_path, encoding='utf-8') as fh:
+			results = json.load(fh)
+		rows = compare_results(baseline, results, threshold)
+		_print_bench_comparison(rows, threshold)
+		if any(row[4] for row in rows):
+			raise SystemExit(1)
+
+	@app.cli.group('load-test')
+	def load_test_command():
+		"""Test de charge HTTP (scénarios de load_scenarios/)."""
+
+	def _print_comparison(rows):
+		for metric, before, after, change, regressed in rows:
+			flag = '  <-- régression' if regressed else ''
+			print(f"  {metric:<40} {before:>12} -> {after:>12} ({change:+.1f} %){flag}")
+
+	@load_test_command.command('run')
+	@click.argument('scenario_path', type=click.Path(exists=True, dir_okay=False))
+	@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Écrit le rapport JSON dans ce fichier')
+	@click.option('--compare', 'baseline_path', type=click.Path(exists=True, dir_okay=False), default=None, help='Rapport de référence à comparer')
+	@click.option('--threshold', default=20.0, show_default=True, help='Dégradation tolérée (%) avant de signaler une régression')
+	@click.option('--duration', type=float, default=None, help='Remplace la durée (s) du scénario')
+	def load_test_run_command(scenario_path, output, baseline_path, threshold: float, duration):
+		"""Lance l'application sur un port local (base jetable) et joue le scénario."""
+		import json
+		from services.load_test import compare_reports, load_scenario, run_load_test
+		try:
+			scenario = load_scenario(scenario_path)
+		except ValueError as exc:
+			raise click.UsageError(str(exc))
+		if duration is not None:
+			scenario['duration_s'] = duration
+		print(f"Scénario {scenario['name']}: {scenario['tables']} table(s), {scenario['spectators']} spectateur(s), {scenario['duration_s']} s")
+		report = run_load_test(scenario, create_app)
+		latency = report['latency']
+		print(f"{report['requests']} requêtes en {report['elapsed_s']} s ({report['requests_per_s']} /s, écritures {report['writes_per_s']} /s)")
+		print(f"Latence: p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms, p99 {latency['p99_ms']} ms, max {latency['max_ms']} ms")
+		for name, op in report['operations'].items():
+			print(f"  {name:<24} {op['count']:6d}  p50 {op['p50_ms']:8.2f}  p99 {op['p99_ms']:8.2f} ms  erreurs {op['errors']}")
+		locks = report['lock_errors']
+		print(f"Verrou: {locks['busy_responses']} réponse(s) 503, {locks['write_failures']} écriture(s) abandonnée(s), {locks['write_retries']} reprise(s)")
+		db_stats = report['db']
+		print(f"Base: {db_stats['size_before'] / 1024:.0f} Ko -> {db_stats['size_after'] / 1024:.0f} Ko, {db_stats['games']} parties, {db_stats['hands']} manches, {db_stats['events']} événements")
+		print(f"Totaux incohérents: {report['inconsistent_games']}")
+		if output:
+			with open(output, 'w', encoding='utf-8') as fh:
+				json.dump(report, fh, indent=2, ensure_ascii=False)
+			print(f"Rapport écrit dans {output}")
+		failed = bool(report['inconsistent_games'])
+		if baseline_path:
+			with open(baseline_path, encoding='utf-8') as fh:
+				rows = compare_reports(json.load(fh), report, threshold)
+			print(f"Comparaison avec {baseline_path}:")
+			_print_comparison(rows)
+			failed = failed or any(row[4] for row in rows)
+		if failed:
+			raise SystemExit(1)
+
+	@load_test_command.command('compare')
+	@click.argument('baseline_path', type=click.Path(exists=True, dir_okay=False))
+	@click.argument('report_path', type=click.Path(exists=True, dir_okay=False))
+	@click.option('--threshold', default=20.0, show_default=True, help='Dégradation tolérée (%) avant de signaler une régression')
+	def load_test_compare_command(baseline_path, report_path, threshold: float):
+		"""Compare deux rapports de load-test run --output (code 1 en cas de régression)."""
+		import json
+		from services.load_test import compare_reports
+		with open(baseline_path, encoding='utf-8') as fh:
+			baseline = json.load(fh)
+		with open(report_path, encoding='utf-8') as fh:
+			report = json.load(fh)
+		rows = compare_reports(baseline, report, threshold)
+		_print_comparison(rows)
+		if any(row[4] for row in rows):
+			raise SystemExit(1)
+
+	@app.cli.command('bench-writes')
+	@click.option('--threads', default=32, show_default=True, help="Nombre d'écrivains simultanés")
+	@click.option('--writes', default=20, show_default=True, help='Écritures par écrivain')
+	@click.option('--tables', default=8, show_default=True, help='Parties jouées en parallèle')
+	def bench_writes_command(threads: int, writes: int, tables: int):
+		"""Compare écritures directes et commits groupés (débit, latence) sur une base jetable."""
+		from services.write_stress import compare_write_modes
+		results = compare_write_modes(
+			threads=threads,
+			writes=writes,
+			tables=tables,
+			window_ms=app.config['SQLITE_GROUP_COMMIT_WINDOW_MS'],
+			max_batch=app.config['SQLITE_GROUP_COMMIT_MAX_BATCH'],
+		)
+		print(f"{threads} threads x {writes} écritures, {tables} parties")
+		print(f"{'mode':<14} {'écr./s':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'abandons':>9}")
+		for mode, result in results.items():
+			latency = result['latency_ms']
+			print(f"{mode:<14} {result['ops_per_s']:9.1f} {latency['p50']:9.2f} {latency['p95']:9.2f} {latency['max']:9.2f} {result['counters']['busy']:9d}")
+		for batches in results['group_commit']['batches'].values():
+			print(f"Commits groupés: {batches['batches']} lots, {batches['avg_batch']} écritures par lot en moyenne (max {batches['max_batch']})")
+
+	@app.cli.command('send-digest')
+	@click.option('--days', default=7, show_default=True, help='Période couverte par le résumé (jours)')
+	@click.option('--dry-run', is_flag=True, help="Affiche le premier résumé sans rien envoyer")
+	@club_command
+	def send_digest_command(days: int, dry_run: bool):
+		"""Envoie le résumé hebdomadaire du club à chaque joueur actif ayant un email."""
+		since = datetime.utcnow() - timedelta(days=days)
+		duo_params = {
+			'alpha': app.config['DUO_RANKING_ALPHA'],
+			'lambda_': app.config['DUO_RANKING_LAMBDA'],
+			'k': app.config['DUO_RANKING_K'],
+			'A': app.config['DUO_RANKING_A'],
+			'B': app.config['DUO_RANKING_B'],
+			'min_games': app.config['DUO_RANKING_MIN_GAMES'],
+		}
+		from services.digest import send_digests
+		result = send_digests(get_db(app), since, duo_params, dry_run=dry_run)
+		if dry_run:
+			if result['preview']:
+				subject, body = result['preview']
+				print(f"Sujet: {subject}\n\n{body}")
+			else:
+				print('Aucun destinataire.')
+			return
+		for email, error in result['errors']:
+			print(f"Échec pour {email}: {error}")
+		print(f"Résumés envoyés: {result['sent']}, en échec: {result['failed']}")
+
 	@app.cli.command('create-user')
 	@click.option('--username', prompt=True, help='Nom d\'utilisateur (unique, insensible à la casse)')
 	@click.option('--password', prompt=True, hide_input=True, confirmation_prompt=True, help='Mot de passe')
 	@click.option('--email', prompt=False, default='', help='Adresse email (optionnelle)')
 	@click.option('--admin', is_flag=True, help='Créer un utilisateur administrateur')
+	@club_command
 	def create_user_command(username: str, password: str, email: str, admin: bool):
 		username = username.strip()
 		if not username or not password or len(password) < 8:
@@ -912,6 +1655,31 @@ def create_app():
 		admin_status = " (administrateur)" if admin else ""
 		print(f"Utilisateur '{username}'{admin_status} créé avec succès.")
 
+	@app.cli.command('startup-report')
+	@click.option('--limit', default=25, show_default=True, help='Nombre de modules affichés')
+	@click.option('--check', is_flag=True, help='Code de sortie 1 si le démarrage à froid dépasse STARTUP_BUDGET_MS')
+	def startup_report_command(limit: int, check: bool):
+		"""Mesure le démarrage à froid (imports et étapes de create_app) dans un nouvel interpréteur."""
+		from services.startup import measure_cold_start
+		report = measure_cold_start(app.root_path)
+		print(f"Import de app.py : {report['import_ms']:.1f} ms")
+		print(f"create_app()     : {report['create_app_ms']:.1f} ms")
+		for name, ms in report['phases']:
+			print(f"  {name:<12} {ms:8.2f} ms")
+		print("\nModules de l'application et dépendances directes (cumulé / propre, ms) :")
+		for name, self_ms, cumulative_ms in report['modules'][:limit]:
+			print(f"  {cumulative_ms:8.2f} {self_ms:8.2f}  {name}")
+		print("\nServices chargés à la première utilisation (ms) :")
+		for name, ms in report['lazy'].items():
+			print(f"  {ms:8.2f}  {name}")
+		budget = app.config['STARTUP_BUDGET_MS']
+		status = 'OK' if report['total_ms'] <= budget else 'DÉPASSÉ'
+		print(f"\nDémarrage à froid : {report['total_ms']:.1f} ms (budget {budget:.0f} ms) : {status}")
+		if check and report['total_ms'] > budget:
+			raise SystemExit(1)
+
+	timings.mark('routes')
+	app.extensions['startup_timings'] = timings
 	return app
 
 
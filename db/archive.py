@@ -0,0 +1,236 @@
+"""Archivage des parties terminées anciennes.
+
+Les manches des parties archivées quittent la table ``hands`` de la base principale
+pour une base d'archive attachée (``<base>-archive.db``, à côté de la base du club),
+en une seule transaction. Les parties et leurs joueurs restent dans la base
+principale, et la contribution des manches archivées aux statistiques est conservée
+dans ``hand_rollups`` (compteurs par dimension, voir db/rollups.py) pour que ``services.statistics``
+renvoie les mêmes résultats sans lire l'archive.
+"""
+import os
+from contextlib import closing, contextmanager
+
+from . import events
+from .hands import TAKER_TEAM_SQL, cumulative_scores
+from .rollups import apply_game_rollups, apply_hand_rollups
+
+HAND_COLUMNS = (
+    "id, game_id, number, taker_user_id, contract, trump, score_team_a, score_team_b, "
+    "points_made_team_a, points_made_team_b, coinche, surcoinche, capot_team, "
+    "belote_a, belote_b, general, created_at, taker_team"
+)
+
+_ARCHIVABLE = "state = 'terminee' AND archived_at IS NULL AND updated_at < ?"
+_BATCH = "h.game_id IN (SELECT game_id FROM temp.archive_batch)"
+
+
+def archive_path(db) -> str:
+    """Path of the archive database next to the connection's main database file."""
+    with closing(db.cursor()) as cur:
+        cur.execute("PRAGMA database_list")
+        for _seq, name, path in cur.fetchall():
+            if name == 'main':
+                if not path:
+                    raise ValueError("L'archivage nécessite une base SQLite sur disque.")
+                root, _ext = os.path.splitext(path)
+                return f"{root}-archive.db"
+    raise ValueError("Base principale introuvable.")
+
+
+def has_archive(db) -> bool:
+    """True when the connection's database is on disk and already has an archive file."""
+    try:
+        return os.path.exists(archive_path(db))
+    except ValueError:
+        return False
+
+
+@contextmanager
+def attached_archive(db, create: bool = False):
+    """Attach the archive database as ``archive`` (yields None if it does not exist and create is False)."""
+    path = archive_path(db)
+    if not create and not os.path.exists(path):
+        yield None
+        return
+    db.execute("ATTACH DATABASE ? AS archive", (path,))
+    try:
+        db.execute(
+            '''CREATE TABLE IF NOT EXISTS archive.hands (
+                id INTEGER PRIMARY KEY,
+                game_id INTEGER NOT NULL,
+                number INTEGER NOT NULL,
+                taker_user_id INTEGER,
+                contract TEXT,
+                trump TEXT,
+                score_team_a INTEGER NOT NULL DEFAULT 0,
+                score_team_b INTEGER NOT NULL DEFAULT 0,
+                points_made_team_a INTEGER NOT NULL DEFAULT 0,
+                points_made_team_b INTEGER NOT NULL DEFAULT 0,
+                coinche INTEGER NOT NULL DEFAULT 0,
+                surcoinche INTEGER NOT NULL DEFAULT 0,
+                capot_team TEXT,
+                belote_a INTEGER NOT NULL DEFAULT 0,
+                belote_b INTEGER NOT NULL DEFAULT 0,
+                general INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                taker_team TEXT
+            )'''
+        )
+        columns = [c[1] for c in db.execute("PRAGMA archive.table_info('hands')").fetchall()]
+        if 'taker_team' not in columns:
+            # Archive written before hands.taker_team existed (see db/schema.py)
+            db.execute("ALTER TABLE archive.hands ADD COLUMN taker_team TEXT")
+            db.execute(f"UPDATE archive.hands SET taker_team = {TAKER_TEAM_SQL} WHERE taker_user_id IS NOT NULL")
+            db.commit()
+        db.execute('CREATE INDEX IF NOT EXISTS archive.idx_archive_hands_game ON hands(game_id)')
+        yield path
+    finally:
+        if db.in_transaction:
+            db.rollback()
+        db.execute("DETACH DATABASE archive")
+
+
+def _set_batch(cur, game_ids_sql: str, params=()):
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (game_id INTEGER PRIMARY KEY)")
+    cur.execute("DELETE FROM temp.archive_batch")
+    cur.execute(f"INSERT INTO temp.archive_batch (game_id) {game_ids_sql}", params)
+    cur.execute("SELECT COUNT(*) FROM temp.archive_batch")
+    return cur.fetchone()[0]
+
+
+def _apply_rollups(cur, hands_table: str, sign: int):
+    """Add (sign=1) or remove (sign=-1) the batch's hands from hand_rollups."""
+    apply_hand_rollups(cur, 'hand_rollups', hands_table, _BATCH, sign=sign)
+
+
+def count_archivable_games(db, cutoff_iso: str) -> int:
+    with closing(db.cursor()) as cur:
+        cur.execute(f"SELECT COUNT(*) FROM games WHERE {_ARCHIVABLE}", (cutoff_iso,))
+        return cur.fetchone()[0]
+
+
+def archive_games(db, cutoff_iso: str, now_iso: str, limit: int = None) -> dict:
+    """Move the hands of finished games last updated before cutoff_iso to the archive.
+
+    Returns {'games', 'hands'} moved.
+    """
+    with attached_archive(db, create=True):
+        with closing(db.cursor()) as cur:
+            cur.execute("BEGIN IMMEDIATE")
+            games = _set_batch(
+                cur,
+                f"SELECT id FROM main.games WHERE {_ARCHIVABLE} ORDER BY updated_at LIMIT ?",
+                (cutoff_iso, -1 if limit is None else limit),
+            )
+            if not games:
+                db.rollback()
+                return {'games': 0, 'hands': 0}
+            _apply_rollups(cur, 'main.hands', 1)
+            cur.execute(f"INSERT INTO archive.hands ({HAND_COLUMNS}) SELECT {HAND_COLUMNS} FROM main.hands h WHERE {_BATCH}")
+            hands = cur.rowcount
+            cur.execute(f"DELETE FROM main.hands WHERE game_id IN (SELECT game_id FROM temp.archive_batch)")
+            cur.execute("UPDATE main.games SET archived_at = ? WHERE id IN (SELECT game_id FROM temp.archive_batch)", (now_iso,))
+            db.commit()
+            return {'games': games, 'hands': hands}
+
+
+def restore_games(db, game_ids) -> dict:
+    """Move archived games' hands back into the main database. Returns {'games', 'hands'} restored."""
+    ids = [int(game_id) for game_id in game_ids]
+    if not ids:
+        return {'games': 0, 'hands': 0}
+    with attached_archive(db) as path:
+        if path is None:
+            return {'games': 0, 'hands': 0}
+        with closing(db.cursor()) as cur:
+            cur.execute("BEGIN IMMEDIATE")
+            placeholders = ','.join('?' * len(ids))
+            games = _set_batch(
+                cur,
+                f"SELECT id FROM main.games WHERE archived_at IS NOT NULL AND id IN ({placeholders})",
+                ids,
+            )
+            if not games:
+                db.rollback()
+                return {'games': 0, 'hands': 0}
+            _apply_rollups(cur, 'archive.hands', -1)
+            cur.execute(f"INSERT INTO main.hands ({HAND_COLUMNS}) SELECT {HAND_COLUMNS} FROM archive.hands h WHERE {_BATCH}")
+            hands = cur.rowcount
+            cur.execute("DELETE FROM archive.hands WHERE game_id IN (SELECT game_id FROM temp.archive_batch)")
+            cur.execute("UPDATE main.games SET archived_at = NULL WHERE id IN (SELECT game_id FROM temp.archive_batch)")
+            db.commit()
+            return {'games': games, 'hands': hands}
+
+
+def delete_archived_game(db, game_id: int) -> bool:
+    """Delete an archived game, its archived hands and their rollup contribution."""
+    with attached_archive(db, create=True):
+        with closing(db.cursor()) as cur:
+            cur.execute("BEGIN IMMEDIATE")
+            if not _set_batch(cur, "SELECT id FROM main.games WHERE archived_at IS NOT NULL AND id = ?", (game_id,)):
+                db.rollback()
+                return False
+            events.append(cur, 'game_deleted', game_id, {
+                'game': events.game_snapshot(cur, game_id),
+                'hands': events.game_hands(cur, game_id, 'archive.hands'),
+                'archived': True,
+            })
+            _apply_rollups(cur, 'archive.hands', -1)
+            apply_hand_rollups(cur, 'monthly_rollups', 'archive.hands', _BATCH, sign=-1)
+            apply_game_rollups(cur, "g.id = ?", (game_id,), sign=-1)
+            cur.execute("DELETE FROM archive.hands WHERE game_id = ?", (game_id,))
+            cur.execute("DELETE FROM main.game_players WHERE game_id = ?", (game_id,))
+            cur.execute("DELETE FROM main.games WHERE id = ?", (game_id,))
+            db.commit()
+            return True
+
+
+def list_archived_hands(db, game_id: int):
+    """Same rows as db.hands.list_hands, read from the archive."""
+    with attached_archive(db) as path:
+        if path is None:
+            return []
+        with closing(db.cursor()) as cur:
+            cur.execute(
+                """
+                SELECT h.id, h.number, h.taker_user_id, u.username, h.contract, h.trump,
+                       h.score_team_a, h.score_team_b, h.points_made_team_a, h.points_made_team_b,
+                       h.coinche, h.surcoinche, h.capot_team,
+                       h.belote_a, h.belote_b, h.general, h.created_at
+                FROM archive.hands h LEFT JOIN main.users u ON u.id = h.taker_user_id
+                WHERE h.game_id = ?
+                ORDER BY h.number ASC
+                """,
+                (game_id,),
+            )
+            return cur.fetchall()
+
+
+def archived_cumulative_scores(db, game_id: int):
+    """Same as db.hands.cumulative_scores, read from the archive."""
+    with attached_archive(db) as path:
+        if path is None:
+            return [], [], []
+        return cumulative_scores(db, game_id, source='archive.hands')
+
+
+def archive_status(db) -> dict:
+    with closing(db.cursor()) as cur:
+        cur.execute("SELECT COUNT(*) FROM games WHERE archived_at IS NOT NULL")
+        archived_games = cur.fetchone()[0]
+        cur.execute("SELECT COUNT(*) FROM hands")
+        hot_hands = cur.fetchone()[0]
+    archived_hands = 0
+    with attached_archive(db) as path:
+        if path is not None:
+            with closing(db.cursor()) as cur:
+                cur.execute("SELECT COUNT(*) FROM archive.hands")
+                archived_hands = cur.fetchone()[0]
+    path = archive_path(db)
+    return {
+        'archive_path': path,
+        'archive_size': os.path.getsize(path) if os.path.exists(path) else 0,
+        'archived_games': archived_games,
+        'archived_hands': archived_hands,
+        'hands': hot_hands,
+    }
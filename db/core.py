@@ -1,12 +1,34 @@
 import os
 import sqlite3
 from contextlib import closing
-from flask import g
+from flask import current_app, g
+
+from .transactions import configure_connection
+
+
+def _tenants(app):
+    """Return the club registry when multi-club is enabled and a club is selected, else None."""
+    registry = app.extensions.get('tenants')
+    if registry is None or not g.get('tenant'):
+        return None
+    return registry
+
+
+def database_path(app):
+    """Path of the current club's database, or DATABASE when multi-club is off."""
+    registry = _tenants(app)
+    if registry is not None:
+        return registry.path(g.tenant)
+    return app.config['DATABASE']
 
 
 def get_db(app):
     db = getattr(g, '_database', None)
     if db is None:
+        registry = _tenants(app)
+        if registry is not None:
+            db = g._database = registry.acquire(g.tenant)
+            return db
         db_path = app.config['DATABASE']
         db_dir = os.path.dirname(db_path)
         if db_dir and not os.path.exists(db_dir):
@@ -17,6 +39,7 @@ def get_db(app):
             db.execute('PRAGMA foreign_keys = ON')
         except Exception:
             pass
+        configure_connection(db)
         if need_init:
             from .schema import init_db
             init_db(app, db)
@@ -24,7 +47,12 @@ def get_db(app):
 
 
 def close_db(exception=None):
-    db = getattr(g, 'db', None)
-    if db is not None:
+    db = g.pop('_database', None)
+    if db is None:
+        return
+    tenant = getattr(db, 'tenant', None)
+    registry = current_app.extensions.get('tenants')
+    if tenant and registry is not None:
+        registry.release(tenant, db)
+    else:
         db.close()
-
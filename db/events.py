@@ -0,0 +1,161 @@
+"""Journal d'événements des parties et des manches (table ``events``, en ajout seul).
+
+Chaque fonction d'écriture de ``db.games``, ``db.hands`` et ``db.archive`` ajoute son
+événement dans la même transaction que l'écriture elle-même : le journal ne contient
+jamais une écriture annulée, et aucune écriture validée n'y manque. Les événements
+portent tout ce qu'il faut pour être consommés sans relire les tables (manche avant et
+après une modification, manches d'une partie supprimée, totaux et état de la partie après
+chaque recalcul...) : les projections (db/projections.py) s'en servent pour tenir leurs
+tables à jour de proche en proche. ``append`` les fait avancer dans la même transaction
+que l'écriture, si bien qu'elles sont toujours à jour pour les lectures.
+
+Les lignes ne sont jamais modifiées ni supprimées, et ``id`` croît strictement : c'est
+la position des projections dans le journal.
+"""
+import json
+from collections import namedtuple
+from contextlib import closing, nullcontext
+
+EVENT_TYPES = (
+    'game_created', 'game_deleted', 'target_changed', 'totals_updated',
+    'hand_added', 'hand_edited', 'hand_deleted',
+)
+
+HAND_FIELDS = (
+    'id', 'game_id', 'number', 'taker_user_id', 'contract', 'trump', 'score_team_a', 'score_team_b',
+    'points_made_team_a', 'points_made_team_b', 'coinche', 'surcoinche', 'capot_team',
+    'belote_a', 'belote_b', 'general', 'created_at',
+)
+
+Event = namedtuple('Event', 'id type game_id hand_id payload created_at')
+
+
+def append(cur, event_type: str, game_id: int, payload: dict, hand_id: int = None, now: str = None, project: bool = True):
+    """Add an event in the caller's transaction (created_at defaults to the current UTC time).
+
+    project: also apply the pending events to the projections (False for bulk backfills,
+    which catch up once at the end).
+    """
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"Type d'événement inconnu: {event_type!r}")
+    cur.execute(
+        """
+        INSERT INTO events (type, game_id, hand_id, payload, created_at)
+        VALUES (?, ?, ?, ?, COALESCE(?, strftime('%Y-%m-%dT%H:%M:%S', 'now')))
+        """,
+        (event_type, game_id, hand_id, json.dumps(payload, separators=(',', ':'), ensure_ascii=False), now),
+    )
+    if project:
+        from .projections import apply_pending
+        apply_pending(cur)
+
+
+def totals_payload(points_a: int, points_b: int, state: str) -> dict:
+    """Payload of a totals_updated event (games.update_totals)."""
+    return {'points_team_a': points_a, 'points_team_b': points_b, 'state': state}
+
+
+def hand_snapshot(cur, hand_id: int, table: str = 'main.hands'):
+    """The hand's columns as a dict (None if it does not exist)."""
+    cur.execute(f"SELECT {', '.join(HAND_FIELDS)} FROM {table} WHERE id = ?", (hand_id,))
+    row = cur.fetchone()
+    return dict(zip(HAND_FIELDS, row)) if row else None
+
+
+def game_hands(cur, game_id: int, table: str = 'main.hands') -> list:
+    cur.execute(f"SELECT {', '.join(HAND_FIELDS)} FROM {table} WHERE game_id = ? ORDER BY number", (game_id,))
+    return [dict(zip(HAND_FIELDS, row)) for row in cur.fetchall()]
+
+
+def game_snapshot(cur, game_id: int):
+    """Creation data of a game: created_at, created_by, target_points and players per team."""
+    cur.execute("SELECT created_at, created_by, target_points FROM main.games WHERE id = ?", (game_id,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    cur.execute("SELECT team, user_id FROM main.game_players WHERE game_id = ? ORDER BY team, position", (game_id,))
+    players = {'A': [], 'B': []}
+    for team, user_id in cur.fetchall():
+        players.setdefault(team, []).append(user_id)
+    return {'created_at': row[0], 'created_by': row[1], 'target_points': row[2], 'players': players}
+
+
+def fetch_events(cur, after: int = 0, limit: int = -1) -> list:
+    """Events with id > after, oldest first, payloads decoded (limit -1: all of them)."""
+    cur.execute(
+        "SELECT id, type, game_id, hand_id, payload, created_at FROM main.events WHERE id > ? ORDER BY id LIMIT ?",
+        (after, limit),
+    )
+    return [Event(r[0], r[1], r[2], r[3], json.loads(r[4]), r[5]) for r in cur.fetchall()]
+
+
+def read_events(db, after: int = 0, limit: int = 500) -> list:
+    with closing(db.cursor()) as cur:
+        return fetch_events(cur, after, limit)
+
+
+def last_event_id(db) -> int:
+    with closing(db.cursor()) as cur:
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM events")
+        return cur.fetchone()[0]
+
+
+def count_by_type(db) -> dict:
+    with closing(db.cursor()) as cur:
+        cur.execute("SELECT type, COUNT(*) FROM events GROUP BY type")
+        return dict(cur.fetchall())
+
+
+def backfill_events(db) -> int:
+    """Seed an empty journal from the existing games and hands (archived hands included).
+
+    The history before the journal is unknown: each game gets a game_created event with its
+    current target, one hand_added per hand and a totals_updated with its current totals.
+    Returns the number of events written.
+    """
+    from .archive import attached_archive, has_archive
+
+    archived = has_archive(db)
+    with attached_archive(db) if archived else nullcontext():
+        with closing(db.cursor()) as cur:
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("SELECT COUNT(*) FROM main.events")
+            if cur.fetchone()[0]:
+                db.rollback()
+                return 0
+            cur.execute(
+                "SELECT id, archived_at, points_team_a, points_team_b, state, updated_at FROM main.games ORDER BY created_at, id"
+            )
+            games = cur.fetchall()
+            count = 0
+            for game_id, archived_at, points_a, points_b, state, updated_at in games:
+                snapshot = game_snapshot(cur, game_id)
+                snapshot['backfill'] = True
+                append(cur, 'game_created', game_id, snapshot, now=snapshot['created_at'], project=False)
+                table = 'archive.hands' if archived_at and archived else 'main.hands'
+                hands = game_hands(cur, game_id, table)
+                for hand in hands:
+                    append(cur, 'hand_added', game_id, {'hand': hand, 'backfill': True}, hand_id=hand['id'],
+                           now=hand['created_at'], project=False)
+                totals = dict(totals_payload(points_a, points_b, state), backfill=True)
+                append(cur, 'totals_updated', game_id, totals, now=updated_at, project=False)
+                count += 2 + len(hands)
+            db.commit()
+            return count
+
+
+def backfill_totals(db) -> int:
+    """Append a totals_updated event per existing game (journal started before that event existed).
+
+    Projections reading game totals can then be rebuilt from the journal alone.
+    Returns the number of events written.
+    """
+    with closing(db.cursor()) as cur:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("SELECT id, points_team_a, points_team_b, state, updated_at FROM main.games ORDER BY id")
+        games = cur.fetchall()
+        for game_id, points_a, points_b, state, updated_at in games:
+            totals = dict(totals_payload(points_a, points_b, state), backfill=True)
+            append(cur, 'totals_updated', game_id, totals, now=updated_at, project=False)
+        db.commit()
+        return len(games)
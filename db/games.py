@@ -1,23 +1,37 @@
+import sqlite3
 from contextlib import closing
 
+from . import events, rollups
+from .transactions import is_busy_error, write_transaction
+
+
+# Stored in games.winner_team: 'A' or 'B' once the game is finished, NULL while it is
+# running or if it ended tied (see winner_team below for the same rule in Python)
+WINNER_TEAM_SQL = """CASE
+               WHEN state = 'terminee' AND points_team_a > points_team_b THEN 'A'
+               WHEN state = 'terminee' AND points_team_b > points_team_a THEN 'B'
+           END"""
+
+_TEAM_COLUMNS = """
+                   (SELECT group_concat(u.username, ', ')
+                    FROM game_players gp JOIN users u ON u.id = gp.user_id
+                    WHERE gp.game_id = g.id AND gp.team = 'A') AS team_a,
+                   (SELECT group_concat(u.username, ', ')
+                    FROM game_players gp JOIN users u ON u.id = gp.user_id
+                    WHERE gp.game_id = g.id AND gp.team = 'B') AS team_b"""
+
 
 def list_games(db):
     with closing(db.cursor()) as cur:
         cur.execute(
-            """
+            f"""
             SELECT g.id,
                    g.created_at,
                    g.updated_at,
                    g.state,
                    g.points_team_a,
                    g.points_team_b,
-                   g.target_points,
-                   (SELECT group_concat(u.username, ', ')
-                    FROM game_players gp JOIN users u ON u.id = gp.user_id
-                    WHERE gp.game_id = g.id AND gp.team = 'A') AS team_a,
-                   (SELECT group_concat(u.username, ', ')
-                    FROM game_players gp JOIN users u ON u.id = gp.user_id
-                    WHERE gp.game_id = g.id AND gp.team = 'B') AS team_b
+                   g.target_points,{_TEAM_COLUMNS}
             FROM games g
             ORDER BY g.created_at DESC
             """
@@ -25,6 +39,70 @@ def list_games(db):
         return cur.fetchall()
 
 
+def search_games(db, filters: dict, limit: int, after=None):
+    """Games matching filters, newest first, same columns as list_games.
+
+    filters keys (all optional): player (user id), partners / opponents (user ids on the
+    player's team / the other team, require player), date_from / date_to (ISO dates,
+    date_to inclusive), state, target, min_margin / max_margin (final score gap).
+    Keyset pagination: after is the (created_at, id) of the last row of the previous page.
+    Returns up to limit + 1 rows so the caller can tell whether a next page exists.
+    """
+    where = []
+    params = []
+    if filters.get('player'):
+        # Drive from the player's rows in game_players (idx_game_players_user_game_team)
+        source = "game_players me JOIN games g ON g.id = me.game_id"
+        where.append("me.user_id = ?")
+        params.append(filters['player'])
+        for key, op in (('partners', '='), ('opponents', '!=')):
+            for user_id in filters.get(key) or ():
+                where.append(
+                    f"EXISTS (SELECT 1 FROM game_players p WHERE p.user_id = ? AND p.game_id = me.game_id AND p.team {op} me.team)"
+                )
+                params.append(user_id)
+    else:
+        source = "games g"
+    if filters.get('date_from'):
+        where.append("g.created_at >= ?")
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        where.append("g.created_at < date(?, '+1 day')")
+        params.append(filters['date_to'])
+    if filters.get('state'):
+        where.append("g.state = ?")
+        params.append(filters['state'])
+    if filters.get('target') is not None:
+        where.append("g.target_points = ?")
+        params.append(filters['target'])
+    if filters.get('min_margin') is not None:
+        where.append("ABS(g.points_team_a - g.points_team_b) >= ?")
+        params.append(filters['min_margin'])
+    if filters.get('max_margin') is not None:
+        where.append("ABS(g.points_team_a - g.points_team_b) <= ?")
+        params.append(filters['max_margin'])
+    if after is not None:
+        where.append("(g.created_at, g.id) < (?, ?)")
+        params.extend(after)
+    sql = f"""
+            SELECT g.id,
+                   g.created_at,
+                   g.updated_at,
+                   g.state,
+                   g.points_team_a,
+                   g.points_team_b,
+                   g.target_points,{_TEAM_COLUMNS}
+            FROM {source}
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY g.created_at DESC, g.id DESC
+            LIMIT ?
+            """
+    with closing(db.cursor()) as cur:
+        cur.execute(sql, (*params, limit + 1))
+        return cur.fetchall()
+
+
+@write_transaction
 def create_game(db, created_by: int, target_points: int, players: list[int], now: str):
     with closing(db.cursor()) as cur:
         cur.execute(
@@ -41,6 +119,8 @@ def create_game(db, created_by: int, target_points: int, players: list[int], now
                 (game_id, players[3], 'B', 2),
             ],
         )
+        rollups.add_game(cur, game_id)
+        events.append(cur, 'game_created', game_id, events.game_snapshot(cur, game_id), now=now)
         db.commit()
         return game_id
 
@@ -48,12 +128,19 @@ def create_game(db, created_by: int, target_points: int, players: list[int], now
 def load_game_basics(db, game_id: int):
     with closing(db.cursor()) as cur:
         cur.execute(
-            "SELECT id, created_at, updated_at, created_by, state, points_team_a, points_team_b, target_points FROM games WHERE id = ?",
+            "SELECT id, created_at, updated_at, created_by, state, points_team_a, points_team_b, target_points, archived_at, version FROM games WHERE id = ?",
             (game_id,),
         )
         return cur.fetchone()
 
 
+def get_game_version(db, game_id: int):
+    """(version, updated_at) of a game, or None; version changes on every write to the game or its hands."""
+    with closing(db.cursor()) as cur:
+        cur.execute("SELECT version, updated_at FROM games WHERE id = ?", (game_id,))
+        return cur.fetchone()
+
+
 def load_players(db, game_id: int):
     with closing(db.cursor()) as cur:
         cur.execute(
@@ -69,26 +156,42 @@ def is_participant(db, game_id: int, user_id: int) -> bool:
         return cur.fetchone() is not None
 
 
+def winner_team(state: str, points_a: int, points_b: int):
+    if state != 'terminee' or points_a == points_b:
+        return None
+    return 'A' if points_a > points_b else 'B'
+
+
+def update_totals(cur, game_id: int, target: int, now: str):
+    """Recompute the game's totals and state from its hands and log totals_updated, without committing."""
+    cur.execute("SELECT COALESCE(SUM(score_team_a),0), COALESCE(SUM(score_team_b),0) FROM hands WHERE game_id = ?", (game_id,))
+    totals = cur.fetchone()
+    points_a, points_b = int(totals[0]), int(totals[1])
+    state = 'en_cours'
+    if points_a >= target or points_b >= target:
+        state = 'terminee'
+    rollups.remove_game(cur, game_id)
+    cur.execute(
+        "UPDATE games SET points_team_a = ?, points_team_b = ?, updated_at = ?, state = ?, winner_team = ? WHERE id = ?",
+        (points_a, points_b, now, state, winner_team(state, points_a, points_b), game_id),
+    )
+    rollups.add_game(cur, game_id)
+    events.append(cur, 'totals_updated', game_id, events.totals_payload(points_a, points_b, state), now=now)
+    return points_a, points_b, state
+
+
+@write_transaction
 def recompute_totals_and_update_game(db, game_id: int, target: int, now: str):
     with closing(db.cursor()) as cur:
-        cur.execute("SELECT COALESCE(SUM(score_team_a),0), COALESCE(SUM(score_team_b),0) FROM hands WHERE game_id = ?", (game_id,))
-        totals = cur.fetchone()
-        points_a, points_b = int(totals[0]), int(totals[1])
-        state = 'en_cours'
-        if points_a >= target or points_b >= target:
-            state = 'terminee'
-        cur.execute(
-            "UPDATE games SET points_team_a = ?, points_team_b = ?, updated_at = ?, state = ? WHERE id = ?",
-            (points_a, points_b, now, state, game_id),
-        )
+        totals = update_totals(cur, game_id, target, now)
         db.commit()
-        return points_a, points_b, state
+        return totals
 
 
 def list_ongoing_games_for_user(db, user_id: int):
     """Return ongoing games where the given user participates.
 
-    Rows contain: id, created_at, updated_at, points_team_a, points_team_b, target_points, team_a, team_b
+    Rows contain: id, created_at, updated_at, points_team_a, points_team_b, target_points, team_a, team_b, version
     """
     with closing(db.cursor()) as cur:
         cur.execute(
@@ -104,7 +207,8 @@ def list_ongoing_games_for_user(db, user_id: int):
                     WHERE gp2.game_id = g.id AND gp2.team = 'A') AS team_a,
                    (SELECT group_concat(u.username, ', ')
                     FROM game_players gp2 JOIN users u ON u.id = gp2.user_id
-                    WHERE gp2.game_id = g.id AND gp2.team = 'B') AS team_b
+                    WHERE gp2.game_id = g.id AND gp2.team = 'B') AS team_b,
+                   g.version
             FROM games g
             WHERE g.state = 'en_cours'
               AND EXISTS (SELECT 1 FROM game_players gp WHERE gp.game_id = g.id AND gp.user_id = ?)
@@ -115,17 +219,26 @@ def list_ongoing_games_for_user(db, user_id: int):
         return cur.fetchall()
 
 
+@write_transaction
 def delete_game(db, game_id: int):
     """Delete a game and all associated data (hands, players)"""
     try:
         with closing(db.cursor()) as cur:
+            snapshot = events.game_snapshot(cur, game_id)
+            if snapshot is not None:
+                events.append(cur, 'game_deleted', game_id, {'game': snapshot, 'hands': events.game_hands(cur, game_id)})
+            rollups.remove_game_and_hands(cur, game_id)
             cur.execute('DELETE FROM hands WHERE game_id = ?', (game_id,))
             cur.execute('DELETE FROM game_players WHERE game_id = ?', (game_id,))
             cur.execute('DELETE FROM games WHERE id = ?', (game_id,))
             
             db.commit()
             return cur.rowcount > 0
-    except Exception:
+    except sqlite3.Error as exc:
+        # A locked database goes back to write_transaction, which retries the delete
+        # (and raises DatabaseBusy once out of attempts) instead of reporting a failure
+        if is_busy_error(exc):
+            raise
         db.rollback()
         return False
 
@@ -156,6 +269,7 @@ def get_games_count_by_day(db, year: int, month: int):
         return {day: count for day, count in results}
 
 
+@write_transaction
 def update_target_points(db, game_id: int, new_target: int, now: str):
     """Update the target points for a game and recompute its state.
     
@@ -164,23 +278,26 @@ def update_target_points(db, game_id: int, new_target: int, now: str):
     """
     with closing(db.cursor()) as cur:
         cur.execute(
-            "SELECT points_team_a, points_team_b, state FROM games WHERE id = ?",
+            "SELECT points_team_a, points_team_b, state, target_points FROM games WHERE id = ?",
             (game_id,)
         )
         row = cur.fetchone()
         if not row:
             return False
         
-        points_a, points_b, current_state = row
+        points_a, points_b, current_state, current_target = row
         
         new_state = 'en_cours'
         if points_a >= new_target or points_b >= new_target:
             new_state = 'terminee'
         
+        rollups.remove_game(cur, game_id)
         cur.execute(
-            "UPDATE games SET target_points = ?, state = ?, updated_at = ? WHERE id = ?",
-            (new_target, new_state, now, game_id)
+            "UPDATE games SET target_points = ?, state = ?, winner_team = ?, updated_at = ? WHERE id = ?",
+            (new_target, new_state, winner_team(new_state, points_a, points_b), now, game_id)
         )
+        rollups.add_game(cur, game_id)
+        events.append(cur, 'target_changed', game_id, {'before': current_target, 'after': new_target, 'state': new_state}, now=now)
         
         db.commit()
         return True
@@ -0,0 +1,259 @@
+"""Écrivain unique avec commits groupés (mode optionnel, ``SQLITE_GROUP_COMMIT``).
+
+Au lieu de se disputer le verrou d'écriture, les fonctions ``write_transaction`` confient
+leur écriture à un thread écrivain par base, qui a sa propre connexion. Il rassemble les
+écritures arrivées pendant une courte fenêtre (``window_ms`` après la première, au plus
+``max_batch``) et les exécute dans une seule transaction : un seul ``COMMIT`` (et une seule
+synchronisation disque) pour tout le lot. Chaque écriture tourne dans son propre
+``SAVEPOINT`` : une écriture en erreur est annulée seule, sans défaire les autres.
+L'appelant attend le résultat (ou l'exception) de son écriture via un ``Future``, rendu
+après le ``COMMIT`` : il relit donc ses propres écritures.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from .transactions import DatabaseBusy, configure_connection, is_busy_error, write_policy
+
+
+class _Job:
+    __slots__ = ('name', 'fn', 'args', 'kwargs', 'tenant', 'future', 'submitted')
+
+    def __init__(self, name, fn, args, kwargs, tenant):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.tenant = tenant
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+class BatchConnection:
+    """The writer's connection as seen by one job: commit/rollback act on the job's savepoint."""
+
+    in_transaction = True
+
+    def __init__(self, db, tenant):
+        self._db = db
+        self.tenant = tenant
+        # Run by the writer after COMMIT (see transactions.after_commit), dropped on rollback
+        self.after_commit_callbacks = []
+
+    def cursor(self):
+        return self._db.cursor()
+
+    def execute(self, *args):
+        return self._db.execute(*args)
+
+    def executemany(self, *args):
+        return self._db.executemany(*args)
+
+    def commit(self):
+        """The batch commits once all its jobs have run."""
+
+    def rollback(self):
+        self._db.execute('ROLLBACK TO job')
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+class GroupCommitWriter:
+    def __init__(self, path: str, window_ms: float, max_batch: int):
+        self.path = path
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.jobs = 0
+        self.failed_batches = 0
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.max_batch_seen = 0
+        self._thread = threading.Thread(target=self._run, name=f'group-commit:{path}', daemon=True)
+        self._thread.start()
+
+    def submit(self, name, fn, args, kwargs, tenant=None):
+        job = _Job(name, fn, args, kwargs, tenant)
+        self._queue.put(job)
+        return job.future.result()
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.perf_counter() + self.window_ms / 1000
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                self._queue.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        db.execute('PRAGMA foreign_keys = ON')
+        configure_connection(db)
+        return db
+
+    def _run(self):
+        db = self._connect()
+        try:
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    return
+                batch = self._collect(first)
+                try:
+                    outcomes = self._execute(db, batch)
+                except BaseException as exc:
+                    with self._lock:
+                        self.failed_batches += 1
+                    if db.in_transaction:
+                        db.execute('ROLLBACK')
+                    outcomes = [(None, exc)] * len(batch)
+                self._resolve(batch, outcomes)
+        finally:
+            db.close()
+
+    def _begin(self, db, attempt_name):
+        for attempt in range(1, write_policy.attempts + 1):
+            try:
+                db.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as exc:
+                if not is_busy_error(exc) or attempt == write_policy.attempts:
+                    if is_busy_error(exc):
+                        raise DatabaseBusy(f"{attempt_name}: base occupée après {attempt} tentative(s)") from exc
+                    raise
+                time.sleep(write_policy.delay(attempt))
+
+    def _execute(self, db, batch):
+        """Run the batch in one transaction; returns [(result, exception)] per job."""
+        for attempt in range(1, write_policy.attempts + 1):
+            self._begin(db, 'group-commit')
+            outcomes = []
+            callbacks = []
+            for job in batch:
+                conn = BatchConnection(db, job.tenant)
+                db.execute('SAVEPOINT job')
+                try:
+                    outcomes.append((job.fn(conn, *job.args, **job.kwargs), None))
+                    callbacks.extend(conn.after_commit_callbacks)
+                except Exception as exc:
+                    db.execute('ROLLBACK TO job')
+                    outcomes.append((None, exc))
+                db.execute('RELEASE job')
+            try:
+                db.execute('COMMIT')
+            except sqlite3.OperationalError as exc:
+                db.execute('ROLLBACK')
+                if not is_busy_error(exc) or attempt == write_policy.attempts:
+                    raise
+                time.sleep(write_policy.delay(attempt))
+                continue
+            for callback, args, kwargs in callbacks:
+                callback(*args, **kwargs)
+            return outcomes
+
+    def _resolve(self, batch, outcomes):
+        now = time.perf_counter()
+        latencies = [(now - job.submitted) * 1000 for job in batch]
+        with self._lock:
+            self.batches += 1
+            self.jobs += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.total_latency_ms += sum(latencies)
+            self.max_latency_ms = max(self.max_latency_ms, max(latencies))
+        for job, (result, exc), latency in zip(batch, outcomes, latencies):
+            write_policy.record(job.name, latency, 0, failed=isinstance(exc, DatabaseBusy))
+            if exc is not None:
+                job.future.set_exception(exc)
+            else:
+                job.future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'jobs': self.jobs,
+                'failed_batches': self.failed_batches,
+                'avg_batch': round(self.jobs / self.batches, 2) if self.batches else 0,
+                'max_batch': self.max_batch_seen,
+                'avg_latency_ms': round(self.total_latency_ms / self.jobs, 2) if self.jobs else 0,
+                'max_latency_ms': round(self.max_latency_ms, 2),
+                'queued': self._queue.qsize(),
+            }
+
+
+def database_file(db):
+    """Path of the connection's main database, or None for in-memory / temporary databases."""
+    for _seq, name, path in db.execute('PRAGMA database_list').fetchall():
+        if name == 'main':
+            return path or None
+    return None
+
+
+class GroupCommit:
+    """One writer thread per database file, started on its first write."""
+
+    def __init__(self):
+        self.enabled = False
+        self.window_ms = 5.0
+        self.max_batch = 64
+        self._writers = {}
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool, window_ms: float = 5.0, max_batch: int = 64):
+        self.stop()
+        with self._lock:
+            self.enabled = enabled
+            self.window_ms = max(0.0, window_ms)
+            self.max_batch = max(1, max_batch)
+
+    def writer_for(self, db):
+        path = database_file(db)
+        if path is None:
+            return None
+        with self._lock:
+            writer = self._writers.get(path)
+            if writer is None:
+                writer = self._writers[path] = GroupCommitWriter(path, self.window_ms, self.max_batch)
+            return writer
+
+    def submit(self, db, name, fn, args, kwargs):
+        """Run fn through the database's writer; returns NotImplemented when db has no file."""
+        writer = self.writer_for(db)
+        if writer is None:
+            return NotImplemented
+        return writer.submit(name, fn, args, kwargs, getattr(db, 'tenant', None))
+
+    def stop(self):
+        with self._lock:
+            writers, self._writers = list(self._writers.values()), {}
+        for writer in writers:
+            writer.stop()
+
+    def stats(self) -> dict:
+        with self._lock:
+            writers = dict(self._writers)
+        return {
+            'enabled': self.enabled,
+            'window_ms': self.window_ms,
+            'max_batch': self.max_batch,
+            'databases': {path: writer.stats() for path, writer in writers.items()},
+        }
+
+
+group_commit = GroupCommit()
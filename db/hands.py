@@ -1,5 +1,14 @@
 from contextlib import closing
 
+from . import events, games, rollups
+from .transactions import write_transaction
+
+# Team of the hand's taker, stored in hands.taker_team when the hand is written so that
+# statistics need not join game_players (correlated on the row for backfills, or bound
+# to (game_id, taker_user_id) for inserts)
+TAKER_TEAM_SQL = "(SELECT gp.team FROM main.game_players gp WHERE gp.game_id = hands.game_id AND gp.user_id = hands.taker_user_id)"
+_TAKER_TEAM_OF = "(SELECT team FROM game_players WHERE game_id = ? AND user_id = ?)"
+
 
 def list_hands(db, game_id: int):
     with closing(db.cursor()) as cur:
@@ -18,30 +27,116 @@ def list_hands(db, game_id: int):
         return cur.fetchall()
 
 
+def cumulative_scores(db, game_id: int, source: str = 'hands'):
+    """Running totals per hand as three parallel lists: (numbers, team A, team B)."""
+    with closing(db.cursor()) as cur:
+        cur.execute(
+            f"""
+            SELECT number,
+                   SUM(score_team_a) OVER running,
+                   SUM(score_team_b) OVER running
+            FROM {source}
+            WHERE game_id = ?
+            WINDOW running AS (ORDER BY number ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)
+            ORDER BY number ASC
+            """,
+            (game_id,),
+        )
+        rows = cur.fetchall()
+    return [r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows]
+
+
 def next_hand_number(db, game_id: int) -> int:
     with closing(db.cursor()) as cur:
         cur.execute("SELECT COALESCE(MAX(number), 0) + 1 FROM hands WHERE game_id = ?", (game_id,))
         return cur.fetchone()[0]
 
 
+@write_transaction
 def insert_hand(db, game_id: int, number: int, taker_user_id, contract, trump,
                 score_a: int, score_b: int, pre_a: int, pre_b: int,
                 coinche: int, surcoinche: int, capot_team, belote_a: int, belote_b: int, general: int, now: str):
     with closing(db.cursor()) as cur:
         cur.execute(
-            """
+            f"""
             INSERT INTO hands (game_id, number, taker_user_id, contract, trump,
               score_team_a, score_team_b, points_made_team_a, points_made_team_b,
-              coinche, surcoinche, capot_team, belote_a, belote_b, general, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+              coinche, surcoinche, capot_team, belote_a, belote_b, general, created_at, taker_team)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {_TAKER_TEAM_OF})
             """,
             (game_id, number, taker_user_id, contract, trump,
              score_a, score_b, pre_a, pre_b,
-             coinche, surcoinche, capot_team, belote_a, belote_b, general, now),
+             coinche, surcoinche, capot_team, belote_a, belote_b, general, now,
+             game_id, taker_user_id),
         )
+        hand_id = cur.lastrowid
+        rollups.add_hand(cur, hand_id)
+        events.append(cur, 'hand_added', game_id, {'hand': events.hand_snapshot(cur, hand_id)}, hand_id=hand_id, now=now)
         db.commit()
 
 
+@write_transaction
+def insert_hands(db, game_id: int, target: int, hands: list, now: str):
+    """Insert a batch of hands in one transaction and update the game totals once.
+
+    hands: [(client key, hand dict from services.hand_entry.build_hand)] in play order.
+    A key already recorded for the game is not inserted again (client retry); hands
+    arriving once a team has reached the target are refused.
+    Returns {client key: {'status': 'created' | 'duplicate' | 'finished', 'hand_id', 'number'}}.
+    """
+    results = {}
+    with closing(db.cursor()) as cur:
+        cur.execute("SELECT points_team_a, points_team_b FROM games WHERE id = ?", (game_id,))
+        points_a, points_b = cur.fetchone()
+        cur.execute("SELECT COALESCE(MAX(number), 0) + 1 FROM hands WHERE game_id = ?", (game_id,))
+        number = cur.fetchone()[0]
+        created = False
+        for key, hand in hands:
+            cur.execute("SELECT id, number FROM hands WHERE game_id = ? AND client_key = ?", (game_id, key))
+            row = cur.fetchone()
+            if row is not None:
+                results[key] = {'status': 'duplicate', 'hand_id': row[0], 'number': row[1]}
+                continue
+            if points_a >= target or points_b >= target:
+                results[key] = {'status': 'finished', 'hand_id': None, 'number': None}
+                continue
+            cur.execute(
+                f"""
+                INSERT INTO hands (game_id, number, taker_user_id, contract, trump,
+                  score_team_a, score_team_b, points_made_team_a, points_made_team_b,
+                  coinche, surcoinche, capot_team, belote_a, belote_b, general, created_at, client_key, taker_team)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {_TAKER_TEAM_OF})
+                """,
+                (game_id, number, hand['taker_user_id'], hand['contract'], hand['trump'],
+                 hand['score_a'], hand['score_b'], hand['pre_a'], hand['pre_b'],
+                 hand['coinche'], hand['surcoinche'], hand['capot_team'],
+                 hand['belote_a'], hand['belote_b'], hand['general'], now, key,
+                 game_id, hand['taker_user_id']),
+            )
+            hand_id = cur.lastrowid
+            rollups.add_hand(cur, hand_id)
+            events.append(cur, 'hand_added', game_id, {'hand': events.hand_snapshot(cur, hand_id)}, hand_id=hand_id, now=now)
+            results[key] = {'status': 'created', 'hand_id': hand_id, 'number': number}
+            points_a += hand['score_a']
+            points_b += hand['score_b']
+            number += 1
+            created = True
+        if created:
+            games.update_totals(cur, game_id, target, now)
+        db.commit()
+    return results
+
+
+def add_hand(db, game_id: int, target: int, hand: dict, now: str):
+    """Insert one hand (dict from services.hand_entry.build_hand) after the game's last one.
+
+    Numbering, insert and totals share insert_hands' transaction, so two concurrent
+    submissions cannot take the same number. Returns the hand number, or None if a team
+    had already reached the target.
+    """
+    return insert_hands(db, game_id, target, [(None, hand)], now)[None]['number']
+
+
 def get_hand(db, hand_id: int):
     with closing(db.cursor()) as cur:
         cur.execute(
@@ -57,31 +152,45 @@ def get_hand(db, hand_id: int):
         return cur.fetchone()
 
 
+@write_transaction
 def update_hand(db, hand_id: int, taker_user_id, contract, trump,
                 score_a: int, score_b: int, pre_a: int, pre_b: int,
                 coinche: int, surcoinche: int, capot_team, belote_a: int, belote_b: int, general: int):
     with closing(db.cursor()) as cur:
+        before = events.hand_snapshot(cur, hand_id)
+        rollups.remove_hand(cur, hand_id)
         cur.execute(
             """
             UPDATE hands
-            SET taker_user_id = ?, contract = ?, trump = ?,
+            SET taker_user_id = ?,
+                taker_team = (SELECT team FROM game_players WHERE game_id = hands.game_id AND user_id = ?),
+                contract = ?, trump = ?,
                 score_team_a = ?, score_team_b = ?,
                 points_made_team_a = ?, points_made_team_b = ?,
                 coinche = ?, surcoinche = ?, capot_team = ?,
                 belote_a = ?, belote_b = ?, general = ?
             WHERE id = ?
             """,
-            (taker_user_id, contract, trump,
+            (taker_user_id, taker_user_id, contract, trump,
              score_a, score_b,
              pre_a, pre_b,
              coinche, surcoinche, capot_team,
              belote_a, belote_b, general,
              hand_id),
         )
+        rollups.add_hand(cur, hand_id)
+        if before is not None:
+            after = events.hand_snapshot(cur, hand_id)
+            events.append(cur, 'hand_edited', before['game_id'], {'before': before, 'after': after}, hand_id=hand_id)
         db.commit()
 
 
+@write_transaction
 def delete_hand(db, hand_id: int):
     with closing(db.cursor()) as cur:
+        before = events.hand_snapshot(cur, hand_id)
+        if before is not None:
+            events.append(cur, 'hand_deleted', before['game_id'], {'hand': before}, hand_id=hand_id)
+        rollups.remove_hand(cur, hand_id)
         cur.execute("DELETE FROM hands WHERE id = ?", (hand_id,))
         db.commit()
@@ -0,0 +1,104 @@
+"""Cache en mémoire (LRU par processus) des identités utilisateurs.
+
+Conserve ``find_user_by_id`` (id, username, email, is_active, is_admin) et la liste
+des utilisateurs actifs. Les fonctions d'écriture de ``db.users`` invalident les
+entrées concernées ; une durée de vie bornée (``ttl``) limite l'écart avec les
+écritures faites par les autres processus. Les clés sont préfixées par le club de la
+connexion (``scope``) quand plusieurs clubs partagent le processus.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserIdentityCache:
+    def __init__(self, max_entries: int = 512, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def configure(self, max_entries: int, ttl: float):
+        with self._lock:
+            self.max_entries = max_entries
+            self.ttl = ttl
+            self._entries.clear()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def _set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_user(self, user_id: int, loader, scope=None):
+        if not self.enabled:
+            return loader()
+        key = (scope, 'user', user_id)
+        found, value = self._get(key)
+        if found:
+            return value
+        value = loader()
+        if value is not None:
+            self._set(key, value)
+        return value
+
+    def get_active_users(self, loader, scope=None):
+        if not self.enabled:
+            return loader()
+        key = (scope, 'active_users')
+        found, value = self._get(key)
+        if not found:
+            value = tuple(loader())
+            self._set(key, value)
+        return list(value)
+
+    def invalidate_user(self, user_id: int = None, scope=None):
+        """Oublie un utilisateur (s'il est connu) et la liste des actifs."""
+        with self._lock:
+            if user_id is not None:
+                self._entries.pop((scope, 'user', user_id), None)
+            self._entries.pop((scope, 'active_users'), None)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / total * 100, 2) if total else 0,
+            }
+
+
+user_cache = UserIdentityCache()
@@ -0,0 +1,15 @@
+from contextlib import closing
+
+
+def get_data_version(db):
+    """Return (data_version, updated_at) for the whole database.
+
+    The counter is maintained by triggers (see schema.init_db) so reading it is a
+    single-row primary key lookup.
+    """
+    with closing(db.cursor()) as cur:
+        cur.execute("SELECT data_version, updated_at FROM app_meta WHERE id = 1")
+        row = cur.fetchone()
+        if not row:
+            return 0, None
+        return int(row[0]), row[1]
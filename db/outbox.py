@@ -0,0 +1,111 @@
+from contextlib import closing
+
+from .transactions import write_transaction
+
+
+@write_transaction
+def enqueue_email(db, to_email: str, subject: str, body: str, now: str):
+    with closing(db.cursor()) as cur:
+        cur.execute(
+            "INSERT INTO email_outbox (to_email, subject, body, status, attempts, created_at, next_attempt_at) VALUES (?, ?, ?, 'pending', 0, ?, ?)",
+            (to_email, subject, body, now, now),
+        )
+        db.commit()
+        return cur.lastrowid
+
+
+@write_transaction
+def claim_due_emails(db, claim_token: str, now: str, limit: int):
+    """Atomically mark up to `limit` due pending emails as 'sending' for this worker.
+
+    Returns rows: (id, to_email, subject, body, attempts)
+    """
+    with closing(db.cursor()) as cur:
+        cur.execute(
+            """
+            UPDATE email_outbox
+            SET status = 'sending', claim_token = ?, claimed_at = ?
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY id
+                LIMIT ?
+            )
+            """,
+            (claim_token, now, now, limit),
+        )
+        db.commit()
+        cur.execute(
+            "SELECT id, to_email, subject, body, attempts FROM email_outbox WHERE status = 'sending' AND claim_token = ? ORDER BY id",
+            (claim_token,),
+        )
+        return cur.fetchall()
+
+
+@write_transaction
+def release_stale_claims(db, claimed_before: str):
+    """Put back in the queue emails left in 'sending' by a worker that died."""
+    with closing(db.cursor()) as cur:
+        cur.execute(
+            "UPDATE email_outbox SET status = 'pending', claim_token = NULL WHERE status = 'sending' AND claimed_at < ?",
+            (claimed_before,),
+        )
+        db.commit()
+        return cur.rowcount
+
+
+@write_transaction
+def mark_sent(db, email_id: int, now: str):
+    with closing(db.cursor()) as cur:
+        cur.execute(
+            "UPDATE email_outbox SET status = 'sent', attempts = attempts + 1, sent_at = ?, last_error = NULL, claim_token = NULL WHERE id = ?",
+            (now, email_id),
+        )
+        db.commit()
+
+
+@write_transaction
+def mark_retry(db, email_id: int, error: str, next_attempt_at: str):
+    with closing(db.cursor()) as cur:
+        cur.execute(
+            "UPDATE email_outbox SET status = 'pending', attempts = attempts + 1, last_error = ?, next_attempt_at = ?, claim_token = NULL WHERE id = ?",
+            (error, next_attempt_at, email_id),
+        )
+        db.commit()
+
+
+@write_transaction
+def mark_failed(db, email_id: int, error: str):
+    with closing(db.cursor()) as cur:
+        cur.execute(
+            "UPDATE email_outbox SET status = 'failed', attempts = attempts + 1, last_error = ?, claim_token = NULL WHERE id = ?",
+            (error, email_id),
+        )
+        db.commit()
+
+
+@write_transaction
+def retry_failed_emails(db, now: str):
+    with closing(db.cursor()) as cur:
+        cur.execute(
+            "UPDATE email_outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE status = 'failed'",
+            (now,),
+        )
+        db.commit()
+        return cur.rowcount
+
+
+def count_by_status(db):
+    with closing(db.cursor()) as cur:
+        cur.execute("SELECT status, COUNT(*) FROM email_outbox GROUP BY status")
+        return {row[0]: row[1] for row in cur.fetchall()}
+
+
+def list_recent_emails(db, limit: int = 20):
+    """Return rows: (id, to_email, subject, status, attempts, last_error, created_at, sent_at)"""
+    with closing(db.cursor()) as cur:
+        cur.execute(
+            "SELECT id, to_email, subject, status, attempts, last_error, created_at, sent_at FROM email_outbox ORDER BY id DESC LIMIT ?",
+            (limit,),
+        )
+        return cur.fetchall()
@@ -0,0 +1,210 @@
+"""Projections : tables dérivées alimentées par le journal d'événements (db/events.py).
+
+Une projection lit les événements à partir de sa position enregistrée dans
+``projection_offsets``, les applique à sa table et avance sa position dans la même
+transaction : après une interruption, elle reprend exactement là où elle s'était arrêtée,
+sans appliquer deux fois un événement. ``events.append`` appelle ``apply_pending`` après
+chaque écriture : les projections avancent dans la transaction de l'écriture et sont donc
+à jour pour toute lecture. ``catch_up`` rattrape un retard (migration, reconstruction)
+par lots, ``replay`` vide la table et rejoue tout le journal
+(reconstruction après un changement de la projection).
+
+Pour ajouter une projection : sous-classer ``Projection`` (``name``, ``reset`` et une
+méthode ``on_<type>`` par type d'événement consommé), créer sa table dans
+db/schema.py et l'ajouter à ``PROJECTIONS``.
+"""
+from contextlib import closing
+
+from .events import fetch_events, read_events
+from .transactions import write_transaction
+
+
+class Projection:
+    """A derived table fed by events; handlers are on_<event type>(cur, event)."""
+
+    name = None
+
+    def reset(self, cur):
+        """Empty the projection's table (before a replay)."""
+        raise NotImplementedError
+
+    def apply(self, cur, event):
+        handler = getattr(self, f'on_{event.type}', None)
+        if handler is not None:
+            handler(cur, event)
+
+
+class DuoNotesProjection(Projection):
+    """Team points of each duo in each game (projection_duo_notes), read by services.duo_ranking.
+
+    One row per game and team; user1_id < user2_id. The totals come from totals_updated
+    events, so the table never reads games.
+    """
+
+    name = 'duo_notes'
+
+    def reset(self, cur):
+        cur.execute("DELETE FROM projection_duo_notes")
+
+    def on_game_created(self, cur, event):
+        rows = [
+            (event.game_id, team, *sorted(players), event.created_at)
+            for team, players in event.payload['players'].items()
+            if len(players) == 2
+        ]
+        cur.execute("DELETE FROM projection_duo_notes WHERE game_id = ?", (event.game_id,))
+        cur.executemany(
+            "INSERT INTO projection_duo_notes (game_id, team, user1_id, user2_id, updated_at) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def on_game_deleted(self, cur, event):
+        cur.execute("DELETE FROM projection_duo_notes WHERE game_id = ?", (event.game_id,))
+
+    def on_totals_updated(self, cur, event):
+        totals = event.payload
+        cur.execute(
+            """
+            UPDATE projection_duo_notes
+            SET team_points = CASE team WHEN 'A' THEN ? ELSE ? END,
+                total_points = ?, finished = ?, updated_at = ?
+            WHERE game_id = ?
+            """,
+            (totals['points_team_a'], totals['points_team_b'], totals['points_team_a'] + totals['points_team_b'],
+             int(totals['state'] == 'terminee'), event.created_at, event.game_id),
+        )
+
+    def on_target_changed(self, cur, event):
+        # games.updated_at moves with the target, and the new target can end (or reopen) the game
+        if 'state' not in event.payload:
+            return
+        cur.execute(
+            "UPDATE projection_duo_notes SET finished = ?, updated_at = ? WHERE game_id = ?",
+            (int(event.payload['state'] == 'terminee'), event.created_at, event.game_id),
+        )
+
+
+PROJECTIONS = {projection.name: projection for projection in (DuoNotesProjection(),)}
+
+
+def get_position(db, name: str) -> int:
+    with closing(db.cursor()) as cur:
+        cur.execute("SELECT position FROM projection_offsets WHERE name = ?", (name,))
+        row = cur.fetchone()
+        return row[0] if row else 0
+
+
+def _set_position(cur, name: str, position: int):
+    cur.execute(
+        """
+        INSERT INTO projection_offsets (name, position, updated_at)
+        VALUES (?, ?, strftime('%Y-%m-%dT%H:%M:%S', 'now'))
+        ON CONFLICT(name) DO UPDATE SET position = excluded.position, updated_at = excluded.updated_at
+        """,
+        (name, position),
+    )
+
+
+@write_transaction
+def advance(db, projection: Projection, batch_size: int = 500) -> int:
+    """Apply the next batch of events to the projection. Returns the number of events read."""
+    position = get_position(db, projection.name)
+    batch = read_events(db, position, batch_size)
+    if not batch:
+        return 0
+    with closing(db.cursor()) as cur:
+        for event in batch:
+            projection.apply(cur, event)
+        _set_position(cur, projection.name, batch[-1].id)
+        db.commit()
+    return len(batch)
+
+
+def apply_pending(cur):
+    """Apply every pending event to every projection, in the caller's transaction.
+
+    Called by events.append after each write, so projections never lag behind a
+    committed write.
+    """
+    for projection in PROJECTIONS.values():
+        cur.execute("SELECT position FROM projection_offsets WHERE name = ?", (projection.name,))
+        row = cur.fetchone()
+        pending = fetch_events(cur, row[0] if row else 0)
+        for event in pending:
+            projection.apply(cur, event)
+        if pending:
+            _set_position(cur, projection.name, pending[-1].id)
+
+
+def catch_up(db, projection: Projection, batch_size: int = 500) -> int:
+    """Apply every pending event, one transaction per batch. Returns the number applied."""
+    total = 0
+    while True:
+        applied = advance(db, projection, batch_size)
+        total += applied
+        if applied < batch_size:
+            return total
+
+
+@write_transaction
+def _reset(db, projection: Projection):
+    with closing(db.cursor()) as cur:
+        projection.reset(cur)
+        _set_position(cur, projection.name, 0)
+        db.commit()
+
+
+def replay(db, projection: Projection, batch_size: int = 500) -> int:
+    """Rebuild the projection from the first event. Returns the number of events applied."""
+    _reset(db, projection)
+    return catch_up(db, projection, batch_size)
+
+
+def catch_up_all(db, batch_size: int = 500) -> dict:
+    return {name: catch_up(db, projection, batch_size) for name, projection in PROJECTIONS.items()}
+
+
+def status(db) -> dict:
+    """{'last_event', 'projections': {name: {'position', 'lag'}}}."""
+    with closing(db.cursor()) as cur:
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM events")
+        last = cur.fetchone()[0]
+        cur.execute("SELECT name, position FROM projection_offsets")
+        positions = dict(cur.fetchall())
+    return {
+        'last_event': last,
+        'projections': {
+            name: {'position': positions.get(name, 0), 'lag': last - positions.get(name, 0)}
+            for name in PROJECTIONS
+        },
+    }
+
+
+DUO_NOTES_SQL = """
+    SELECT g.id, gp1.team, gp1.user_id, gp2.user_id,
+           CASE gp1.team WHEN 'A' THEN g.points_team_a ELSE g.points_team_b END,
+           g.points_team_a + g.points_team_b, g.updated_at
+    FROM games g
+    JOIN game_players gp1 ON gp1.game_id = g.id
+    JOIN game_players gp2 ON gp2.game_id = g.id AND gp2.team = gp1.team AND gp2.user_id > gp1.user_id
+    WHERE g.state = 'terminee'
+"""
+
+
+def verify_duo_notes(db) -> list:
+    """Finished duos whose projected row differs from games: [((game_id, team), projected, actual)]."""
+    with closing(db.cursor()) as cur:
+        cur.execute(DUO_NOTES_SQL)
+        actual = {(r[0], r[1]): r[2:] for r in cur.fetchall()}
+        cur.execute(
+            """
+            SELECT game_id, team, user1_id, user2_id, team_points, total_points, updated_at
+            FROM projection_duo_notes WHERE finished = 1
+            """
+        )
+        projected = {(r[0], r[1]): r[2:] for r in cur.fetchall()}
+    return [
+        (key, projected.get(key), actual.get(key))
+        for key in sorted(actual.keys() | projected.keys())
+        if projected.get(key) != actual.get(key)
+    ]
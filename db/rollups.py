@@ -0,0 +1,235 @@
+"""Compteurs agrégés des statistiques (rollups).
+
+Deux tables partagent les mêmes dimensions (contrat, atout, preneur, événement...) :
+
+- ``hand_rollups`` : contribution des manches archivées, tous mois confondus (db/archive.py) ;
+- ``monthly_rollups`` : contribution de toutes les parties, par mois de création de la partie.
+  Elle est tenue à jour par les fonctions d'écriture de ``db.hands`` et ``db.games`` (retrait
+  de l'ancienne contribution avant l'écriture, ajout de la nouvelle après, dans la même
+  transaction) et permet à ``services.statistics`` de calculer une période en sommant
+  quelques mois au lieu de relire toutes les manches.
+
+Chaque ligne porte trois compteurs ``n``, ``successes`` et ``points`` dont le sens dépend
+de la dimension (voir les requêtes ci-dessous, qui suivent les règles de services/statistics.py).
+"""
+from contextlib import closing, nullcontext
+
+MONTH_OF_GAME = "strftime('%Y-%m', gm.created_at)"
+
+_GAME_JOIN = "JOIN main.games gm ON gm.id = h.game_id"
+# hands.taker_team is NULL when the taker is unknown or not a player of the game: such
+# hands are left out of the taker dimensions
+_TAKER_POINTS = "CASE WHEN h.taker_team = 'A' THEN h.points_made_team_a WHEN h.taker_team = 'B' THEN h.points_made_team_b ELSE 0 END"
+
+# Contribution of the hands matching {where}: (month, dimension, bucket, n, successes, points)
+HAND_ROLLUP_SELECTS = (
+    f"SELECT {{month}}, 'hands', '', COUNT(*), 0, 0 FROM {{hands}} h {_GAME_JOIN} WHERE {{where}} GROUP BY 1",
+    f"""SELECT {{month}}, 'contract', h.contract, COUNT(*), 0, 0
+       FROM {{hands}} h {_GAME_JOIN}
+       WHERE {{where}} AND h.contract IS NOT NULL
+       GROUP BY 1, 3""",
+    f"""SELECT {{month}}, 'contract_success', h.contract, COUNT(*),
+           SUM(CASE
+               WHEN h.taker_team = 'A' AND h.points_made_team_a >= CAST(h.contract AS INTEGER) THEN 1
+               WHEN h.taker_team = 'B' AND h.points_made_team_b >= CAST(h.contract AS INTEGER) THEN 1
+               ELSE 0
+           END), 0
+       FROM {{hands}} h {_GAME_JOIN}
+       WHERE {{where}} AND h.taker_team IS NOT NULL AND h.contract NOT IN ('Capot', 'Générale') AND h.contract IS NOT NULL
+       GROUP BY 1, 3""",
+    f"""SELECT {{month}}, 'trump', h.trump, COUNT(*), 0, SUM(h.points_made_team_a + h.points_made_team_b)
+       FROM {{hands}} h {_GAME_JOIN}
+       WHERE {{where}} AND h.trump IS NOT NULL
+       GROUP BY 1, 3""",
+    f"SELECT {{month}}, 'event', 'coinche', COUNT(*), 0, 0 FROM {{hands}} h {_GAME_JOIN} WHERE {{where}} AND h.coinche = 1 GROUP BY 1",
+    f"SELECT {{month}}, 'event', 'surcoinche', COUNT(*), 0, 0 FROM {{hands}} h {_GAME_JOIN} WHERE {{where}} AND h.surcoinche = 1 GROUP BY 1",
+    f"SELECT {{month}}, 'event', 'general', COUNT(*), 0, 0 FROM {{hands}} h {_GAME_JOIN} WHERE {{where}} AND h.general = 1 GROUP BY 1",
+    f"SELECT {{month}}, 'event', 'belotes', SUM(h.belote_a + h.belote_b), 0, 0 FROM {{hands}} h {_GAME_JOIN} WHERE {{where}} GROUP BY 1",
+    f"""SELECT {{month}}, 'capot_team', h.capot_team, COUNT(*), 0, 0
+       FROM {{hands}} h {_GAME_JOIN}
+       WHERE {{where}} AND h.capot_team IS NOT NULL
+       GROUP BY 1, 3""",
+    f"""SELECT {{month}}, 'coinche_taker', '', COUNT(*),
+           SUM(CASE
+               WHEN h.taker_team = 'A' AND h.score_team_a > h.score_team_b THEN 1
+               WHEN h.taker_team = 'B' AND h.score_team_b > h.score_team_a THEN 1
+               ELSE 0
+           END), 0
+       FROM {{hands}} h {_GAME_JOIN}
+       WHERE {{where}} AND h.taker_team IS NOT NULL AND h.coinche = 1
+       GROUP BY 1""",
+    f"""SELECT {{month}}, 'taker', h.taker_user_id, COUNT(*),
+           SUM(CASE
+               WHEN h.taker_team = 'A' AND h.points_made_team_a >= CAST(CASE WHEN h.contract IN ('Capot', 'Générale') THEN '162' ELSE h.contract END AS INTEGER) THEN 1
+               WHEN h.taker_team = 'B' AND h.points_made_team_b >= CAST(CASE WHEN h.contract IN ('Capot', 'Générale') THEN '162' ELSE h.contract END AS INTEGER) THEN 1
+               ELSE 0
+           END),
+           SUM({_TAKER_POINTS})
+       FROM {{hands}} h {_GAME_JOIN}
+       JOIN main.users u ON u.id = h.taker_user_id
+       WHERE {{where}} AND h.taker_team IS NOT NULL
+       GROUP BY 1, 3""",
+    f"""SELECT {{month}}, 'taker_points', {_TAKER_POINTS}, COUNT(*), 0, 0
+       FROM {{hands}} h {_GAME_JOIN}
+       WHERE {{where}} AND h.taker_team IS NOT NULL
+       GROUP BY 1, 3""",
+)
+
+# Exact taker points split by taker, trump or contract, bucket '<key>|<points>'
+# (monthly_rollups only: read by services/histograms.py over any range of months)
+HISTOGRAM_DIMENSIONS = {
+    'taker': 'h.taker_user_id',
+    'trump': 'h.trump',
+    'contract': 'h.contract',
+}
+MONTHLY_HAND_SELECTS = tuple(
+    f"""SELECT {{month}}, 'taker_points:{name}', {column} || '|' || ({_TAKER_POINTS}), COUNT(*), 0, 0
+       FROM {{hands}} h {_GAME_JOIN}
+       WHERE {{where}} AND h.taker_team IS NOT NULL AND {column} IS NOT NULL
+       GROUP BY 1, 3"""
+    for name, column in HISTOGRAM_DIMENSIONS.items()
+)
+
+# Per-game dimension: only valid over whole games, see add_hand/remove_hand for single hands
+GAMES_WITH_HANDS_SELECT = f"SELECT {{month}}, 'games_with_hands', '', COUNT(DISTINCT h.game_id), 0, 0 FROM {{hands}} h {_GAME_JOIN} WHERE {{where}} GROUP BY 1"
+
+_WON = "CASE WHEN gp.team = g.winner_team THEN 1 ELSE 0 END"
+_TEAM_POINTS = "CASE WHEN gp.team = 'A' THEN g.points_team_a WHEN gp.team = 'B' THEN g.points_team_b ELSE 0 END"
+_MONTH_OF_G = "strftime('%Y-%m', g.created_at)"
+
+# Contribution of the games matching {where} (monthly_rollups only)
+GAME_ROLLUP_SELECTS = (
+    f"""SELECT {_MONTH_OF_G}, 'games', g.state, COUNT(*), 0, SUM(g.points_team_a + g.points_team_b)
+       FROM main.games g WHERE {{where}} GROUP BY 1, 3""",
+    f"""SELECT {_MONTH_OF_G}, 'player', gp.user_id, COUNT(*), SUM({_WON}), SUM({_TEAM_POINTS})
+       FROM main.games g JOIN main.game_players gp ON gp.game_id = g.id
+       WHERE {{where}}
+       GROUP BY 1, 3""",
+    f"""SELECT {_MONTH_OF_G}, 'player_finished', gp.user_id, COUNT(*), 0, 0
+       FROM main.games g JOIN main.game_players gp ON gp.game_id = g.id
+       WHERE {{where}} AND g.state = 'terminee'
+       GROUP BY 1, 3""",
+    f"""SELECT {_MONTH_OF_G}, 'duo', gp.user_id || ':' || gp2.user_id, COUNT(*), SUM({_WON}), SUM({_TEAM_POINTS})
+       FROM main.games g
+       JOIN main.game_players gp ON gp.game_id = g.id
+       JOIN main.game_players gp2 ON gp2.game_id = g.id AND gp2.team = gp.team AND gp2.user_id > gp.user_id
+       WHERE {{where}} AND g.state = 'terminee'
+       GROUP BY 1, 3""",
+)
+
+_UPSERT = {
+    'hand_rollups': (
+        "dimension, bucket, n, successes, points",
+        "dimension, bucket",
+    ),
+    'monthly_rollups': (
+        "dimension, month, bucket, n, successes, points",
+        "dimension, month, bucket",
+    ),
+}
+
+
+def _apply(cur, table: str, select: str, params, sign: int):
+    columns, conflict = _UPSERT[table]
+    cur.execute(
+        f"""
+        WITH delta (month, dimension, bucket, n, successes, points) AS ({select})
+        INSERT INTO main.{table} ({columns})
+        SELECT {columns.replace('n, successes, points', 'COALESCE(n, 0) * ?, COALESCE(successes, 0) * ?, COALESCE(points, 0) * ?')}
+        FROM delta
+        WHERE true
+        ON CONFLICT({conflict}) DO UPDATE SET
+            n = n + excluded.n,
+            successes = successes + excluded.successes,
+            points = points + excluded.points
+        """,
+        (*params, sign, sign, sign),
+    )
+
+
+def apply_hand_rollups(cur, table: str, hands_table: str, where: str, params=(), sign: int = 1, whole_games: bool = True):
+    """Add (sign=1) or remove (sign=-1) the hands of hands_table matching where.
+
+    whole_games: where selects all the hands of some games (counts them in games_with_hands).
+    """
+    month = MONTH_OF_GAME if table == 'monthly_rollups' else "''"
+    selects = HAND_ROLLUP_SELECTS + ((GAMES_WITH_HANDS_SELECT,) if whole_games else ())
+    if table == 'monthly_rollups':
+        selects += MONTHLY_HAND_SELECTS
+    for select in selects:
+        _apply(cur, table, select.format(month=month, hands=hands_table, where=where), params, sign)
+    cur.execute(f"DELETE FROM main.{table} WHERE n = 0 AND successes = 0 AND points = 0")
+
+
+def apply_game_rollups(cur, where: str, params=(), sign: int = 1):
+    """Add or remove the game-level contribution (players, duos, states) of the games matching where."""
+    for select in GAME_ROLLUP_SELECTS:
+        _apply(cur, 'monthly_rollups', select.format(where=where), params, sign)
+    cur.execute("DELETE FROM main.monthly_rollups WHERE n = 0 AND successes = 0 AND points = 0")
+
+
+def _hand_delta(cur, hand_id: int, sign: int):
+    apply_hand_rollups(cur, 'monthly_rollups', 'main.hands', "h.id = ?", (hand_id,), sign, whole_games=False)
+    # The game's first hand (after insert) or last hand (before delete) toggles games_with_hands
+    cur.execute("SELECT COUNT(*) FROM hands WHERE game_id = (SELECT game_id FROM hands WHERE id = ?)", (hand_id,))
+    if cur.fetchone()[0] == 1:
+        _apply(cur, 'monthly_rollups', GAMES_WITH_HANDS_SELECT.format(month=MONTH_OF_GAME, hands='main.hands', where="h.id = ?"), (hand_id,), sign)
+        cur.execute("DELETE FROM main.monthly_rollups WHERE n = 0 AND successes = 0 AND points = 0")
+
+
+def add_hand(cur, hand_id: int):
+    """Count a hand in monthly_rollups (call after inserting or updating it)."""
+    _hand_delta(cur, hand_id, 1)
+
+
+def remove_hand(cur, hand_id: int):
+    """Uncount a hand from monthly_rollups (call before deleting or updating it)."""
+    _hand_delta(cur, hand_id, -1)
+
+
+def add_game(cur, game_id: int):
+    """Count a game's players, duo and state (call after creating or updating the game row)."""
+    apply_game_rollups(cur, "g.id = ?", (game_id,), 1)
+
+
+def remove_game(cur, game_id: int):
+    """Uncount a game's players, duo and state (call before updating the game row)."""
+    apply_game_rollups(cur, "g.id = ?", (game_id,), -1)
+
+
+def remove_game_and_hands(cur, game_id: int):
+    """Uncount a game and all its (non archived) hands (call before deleting the game)."""
+    apply_hand_rollups(cur, 'monthly_rollups', 'main.hands', "h.game_id = ?", (game_id,), -1)
+    remove_game(cur, game_id)
+
+
+def needs_rebuild(db) -> bool:
+    """True when monthly_rollups has hand counters but none of a dimension added since (histograms)."""
+    with closing(db.cursor()) as cur:
+        cur.execute(
+            """
+            SELECT EXISTS (SELECT 1 FROM monthly_rollups WHERE dimension = 'taker_points')
+               AND NOT EXISTS (SELECT 1 FROM monthly_rollups WHERE dimension = 'taker_points:taker')
+            """
+        )
+        return bool(cur.fetchone()[0])
+
+
+def rebuild_monthly_rollups(db) -> int:
+    """Recompute monthly_rollups from games and hands (archived hands included). Returns row count."""
+    from .archive import attached_archive, has_archive
+
+    archived = has_archive(db)
+    with attached_archive(db) if archived else nullcontext():
+        with closing(db.cursor()) as cur:
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("DELETE FROM main.monthly_rollups")
+            apply_game_rollups(cur, '1')
+            apply_hand_rollups(cur, 'monthly_rollups', 'main.hands', '1')
+            if archived:
+                apply_hand_rollups(cur, 'monthly_rollups', 'archive.hands', '1')
+            cur.execute("SELECT COUNT(*) FROM main.monthly_rollups")
+            count = cur.fetchone()[0]
+            db.commit()
+            return count
+
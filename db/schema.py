@@ -2,20 +2,34 @@ import os
 import sqlite3
 from contextlib import closing
 
+from .games import WINNER_TEAM_SQL
+from .hands import TAKER_TEAM_SQL
+from .transactions import configure_connection
+
 
 def init_db(app, db=None):
-    close_after = False
-    if db is None:
-        db_path = app.config['DATABASE']
-        db_dir = os.path.dirname(db_path)
-        if db_dir and not os.path.exists(db_dir):
-            os.makedirs(db_dir, exist_ok=True)
-        db = sqlite3.connect(db_path)
-        try:
-            db.execute('PRAGMA foreign_keys = ON')
-        except Exception:
-            pass
-        close_after = True
+    if db is not None:
+        migrate(db)
+        return
+    from .core import database_path
+    db_path = database_path(app)
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir, exist_ok=True)
+    db = sqlite3.connect(db_path)
+    try:
+        db.execute('PRAGMA foreign_keys = ON')
+    except Exception:
+        pass
+    configure_connection(db)
+    try:
+        migrate(db)
+    finally:
+        db.close()
+
+
+def migrate(db):
+    """Create missing tables, columns, indexes and triggers (idempotent)."""
     with closing(db.cursor()) as cur:
         cur.execute(
             '''CREATE TABLE IF NOT EXISTS users (
@@ -53,7 +67,10 @@ def init_db(app, db=None):
             )'''
         )
         cur.execute('CREATE INDEX IF NOT EXISTS idx_game_players_game ON game_players(game_id)')
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_game_players_user ON game_players(user_id)')
+        # Game search: a player's games with their team, and date ordering (see games.search_games);
+        # the composite index makes the former user_id-only index redundant
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_game_players_user_game_team ON game_players(user_id, game_id, team)')
+        cur.execute('DROP INDEX IF EXISTS idx_game_players_user')
 
         cur.execute(
             '''CREATE TABLE IF NOT EXISTS hands (
@@ -79,10 +96,27 @@ def init_db(app, db=None):
             )'''
         )
 
+        # Reverse lookups used by the admin panel (user deletability)
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_games_created_by ON games(created_by)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_games_created_at ON games(created_at)')
+
         cur.execute("PRAGMA table_info('games')")
         cols = [c[1] for c in cur.fetchall()]
         if 'target_points' not in cols:
             cur.execute("ALTER TABLE games ADD COLUMN target_points INTEGER NOT NULL DEFAULT 1000")
+        if 'archived_at' not in cols:
+            # Set when the game's hands have been moved to the archive database (db/archive.py)
+            cur.execute("ALTER TABLE games ADD COLUMN archived_at TEXT")
+        if 'winner_team' not in cols:
+            # Stored winner ('A', 'B', NULL while the game is running or tied), kept by
+            # games.update_totals / update_target_points so statistics need not compare totals
+            cur.execute("ALTER TABLE games ADD COLUMN winner_team TEXT")
+            cur.execute(f"UPDATE games SET winner_team = {WINNER_TEAM_SQL}")
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_games_state_winner ON games(state, winner_team)')
+        if 'version' not in cols:
+            # Per-game change counter (triggers below): HTTP validator and fragment cache key of
+            # /games/<id>, which updated_at cannot be since it only has one-second resolution
+            cur.execute("ALTER TABLE games ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
 
         cur.execute("PRAGMA table_info('users')")
         user_cols = [c[1] for c in cur.fetchall()]
@@ -116,7 +150,171 @@ def init_db(app, db=None):
             cur.execute("ALTER TABLE hands ADD COLUMN points_made_team_b INTEGER NOT NULL DEFAULT 0")
         if 'capot_team' not in h_cols:
             cur.execute("ALTER TABLE hands ADD COLUMN capot_team TEXT")
+        if 'client_key' not in h_cols:
+            # Idempotency key of hands sent by the offline queue (POST /games/<id>/hands.json)
+            cur.execute("ALTER TABLE hands ADD COLUMN client_key TEXT")
+        if 'taker_team' not in h_cols:
+            # Team of the taker, copied from game_players by the hand write path (db/hands.py)
+            # so statistics need not join game_players on (taker_user_id, game_id)
+            cur.execute("ALTER TABLE hands ADD COLUMN taker_team TEXT")
+            cur.execute(f"UPDATE hands SET taker_team = {TAKER_TEAM_SQL} WHERE taker_user_id IS NOT NULL")
+        # Per-taker statistics read (taker_user_id, taker_team); also serves the admin
+        # reverse lookup on taker_user_id, which made idx_hands_taker redundant
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_hands_taker_team ON hands(taker_user_id, taker_team)')
+        cur.execute('DROP INDEX IF EXISTS idx_hands_taker')
+        cur.execute(
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_hands_game_client_key ON hands(game_id, client_key) WHERE client_key IS NOT NULL'
+        )
+
+        # Statistics contribution of archived hands, per dimension (see db/archive.py)
+        cur.execute(
+            '''CREATE TABLE IF NOT EXISTS hand_rollups (
+                dimension TEXT NOT NULL,
+                bucket TEXT NOT NULL DEFAULT '',
+                n INTEGER NOT NULL DEFAULT 0,
+                successes INTEGER NOT NULL DEFAULT 0,
+                points INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY(dimension, bucket)
+            )'''
+        )
+
+        # Statistics per month of game creation, kept up to date by db/hands.py and
+        # db/games.py (see db/rollups.py); filled from existing data when first created
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'monthly_rollups'")
+        backfill_monthly = cur.fetchone() is None
+        cur.execute(
+            '''CREATE TABLE IF NOT EXISTS monthly_rollups (
+                dimension TEXT NOT NULL,
+                month TEXT NOT NULL,
+                bucket TEXT NOT NULL DEFAULT '',
+                n INTEGER NOT NULL DEFAULT 0,
+                successes INTEGER NOT NULL DEFAULT 0,
+                points INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY(dimension, month, bucket)
+            )'''
+        )
+
+        # Append-only journal of game and hand writes (db/events.py), consumed by the
+        # projections of db/projections.py from their stored position
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'events'")
+        backfill_events = cur.fetchone() is None
+        cur.execute(
+            '''CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                type TEXT NOT NULL,
+                game_id INTEGER NOT NULL,
+                hand_id INTEGER,
+                payload TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )'''
+        )
+        cur.execute(
+            '''CREATE TABLE IF NOT EXISTS projection_offsets (
+                name TEXT PRIMARY KEY,
+                position INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL
+            )'''
+        )
+        # game_totals only copied games.points_team_a/b: dropped for duo_notes
+        cur.execute("DROP TABLE IF EXISTS projection_game_totals")
+        cur.execute("DELETE FROM projection_offsets WHERE name = 'game_totals'")
+        # Duo notes of services.duo_ranking, fed by the journal (one row per game and team)
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'projection_duo_notes'")
+        backfill_totals = not backfill_events and cur.fetchone() is None
+        cur.execute(
+            '''CREATE TABLE IF NOT EXISTS projection_duo_notes (
+                game_id INTEGER NOT NULL,
+                team TEXT NOT NULL CHECK(team IN ('A','B')),
+                user1_id INTEGER NOT NULL,
+                user2_id INTEGER NOT NULL,
+                team_points INTEGER NOT NULL DEFAULT 0,
+                total_points INTEGER NOT NULL DEFAULT 0,
+                finished INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY(game_id, team)
+            )'''
+        )
+
+        # Outgoing emails queued by web requests and delivered by the background sender
+        cur.execute(
+            '''CREATE TABLE IF NOT EXISTS email_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                to_email TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                body TEXT NOT NULL,
+                status TEXT NOT NULL CHECK(status IN ('pending','sending','sent','failed')) DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                claim_token TEXT,
+                created_at TEXT NOT NULL,
+                next_attempt_at TEXT NOT NULL,
+                claimed_at TEXT,
+                sent_at TEXT
+            )'''
+        )
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(status, next_attempt_at)')
+
+        # Global data version, bumped by triggers on every write that can change
+        # a rendered page (used as HTTP validator for /, /games and /statistiques)
+        cur.execute(
+            '''CREATE TABLE IF NOT EXISTS app_meta (
+                id INTEGER PRIMARY KEY CHECK(id = 1),
+                data_version INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL
+            )'''
+        )
+        cur.execute("INSERT OR IGNORE INTO app_meta (id, data_version, updated_at) VALUES (1, 0, strftime('%Y-%m-%dT%H:%M:%S', 'now'))")
+        version_triggers = [
+            ('games', 'INSERT', ''),
+            ('games', 'UPDATE', ''),
+            ('games', 'DELETE', ''),
+            ('game_players', 'INSERT', ''),
+            ('game_players', 'UPDATE', ''),
+            ('game_players', 'DELETE', ''),
+            ('hands', 'INSERT', ''),
+            ('hands', 'UPDATE', ''),
+            ('hands', 'DELETE', ''),
+            ('users', 'INSERT', ''),
+            ('users', 'UPDATE', ' OF username, is_active, is_admin'),
+            ('users', 'DELETE', ''),
+        ]
+        for table, op, columns in version_triggers:
+            cur.execute(
+                f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_{op.lower()}_data_version
+                AFTER {op}{columns} ON {table}
+                BEGIN
+                    UPDATE app_meta
+                    SET data_version = data_version + 1,
+                        updated_at = strftime('%Y-%m-%dT%H:%M:%S', 'now')
+                    WHERE id = 1;
+                END'''
+            )
+        game_version_triggers = [
+            ('hands', 'INSERT', '', 'NEW.game_id'),
+            ('hands', 'UPDATE', '', 'OLD.game_id, NEW.game_id'),
+            ('hands', 'DELETE', '', 'OLD.game_id'),
+            ('games', 'UPDATE', ' OF points_team_a, points_team_b, state, target_points, archived_at', 'NEW.id'),
+        ]
+        for table, op, columns, game_ids in game_version_triggers:
+            cur.execute(
+                f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_{op.lower()}_game_version
+                AFTER {op}{columns} ON {table}
+                BEGIN
+                    UPDATE games SET version = version + 1 WHERE id IN ({game_ids});
+                END'''
+            )
 
         db.commit()
-    if close_after:
-        db.close()
+
+    from .rollups import needs_rebuild, rebuild_monthly_rollups
+    if backfill_monthly or needs_rebuild(db):
+        rebuild_monthly_rollups(db)
+    if backfill_events or backfill_totals:
+        from .events import backfill_events as seed_events, backfill_totals as seed_totals
+        from .projections import catch_up_all
+        # A journal older than totals_updated gets a snapshot of every game's totals first
+        if backfill_events:
+            seed_events(db)
+        else:
+            seed_totals(db)
+        catch_up_all(db)
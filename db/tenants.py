@@ -0,0 +1,181 @@
+"""Multi-club: one SQLite database per club, with a small connection pool per club.
+
+A club (tenant) is identified by a slug. Its database is opened on the first request
+that needs it, created and migrated with ``migrate`` if the file does not exist yet,
+and its connections are closed once idle for ``idle_timeout`` seconds.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from .schema import migrate
+from .transactions import configure_connection
+
+SLUG_RE = re.compile(r'^[a-z0-9][a-z0-9-]{0,62}$')
+
+
+class TenantConnection(sqlite3.Connection):
+    """sqlite3 connection remembering its club (used to scope in-process caches)."""
+    tenant = None
+
+
+def parse_tenants(spec: str, db_dir: str) -> dict:
+    """Parse ``TENANTS`` ("club1,club2=/path/club2.db") into {slug: absolute db path}."""
+    tenants = {}
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        slug, _, path = item.partition('=')
+        slug = slug.strip().lower()
+        if not SLUG_RE.match(slug):
+            raise ValueError(f"Identifiant de club invalide: {slug!r}")
+        path = path.strip() or os.path.join(db_dir, f'{slug}.db')
+        tenants[slug] = os.path.abspath(path)
+    return tenants
+
+
+class ConnectionPool:
+    def __init__(self, tenant: str, path: str, max_idle: int = 4):
+        self.tenant = tenant
+        self.path = path
+        self.max_idle = max(0, max_idle)
+        self._idle = []
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.opened = 0
+        self.closed = 0
+        self.last_used = time.monotonic()
+
+    def _connect(self):
+        db_dir = os.path.dirname(self.path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        need_init = not os.path.exists(self.path)
+        # Les connexions passent d'un thread à l'autre via le pool, jamais simultanément
+        db = sqlite3.connect(self.path, factory=TenantConnection, check_same_thread=False)
+        db.tenant = self.tenant
+        try:
+            db.execute('PRAGMA foreign_keys = ON')
+        except Exception:
+            pass
+        configure_connection(db)
+        if need_init:
+            migrate(db)
+        with self._lock:
+            self.opened += 1
+        return db
+
+    def acquire(self):
+        with self._lock:
+            self.in_use += 1
+            self.last_used = time.monotonic()
+            if self._idle:
+                return self._idle.pop()[0]
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self.in_use -= 1
+            raise
+
+    def release(self, db):
+        if db.in_transaction:
+            db.rollback()
+        with self._lock:
+            self.in_use -= 1
+            self.last_used = time.monotonic()
+            if len(self._idle) < self.max_idle:
+                self._idle.append((db, self.last_used))
+                return
+            self.closed += 1
+        db.close()
+
+    def close_idle(self, max_idle_seconds: float) -> int:
+        """Close connections unused for more than max_idle_seconds; return how many were closed."""
+        now = time.monotonic()
+        with self._lock:
+            stale = [db for db, released_at in self._idle if now - released_at >= max_idle_seconds]
+            self._idle = [(db, released_at) for db, released_at in self._idle if now - released_at < max_idle_seconds]
+            self.closed += len(stale)
+        for db in stale:
+            db.close()
+        return len(stale)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self.closed += len(idle)
+        for db, _released_at in idle:
+            db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'idle': len(self._idle),
+                'in_use': self.in_use,
+                'opened': self.opened,
+                'closed': self.closed,
+            }
+
+
+class TenantRegistry:
+    def __init__(self, tenants: dict, pool_size: int = 4, idle_timeout: float = 300.0):
+        self.tenants = dict(tenants)
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._last_reap = time.monotonic()
+
+    def __contains__(self, slug) -> bool:
+        return slug in self.tenants
+
+    def slugs(self) -> list:
+        return sorted(self.tenants)
+
+    def path(self, slug: str) -> str:
+        return self.tenants[slug]
+
+    def _pool(self, slug: str) -> ConnectionPool:
+        with self._lock:
+            pool = self._pools.get(slug)
+            if pool is None:
+                pool = self._pools[slug] = ConnectionPool(slug, self.tenants[slug], self.pool_size)
+            return pool
+
+    def acquire(self, slug: str):
+        self._maybe_reap()
+        return self._pool(slug).acquire()
+
+    def release(self, slug: str, db):
+        self._pool(slug).release(db)
+
+    def _maybe_reap(self):
+        now = time.monotonic()
+        if now - self._last_reap < max(self.idle_timeout / 2, 1.0):
+            return
+        self._last_reap = now
+        self.reap()
+
+    def reap(self) -> int:
+        """Close the connections of every club that have been idle longer than idle_timeout."""
+        with self._lock:
+            pools = list(self._pools.values())
+        return sum(pool.close_idle(self.idle_timeout) for pool in pools)
+
+    def close_all(self):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close_all()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pools = dict(self._pools)
+        return {
+            slug: pools[slug].stats() if slug in pools else {'idle': 0, 'in_use': 0, 'opened': 0, 'closed': 0}
+            for slug in self.slugs()
+        }
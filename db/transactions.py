@@ -0,0 +1,170 @@
+"""Transactions d'écriture tolérantes à la concurrence.
+
+SQLite n'accepte qu'un écrivain à la fois. Une transaction implicite (ouverte par le
+module sqlite3 au premier INSERT/UPDATE) ne prend le verrou d'écriture qu'au milieu de
+son travail : si un autre écrivain le tient déjà, SQLite répond immédiatement
+``database is locked`` sans attendre. ``write_transaction`` ouvre donc chaque écriture
+par ``BEGIN IMMEDIATE`` (verrou pris d'entrée, en attendant jusqu'au ``busy_timeout``
+de la connexion), puis recommence l'écriture entière après une courte pause aléatoire
+si la base reste occupée, un nombre borné de fois. L'attente du verrou et les reprises
+sont comptées par opération et exposées dans ``/admin/metrics``.
+"""
+import functools
+import random
+import sqlite3
+import threading
+import time
+
+_BUSY_CODES = ('SQLITE_BUSY', 'SQLITE_LOCKED')
+
+
+class DatabaseBusy(Exception):
+    """The database stayed locked by other writers after every retry."""
+
+
+def is_busy_error(exc: BaseException) -> bool:
+    if not isinstance(exc, sqlite3.OperationalError):
+        return False
+    name = getattr(exc, 'sqlite_errorname', '') or ''
+    if name.startswith(_BUSY_CODES):
+        return True
+    message = str(exc).lower()
+    return 'database is locked' in message or 'database table is locked' in message or 'database is busy' in message
+
+
+class WritePolicy:
+    """Retry settings and per-operation counters of write_transaction."""
+
+    def __init__(self, busy_timeout_ms: int = 5000, attempts: int = 5, backoff_ms: float = 20.0, max_backoff_ms: float = 500.0):
+        self.busy_timeout_ms = busy_timeout_ms
+        self.attempts = attempts
+        self.backoff_ms = backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def configure(self, busy_timeout_ms: int, attempts: int, backoff_ms: float, max_backoff_ms: float = 500.0):
+        with self._lock:
+            self.busy_timeout_ms = max(0, busy_timeout_ms)
+            self.attempts = max(1, attempts)
+            self.backoff_ms = max(0.0, backoff_ms)
+            self.max_backoff_ms = max(self.backoff_ms, max_backoff_ms)
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to sleep before retry number `attempt` (1-based): full jitter, exponential cap."""
+        cap = min(self.max_backoff_ms, self.backoff_ms * (2 ** (attempt - 1)))
+        return random.uniform(0, cap) / 1000
+
+    def record(self, name: str, wait_ms: float, retries: int, failed: bool = False):
+        with self._lock:
+            op = self._operations.get(name)
+            if op is None:
+                op = self._operations[name] = {'calls': 0, 'retries': 0, 'failures': 0, 'wait_ms': 0.0, 'max_wait_ms': 0.0}
+            op['calls'] += 1
+            op['retries'] += retries
+            op['failures'] += failed
+            op['wait_ms'] += wait_ms
+            op['max_wait_ms'] = max(op['max_wait_ms'], wait_ms)
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            operations = {
+                name: {
+                    'calls': op['calls'],
+                    'retries': op['retries'],
+                    'failures': op['failures'],
+                    'avg_wait_ms': round(op['wait_ms'] / op['calls'], 2) if op['calls'] else 0,
+                    'max_wait_ms': round(op['max_wait_ms'], 2),
+                }
+                for name, op in sorted(self._operations.items())
+            }
+            return {
+                'busy_timeout_ms': self.busy_timeout_ms,
+                'attempts': self.attempts,
+                'calls': sum(op['calls'] for op in self._operations.values()),
+                'retries': sum(op['retries'] for op in self._operations.values()),
+                'failures': sum(op['failures'] for op in self._operations.values()),
+                'operations': operations,
+            }
+
+
+write_policy = WritePolicy()
+
+
+def configure_connection(db, busy_timeout_ms: int = None):
+    """Per-connection settings: how long SQLite itself waits for the write lock."""
+    timeout = write_policy.busy_timeout_ms if busy_timeout_ms is None else busy_timeout_ms
+    db.execute(f'PRAGMA busy_timeout = {int(timeout)}')
+
+
+def after_commit(db, callback, *args, **kwargs):
+    """Call callback once db's writes are committed: now, or after the group commit (db.group_commit)."""
+    pending = getattr(db, 'after_commit_callbacks', None)
+    if pending is None:
+        return callback(*args, **kwargs)
+    pending.append((callback, args, kwargs))
+
+
+def run_in_transaction(db, name: str, fn, *args, **kwargs):
+    """Run fn(db, *args, **kwargs) inside BEGIN IMMEDIATE ... COMMIT, retrying while the database is busy.
+
+    fn may commit itself (the repository functions do). A call made while a transaction is
+    already open (nested repository calls, archive batches) joins it without retrying. In
+    group commit mode (db.group_commit) the call is handed to the database's writer thread.
+    """
+    if db.in_transaction:
+        return fn(db, *args, **kwargs)
+    from .group_commit import group_commit
+    if group_commit.enabled:
+        result = group_commit.submit(db, name, fn, args, kwargs)
+        if result is not NotImplemented:
+            return result
+    wait_ms = 0.0
+    for attempt in range(1, write_policy.attempts + 1):
+        started = time.perf_counter()
+        try:
+            db.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError as exc:
+            wait_ms += (time.perf_counter() - started) * 1000
+            if not is_busy_error(exc):
+                raise
+            if attempt == write_policy.attempts:
+                write_policy.record(name, wait_ms, attempt - 1, failed=True)
+                raise DatabaseBusy(f"{name}: base occupée après {attempt} tentative(s)") from exc
+            time.sleep(write_policy.delay(attempt))
+            continue
+        wait_ms += (time.perf_counter() - started) * 1000
+        try:
+            result = fn(db, *args, **kwargs)
+            if db.in_transaction:
+                db.commit()
+        except sqlite3.OperationalError as exc:
+            if db.in_transaction:
+                db.rollback()
+            if not is_busy_error(exc):
+                raise
+            if attempt == write_policy.attempts:
+                write_policy.record(name, wait_ms, attempt - 1, failed=True)
+                raise DatabaseBusy(f"{name}: base occupée après {attempt} tentative(s)") from exc
+            time.sleep(write_policy.delay(attempt))
+            continue
+        except BaseException:
+            if db.in_transaction:
+                db.rollback()
+            raise
+        write_policy.record(name, wait_ms, attempt - 1)
+        return result
+
+
+def write_transaction(fn):
+    """Decorator for repository functions taking the connection first (see run_in_transaction)."""
+    name = f"{fn.__module__.rpartition('.')[2]}.{fn.__name__}"
+
+    @functools.wraps(fn)
+    def wrapper(db, *args, **kwargs):
+        return run_in_transaction(db, name, fn, *args, **kwargs)
+    return wrapper
@@ -2,10 +2,27 @@ from contextlib import closing
 from typing import Optional
 from datetime import datetime
 
+from .identity_cache import user_cache
+from .transactions import after_commit, write_transaction
+
+
+def _cache_scope(db):
+    """Club of the connection (multi-club), so cached identities never cross databases."""
+    return getattr(db, 'tenant', None)
+
 
 def get_active_users(db):
+    def load():
+        with closing(db.cursor()) as cur:
+            cur.execute("SELECT id, username FROM users WHERE is_active = 1 ORDER BY username")
+            return cur.fetchall()
+    return user_cache.get_active_users(load, scope=_cache_scope(db))
+
+
+def list_users_with_email(db):
+    """Return (id, username, email) for active users having an email address."""
     with closing(db.cursor()) as cur:
-        cur.execute("SELECT id, username FROM users WHERE is_active = 1 ORDER BY username")
+        cur.execute("SELECT id, username, email FROM users WHERE is_active = 1 AND email IS NOT NULL AND email != '' ORDER BY username")
         return cur.fetchall()
 
 
@@ -31,14 +48,17 @@ def find_user_by_email(db, email: str):
 
 def find_user_by_id(db, user_id: int):
     """Return a tuple: (id, username, email, is_active, is_admin) for the given user_id, or None."""
-    with closing(db.cursor()) as cur:
-        cur.execute(
-            "SELECT id, username, email, is_active, is_admin FROM users WHERE id = ? LIMIT 1",
-            (user_id,),
-        )
-        return cur.fetchone()
+    def load():
+        with closing(db.cursor()) as cur:
+            cur.execute(
+                "SELECT id, username, email, is_active, is_admin FROM users WHERE id = ? LIMIT 1",
+                (user_id,),
+            )
+            return cur.fetchone()
+    return user_cache.get_user(user_id, load, scope=_cache_scope(db))
 
 
+@write_transaction
 def set_password_reset_token(db, user_id: int, token: str, expires_at_iso: str):
     with closing(db.cursor()) as cur:
         cur.execute(
@@ -58,6 +78,7 @@ def get_user_by_reset_token(db, token: str):
         return cur.fetchone()
 
 
+@write_transaction
 def clear_reset_token(db, user_id: int):
     with closing(db.cursor()) as cur:
         cur.execute(
@@ -68,6 +89,7 @@ def clear_reset_token(db, user_id: int):
         return cur.rowcount > 0
 
 
+@write_transaction
 def update_user_password_hash(db, user_id: int, password_hash: str):
     with closing(db.cursor()) as cur:
         cur.execute(
@@ -96,6 +118,7 @@ def can_request_password_reset(db, user_id: int, min_days: int = 30) -> bool:
         return delta.days >= min_days
 
 
+@write_transaction
 def update_user_username(db, user_id: int, new_username: str):
     with closing(db.cursor()) as cur:
         cur.execute(
@@ -103,6 +126,7 @@ def update_user_username(db, user_id: int, new_username: str):
             (new_username, user_id),
         )
         db.commit()
+        after_commit(db, user_cache.invalidate_user, user_id, scope=_cache_scope(db))
         return cur.rowcount > 0
 
 
@@ -117,6 +141,7 @@ def email_in_use_by_other(db, email: str, exclude_user_id: int) -> bool:
         return cur.fetchone() is not None
 
 
+@write_transaction
 def update_user_email(db, user_id: int, email: Optional[str]):
     with closing(db.cursor()) as cur:
         cur.execute(
@@ -124,9 +149,11 @@ def update_user_email(db, user_id: int, email: Optional[str]):
             (email, user_id),
         )
         db.commit()
+        after_commit(db, user_cache.invalidate_user, user_id, scope=_cache_scope(db))
         return cur.rowcount > 0
 
 
+@write_transaction
 def create_user(db, username: str, password_hash: str, created_at: str, email: Optional[str] = None):
     with closing(db.cursor()) as cur:
         cur.execute("SELECT id FROM users WHERE username = ? COLLATE NOCASE", (username,))
@@ -144,9 +171,11 @@ def create_user(db, username: str, password_hash: str, created_at: str, email: O
             (username, password_hash, created_at, email),
         )
         db.commit()
+        after_commit(db, user_cache.invalidate_user, cur.lastrowid, scope=_cache_scope(db))
         return cur.lastrowid
 
 
+@write_transaction
 def create_user_with_admin(db, username: str, password_hash: str, created_at: str, is_admin: bool = False, email: Optional[str] = None):
     with closing(db.cursor()) as cur:
         cur.execute("SELECT id FROM users WHERE username = ? COLLATE NOCASE", (username,))
@@ -161,9 +190,11 @@ def create_user_with_admin(db, username: str, password_hash: str, created_at: st
             (username, password_hash, created_at, 1 if is_admin else 0, email),
         )
         db.commit()
+        after_commit(db, user_cache.invalidate_user, cur.lastrowid, scope=_cache_scope(db))
         return cur.lastrowid
 
 
+@write_transaction
 def create_inactive_user(db, username: str, password_hash: str, created_at: str, email: Optional[str] = None):
     """Create an inactive user (for self-registration)"""
     with closing(db.cursor()) as cur:
@@ -179,6 +210,7 @@ def create_inactive_user(db, username: str, password_hash: str, created_at: str,
             (username, password_hash, created_at, email),
         )
         db.commit()
+        after_commit(db, user_cache.invalidate_user, cur.lastrowid, scope=_cache_scope(db))
         return cur.lastrowid
 
 
@@ -189,35 +221,85 @@ def list_all_users(db):
         return cur.fetchall()
 
 
+def _search_clause(search: Optional[str]):
+    """Return (sql, params) matching username or email containing `search` (LIKE wildcards escaped)."""
+    if not search:
+        return "1", ()
+    pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    return "(username LIKE ? ESCAPE '\\' OR email LIKE ? ESCAPE '\\')", (pattern, pattern)
+
+
+def count_users(db, search: Optional[str] = None):
+    """Return (total, pending, matching): all users, inactive users, and users matching `search`."""
+    where, params = _search_clause(search)
+    with closing(db.cursor()) as cur:
+        cur.execute(
+            f"SELECT COUNT(1), COALESCE(SUM(is_active = 0), 0), COALESCE(SUM({where}), 0) FROM users",
+            params,
+        )
+        return cur.fetchone()
+
+
+def list_users_page(db, search: Optional[str] = None, limit: int = 50, offset: int = 0):
+    """Return one page of users for the admin panel, with their activity in a single query.
+
+    Rows: (id, username, is_active, is_admin, created_at, email, games_played, last_activity, can_delete).
+    """
+    where, params = _search_clause(search)
+    with closing(db.cursor()) as cur:
+        cur.execute(
+            f"""
+            WITH page AS (
+                SELECT id, username, is_active, is_admin, created_at, email
+                FROM users
+                WHERE {where}
+                ORDER BY username
+                LIMIT ? OFFSET ?
+            ),
+            activity AS (
+                SELECT gp.user_id, COUNT(DISTINCT gp.game_id) AS games_played, MAX(g.updated_at) AS last_activity
+                FROM game_players gp
+                JOIN games g ON g.id = gp.game_id
+                WHERE gp.user_id IN (SELECT id FROM page)
+                GROUP BY gp.user_id
+            )
+            SELECT p.id, p.username, p.is_active, p.is_admin, p.created_at, p.email,
+                   COALESCE(a.games_played, 0), a.last_activity,
+                   a.user_id IS NULL
+                   AND NOT EXISTS (SELECT 1 FROM games WHERE created_by = p.id)
+                   AND NOT EXISTS (SELECT 1 FROM hands WHERE taker_user_id = p.id)
+            FROM page p
+            LEFT JOIN activity a ON a.user_id = p.id
+            ORDER BY p.username
+            """,
+            params + (limit, offset),
+        )
+        return cur.fetchall()
+
+
+@write_transaction
 def toggle_user_status(db, user_id: int):
     """Toggle is_active status for a user"""
     with closing(db.cursor()) as cur:
         cur.execute("UPDATE users SET is_active = 1 - is_active WHERE id = ?", (user_id,))
         db.commit()
+        after_commit(db, user_cache.invalidate_user, user_id, scope=_cache_scope(db))
         return cur.rowcount > 0
 
 
 def can_delete_user(db, user_id: int) -> bool:
     """Return True if the user has no references in games, game_players, or hands."""
     with closing(db.cursor()) as cur:
-
-        cur.execute("SELECT COUNT(1) FROM games WHERE created_by = ?", (user_id,))
-        cnt_games = cur.fetchone()[0]
-        if cnt_games and cnt_games > 0:
-            return False
-
-        cur.execute("SELECT COUNT(1) FROM game_players WHERE user_id = ?", (user_id,))
-        cnt_gp = cur.fetchone()[0]
-        if cnt_gp and cnt_gp > 0:
-            return False
-
-        cur.execute("SELECT COUNT(1) FROM hands WHERE taker_user_id = ?", (user_id,))
-        cnt_hands = cur.fetchone()[0]
-        if cnt_hands and cnt_hands > 0:
-            return False
-    return True
+        cur.execute(
+            """SELECT NOT EXISTS (SELECT 1 FROM games WHERE created_by = ?)
+                  AND NOT EXISTS (SELECT 1 FROM game_players WHERE user_id = ?)
+                  AND NOT EXISTS (SELECT 1 FROM hands WHERE taker_user_id = ?)""",
+            (user_id, user_id, user_id),
+        )
+        return bool(cur.fetchone()[0])
 
 
+@write_transaction
 def delete_user_if_no_references(db, user_id: int) -> bool:
     """Delete user only if they are not referenced anywhere. Returns True on success."""
     if not can_delete_user(db, user_id):
@@ -225,4 +307,5 @@ def delete_user_if_no_references(db, user_id: int) -> bool:
     with closing(db.cursor()) as cur:
         cur.execute("DELETE FROM users WHERE id = ?", (user_id,))
         db.commit()
+        after_commit(db, user_cache.invalidate_user, user_id, scope=_cache_scope(db))
         return cur.rowcount > 0
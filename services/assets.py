@@ -0,0 +1,131 @@
+"""Ressources statiques empreintées et compression des réponses.
+
+- ``build_assets`` copie les fichiers css/js de ``static/`` vers ``static/dist/`` sous un nom
+  contenant un hash de contenu, écrit les variantes ``.gz`` (et ``.br`` si le module
+  ``brotli`` est installé) ainsi qu'un ``manifest.json``.
+- ``asset_url`` s'utilise comme ``url_for('static', filename=...)`` dans les templates et
+  renvoie l'URL empreintée quand le fichier figure dans le manifeste.
+- ``send_asset`` sert la meilleure variante précompressée avec un cache "immutable".
+- ``compress_response`` compresse à la volée les réponses HTML/JSON volumineuses.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle
+    brotli = None
+
+
+ASSET_EXTENSIONS = ('.css', '.js')
+DIST_DIRNAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_MIMETYPES = ('text/html', 'application/json')
+
+
+def _fingerprint(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def build_assets(static_folder: str) -> dict:
+    """Construit static/dist et retourne le manifeste {chemin source: chemin empreinté}."""
+    dist_folder = os.path.join(static_folder, DIST_DIRNAME)
+    if os.path.isdir(dist_folder):
+        shutil.rmtree(dist_folder)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist_folder]
+        for name in sorted(files):
+            if not name.endswith(ASSET_EXTENSIONS):
+                continue
+            src = os.path.join(root, name)
+            rel = os.path.relpath(src, static_folder).replace(os.sep, '/')
+            base, ext = os.path.splitext(rel)
+            hashed = f"{base}.{_fingerprint(src)}{ext}"
+            dest = os.path.join(dist_folder, hashed)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copyfile(src, dest)
+            with open(src, 'rb') as fh:
+                data = fh.read()
+            with open(dest + '.gz', 'wb') as fh:
+                fh.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(dest + '.br', 'wb') as fh:
+                    fh.write(brotli.compress(data, quality=11))
+            manifest[rel] = hashed
+    os.makedirs(dist_folder, exist_ok=True)
+    with open(os.path.join(dist_folder, MANIFEST_NAME), 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder: str) -> dict:
+    path = os.path.join(static_folder, DIST_DIRNAME, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(endpoint: str, **values) -> str:
+    """Équivalent de url_for qui redirige les fichiers statiques construits vers /assets."""
+    if endpoint == 'static':
+        hashed = current_app.config.get('ASSET_MANIFEST', {}).get(values.get('filename'))
+        if hashed:
+            values['filename'] = hashed
+            return url_for('send_asset_file', **values)
+    return url_for(endpoint, **values)
+
+
+def send_asset(dist_folder: str, filename: str):
+    """Sert un fichier empreinté en choisissant la variante br/gzip acceptée par le client."""
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accepted = request.accept_encodings
+    encoding = None
+    served = filename
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[candidate] and os.path.isfile(os.path.join(dist_folder, filename + suffix)):
+            encoding, served = candidate, filename + suffix
+            break
+    response = send_from_directory(dist_folder, served, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def compress_response(response, min_size: int, level: int = 6):
+    """Compresse (gzip) une réponse HTML/JSON dont le corps dépasse min_size octets."""
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or 'Content-Encoding' in response.headers
+        or not request.accept_encodings['gzip']
+    ):
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=level))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    # La représentation compressée n'est plus identique octet par octet
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,204 @@
+"""Micro-benchmarks des fonctions chaudes (commande ``flask bench``).
+
+Chaque benchmark prépare des entrées générées (tirage initialisé, donc identiques d'une
+exécution à l'autre) à plusieurs tailles, puis mesure l'appel avec ``timeit`` : nombre
+d'appels calibré par ``autorange``, ``repeat`` séries, et le meilleur temps par appel
+retenu comme mesure (le moins sensible au bruit de la machine).
+
+Les résultats sont en JSON ; ``compare_results`` les compare à une référence enregistrée
+et signale chaque mesure plus lente de plus de ``threshold_pct`` %.
+"""
+import platform
+import random
+import sqlite3
+import statistics
+import timeit
+from datetime import datetime, timedelta
+
+from db.events import backfill_events
+from db.projections import catch_up_all
+from db.schema import migrate
+from services.duo_ranking import DuoEntry, _compute_weighted_score, get_duo_rankings, rank_duo_entries
+from services.get_day_heatmap import get_day_heatmap
+from services.scores import compute_score
+
+TRUMPS = ('Pique', 'Trèfle', 'Carreau', 'Coeur', 'Sans atout', 'Tout atout')
+
+
+def _score_inputs(rng, count):
+    hands = []
+    for _ in range(count):
+        taker = rng.choice('AB')
+        contract = rng.choice([str(c) for c in range(80, 190, 10)] + ['Capot', 'Générale'])
+        pre_a = rng.choice([rng.randint(0, 162), 162, 0])
+        trump = rng.choice(TRUMPS)
+        hands.append({
+            'A': {'pre_score': pre_a, 'belote': rng.randint(0, 1) if trump != 'Sans atout' else 0},
+            'B': {'pre_score': 162 - pre_a, 'belote': 0},
+            'coinche': int(rng.random() < 0.1),
+            'surcoinche': int(rng.random() < 0.02),
+            'general': int(contract == 'Générale'),
+            'taker_team': taker,
+            'contract': contract,
+            'trump': trump,
+        })
+    return hands
+
+
+def _notes(rng, count):
+    start = datetime(2025, 1, 1)
+    notes = [((start + timedelta(days=i)).isoformat(timespec='seconds'), rng.uniform(0.2, 1.8)) for i in range(count)]
+    notes.sort(key=lambda t: t[0], reverse=True)
+    return notes
+
+
+def _duo_entries(rng, games, players=16):
+    entries = []
+    start = datetime(2025, 1, 1)
+    for index in range(games):
+        seats = rng.sample(range(1, players + 1), 4)
+        updated_at = (start + timedelta(hours=index)).isoformat(timespec='seconds')
+        note = rng.uniform(0.2, 1.8)
+        for (u1, u2), value in (((seats[0], seats[1]), note), ((seats[2], seats[3]), 2.0 - note)):
+            entries.append(DuoEntry(u1, f'joueur{u1}', u2, f'joueur{u2}', [(updated_at, value)]))
+    return entries
+
+
+def _games_db(rng, games, players=16, month_only=False):
+    """In-memory database with users and finished games (created this month if month_only)."""
+    db = sqlite3.connect(':memory:')
+    migrate(db)
+    db.executemany(
+        "INSERT INTO users (id, username, password_hash, created_at) VALUES (?, ?, 'x', '2025-01-01T00:00:00')",
+        [(i, f'joueur{i}') for i in range(1, players + 1)],
+    )
+    now = datetime.now()
+    first = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    rows = []
+    seats = []
+    for game_id in range(1, games + 1):
+        if month_only:
+            created = first + timedelta(minutes=rng.randrange(max(1, int((now - first).total_seconds() // 60))))
+        else:
+            created = datetime(2024, 1, 1) + timedelta(hours=game_id)
+        points_a = rng.randint(0, 1500)
+        rows.append((game_id, created.isoformat(timespec='seconds'), created.isoformat(timespec='seconds'), points_a, 1500 - points_a))
+        for position, user_id in enumerate(rng.sample(range(1, players + 1), 4)):
+            seats.append((game_id, user_id, 'AB'[position // 2], position % 2 + 1))
+    db.executemany(
+        "INSERT INTO games (id, created_at, updated_at, created_by, state, points_team_a, points_team_b) VALUES (?, ?, ?, 1, 'terminee', ?, ?)",
+        rows,
+    )
+    db.executemany("INSERT INTO game_players (game_id, user_id, team, position) VALUES (?, ?, ?, ?)", seats)
+    db.commit()
+    # Journal and projections (duo_notes) as the write path would have left them
+    backfill_events(db)
+    catch_up_all(db)
+    return db
+
+
+def _timestamps(rng, count):
+    start = datetime(2024, 1, 1)
+    return [(start + timedelta(seconds=rng.randrange(60 * 60 * 24 * 365))).isoformat(timespec='seconds') for _ in range(count)]
+
+
+# Each setup returns (callable timed, resources to close afterwards)
+def _bench_compute_score(rng, size, _context):
+    hands = _score_inputs(rng, size)
+    return (lambda: [compute_score(hand) for hand in hands]), ()
+
+
+def _bench_weighted_score(rng, size, _context):
+    notes = _notes(rng, size)
+    return (lambda: _compute_weighted_score(notes, alpha=2.0, lambda_=-0.2, k=0.3)), ()
+
+
+def _bench_rank_duo_entries(rng, size, _context):
+    entries = _duo_entries(rng, size)
+    return (lambda: rank_duo_entries(entries)), ()
+
+
+def _bench_get_duo_rankings(rng, size, _context):
+    db = _games_db(rng, size)
+    return (lambda: get_duo_rankings(db)), (db,)
+
+
+def _bench_day_heatmap(rng, size, _context):
+    db = _games_db(rng, size, month_only=True)
+    return (lambda: get_day_heatmap(db)), (db,)
+
+
+def _bench_fr_datetime(rng, size, context):
+    fr_datetime = context['fr_datetime']
+    values = _timestamps(rng, size)
+    return (lambda: [fr_datetime(value) for value in values]), ()
+
+
+# name -> (setup, sizes, what one unit of size is)
+BENCHMARKS = {
+    'scores.compute_score': (_bench_compute_score, (100, 1000, 10000), 'manche'),
+    'duo_ranking._compute_weighted_score': (_bench_weighted_score, (10, 100, 1000), 'note'),
+    'duo_ranking.rank_duo_entries': (_bench_rank_duo_entries, (100, 1000, 10000), 'partie'),
+    'duo_ranking.get_duo_rankings': (_bench_get_duo_rankings, (100, 1000, 5000), 'partie'),
+    'get_day_heatmap.get_day_heatmap': (_bench_day_heatmap, (100, 1000, 10000), 'partie du mois'),
+    'filters.fr_datetime': (_bench_fr_datetime, (100, 1000, 10000), 'date'),
+}
+
+
+def _measure(fn, repeat: int, min_time: float):
+    timer = timeit.Timer(fn)
+    number, _elapsed = timer.autorange()
+    # autorange aims at 0.2 s per series; scale to min_time
+    number = max(1, int(number * min_time / 0.2))
+    timings = [elapsed / number for elapsed in timer.repeat(repeat=repeat, number=number)]
+    return number, timings
+
+
+def run_benchmarks(context: dict, names=None, repeat: int = 5, min_time: float = 0.2, quick: bool = False, seed: int = 1) -> dict:
+    """Run the selected benchmarks (all by default; names are matched as substrings).
+
+    context: objects that only exist in a running app ({'fr_datetime': <jinja filter>}).
+    quick: only the smallest size of each benchmark.
+    Returns {'created_at', 'python', 'machine', 'results': {'<name>[<size>]': {...}}}.
+    """
+    results = {}
+    for name, (setup, sizes, unit) in BENCHMARKS.items():
+        if names and not any(pattern in name for pattern in names):
+            continue
+        for size in sizes[:1] if quick else sizes:
+            fn, resources = setup(random.Random(seed), size, context)
+            try:
+                number, timings = _measure(fn, repeat, min_time)
+            finally:
+                for resource in resources:
+                    resource.close()
+            best = min(timings)
+            results[f'{name}[{size}]'] = {
+                'name': name,
+                'size': size,
+                'unit': unit,
+                'number': number,
+                'repeat': repeat,
+                'best_ms': round(best * 1000, 4),
+                'median_ms': round(statistics.median(timings) * 1000, 4),
+                'per_item_us': round(best * 1e6 / size, 4),
+            }
+    return {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': f"{platform.system()} {platform.machine()}",
+        'results': results,
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold_pct: float = 25.0) -> list:
+    """[(key, baseline best_ms, current best_ms, change %, regressed)] for keys in both runs."""
+    rows = []
+    for key, result in current['results'].items():
+        reference = baseline.get('results', {}).get(key)
+        if reference is None:
+            continue
+        before, after = reference['best_ms'], result['best_ms']
+        change = (after - before) / before * 100 if before else 0.0
+        rows.append((key, before, after, round(change, 1), change > threshold_pct))
+    return rows
@@ -0,0 +1,160 @@
+"""Résumé hebdomadaire du club envoyé par email (commande ``flask send-digest``).
+
+Toutes les données sont calculées en une seule passe pour l'ensemble du club
+(une requête sur les parties de la période, une lecture des notes de duos classées
+deux fois : aujourd'hui et au début de la période), puis chaque résumé est
+simplement mis en forme et envoyé sur une seule session SMTP.
+"""
+from contextlib import closing
+from datetime import datetime
+
+from db import users as users_repo
+from services.duo_ranking import fetch_duo_game_notes, rank_duo_entries
+from services.email_service import MESSAGE_ERRORS, SmtpSession
+
+
+def _fetch_period_games(db, since: str):
+    with closing(db.cursor()) as cur:
+        cur.execute(
+            """
+            SELECT g.id, g.state, g.points_team_a, g.points_team_b, g.winner_team, gp.user_id, u.username, gp.team
+            FROM games g
+            JOIN game_players gp ON gp.game_id = g.id
+            JOIN users u ON u.id = gp.user_id
+            WHERE g.updated_at >= ?
+            ORDER BY g.id
+            """,
+            (since,),
+        )
+        rows = cur.fetchall()
+        cur.execute("SELECT COUNT(*) FROM hands WHERE created_at >= ?", (since,))
+        hands_count = cur.fetchone()[0]
+    return rows, hands_count
+
+
+def _duo_ranks(rankings):
+    """{(u1, u2): (rang, duo)} à partir d'un classement trié."""
+    return {tuple(d['user_ids']): (index, d) for index, d in enumerate(rankings, start=1)}
+
+
+def build_digest_data(db, since: datetime, duo_params: dict) -> dict:
+    """Calcule en une passe les données du résumé pour tous les joueurs."""
+    since_iso = since.isoformat(timespec='seconds')
+    rows, hands_count = _fetch_period_games(db, since_iso)
+
+    players = {}
+    games = {}
+    for game_id, state, points_a, points_b, winner_team, user_id, username, team in rows:
+        games[game_id] = (state, points_a, points_b)
+        p = players.setdefault(user_id, {'username': username, 'played': 0, 'won': 0, 'lost': 0, 'ongoing': 0})
+        p['played'] += 1
+        if state != 'terminee':
+            p['ongoing'] += 1
+        elif team == winner_team:
+            p['won'] += 1
+        else:
+            p['lost'] += 1
+
+    entries = fetch_duo_game_notes(db)
+    params = dict(duo_params, limit=0)
+    current = rank_duo_entries(entries, **params)
+    previous = rank_duo_entries([e for e in entries if (e.notes[0][0] or '') < since_iso], **params)
+    current_ranks = _duo_ranks(current)
+    previous_ranks = _duo_ranks(previous)
+
+    best_duo = {}
+    for key, (rank, duo) in current_ranks.items():
+        prev = previous_ranks.get(key)
+        movement = (prev[0] - rank) if prev else None
+        for user_id in key:
+            if user_id not in best_duo or rank < best_duo[user_id]['rank']:
+                best_duo[user_id] = {'rank': rank, 'duo': duo, 'movement': movement}
+
+    biggest_win = None
+    for game_id, (state, points_a, points_b) in games.items():
+        if state != 'terminee':
+            continue
+        margin = abs(points_a - points_b)
+        if biggest_win is None or margin > biggest_win['margin']:
+            biggest_win = {'game_id': game_id, 'margin': margin, 'winner': max(points_a, points_b), 'loser': min(points_a, points_b)}
+    most_active = max(players.values(), key=lambda p: p['played'], default=None)
+
+    return {
+        'since': since,
+        'players': players,
+        'best_duo': best_duo,
+        'highlights': {
+            'games': len(games),
+            'hands': hands_count,
+            'top_duo': current[0] if current else None,
+            'most_active': most_active,
+            'biggest_win': biggest_win,
+        },
+    }
+
+
+def render_digest(user_id: int, username: str, data: dict):
+    """Retourne (sujet, corps) du résumé d'un joueur."""
+    since = data['since'].strftime('%d/%m')
+    lines = [f'Bonjour {username},', '']
+    stats = data['players'].get(user_id)
+    if stats:
+        lines.append(f"Votre semaine au club (depuis le {since}) :")
+        lines.append(
+            f"- Parties jouées : {stats['played']} ({stats['won']} victoire(s), "
+            f"{stats['lost']} défaite(s), {stats['ongoing']} en cours)"
+        )
+    else:
+        lines.append(f"Vous n'avez pas joué depuis le {since}, le tapis vous attend !")
+    best = data['best_duo'].get(user_id)
+    if best:
+        movement = best['movement']
+        if movement is None:
+            trend = 'nouveau'
+        elif movement > 0:
+            trend = f'+{movement} place(s)'
+        elif movement < 0:
+            trend = f'{movement} place(s)'
+        else:
+            trend = 'stable'
+        lines.append(f"- Meilleur duo : {best['duo']['duo_name']}, {best['rank']}e du classement ({trend})")
+
+    h = data['highlights']
+    lines.extend(['', 'Les temps forts du club :', f"- {h['games']} partie(s) et {h['hands']} manche(s) jouées"])
+    if h['top_duo']:
+        note = h['top_duo']['note_display']
+        lines.append(f"- Duo n°1 : {h['top_duo']['duo_name']}" + (f" (note {note})" if note is not None else ''))
+    if h['most_active'] and h['most_active']['played']:
+        lines.append(f"- Joueur le plus actif : {h['most_active']['username']} ({h['most_active']['played']} parties)")
+    if h['biggest_win']:
+        w = h['biggest_win']
+        lines.append(f"- Plus large victoire : partie #{w['game_id']}, {w['winner']} à {w['loser']}")
+    lines.extend(['', 'À bientôt autour du tapis !'])
+    return 'Votre semaine à SansCoeurCDX', '\n'.join(lines)
+
+
+def send_digests(db, since: datetime, duo_params: dict, *, session_factory=SmtpSession, dry_run: bool = False) -> dict:
+    """Envoie le résumé à chaque joueur actif ayant un email, sur une seule session SMTP."""
+    data = build_digest_data(db, since, duo_params)
+    recipients = users_repo.list_users_with_email(db)
+    result = {'sent': 0, 'failed': 0, 'errors': [], 'preview': None}
+    if dry_run:
+        if recipients:
+            result['preview'] = render_digest(recipients[0][0], recipients[0][1], data)
+        return result
+    with session_factory() as smtp:
+        for index, (user_id, username, email) in enumerate(recipients):
+            subject, body = render_digest(user_id, username, data)
+            try:
+                smtp.send(email, subject, body)
+            except MESSAGE_ERRORS as e:
+                result['failed'] += 1
+                result['errors'].append((email, f"{type(e).__name__}: {e}"))
+                continue
+            except Exception as e:
+                # Serveur injoignable : inutile de tenter les destinataires suivants
+                result['failed'] += len(recipients) - index
+                result['errors'].append((email, f"{type(e).__name__}: {e}"))
+                break
+            result['sent'] += 1
+    return result
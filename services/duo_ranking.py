@@ -34,7 +34,7 @@ class DuoEntry:
     notes: List[Tuple[str, float]]
 
 
-def _fetch_duo_game_notes(db) -> List[DuoEntry]:
+def fetch_duo_game_notes(db) -> List[DuoEntry]:
     """Récupère pour chaque partie terminée les duos (paires sur la même équipe)
     et la note brute pt_fait/pt_total pour cette partie.
 
@@ -43,22 +43,19 @@ def _fetch_duo_game_notes(db) -> List[DuoEntry]:
     """
     entries: List[DuoEntry] = []
     with closing(db.cursor()) as cur:
-        # On prend chaque paire (u1,u2) sur la même équipe dans une partie finie
-        # On attache les points de l'équipe de la paire et la date de mise à jour de la partie
+        # Chaque paire (u1,u2) d'une même équipe dans une partie finie, avec les points de son
+        # équipe et la date de mise à jour de la partie : tenue à jour par la projection
+        # duo_notes (db/projections.py) à chaque écriture
         cur.execute(
             """
             SELECT 
-                g.updated_at,
-                CASE WHEN gp1.team = 'A' THEN g.points_team_a ELSE g.points_team_b END AS team_points,
-                (g.points_team_a + g.points_team_b) AS total_points,
+                p.updated_at, p.team_points, p.total_points,
                 u1.id, u1.username,
                 u2.id, u2.username
-            FROM games g
-            JOIN game_players gp1 ON gp1.game_id = g.id
-            JOIN game_players gp2 ON gp2.game_id = g.id AND gp2.team = gp1.team AND gp2.user_id > gp1.user_id
-            JOIN users u1 ON u1.id = gp1.user_id
-            JOIN users u2 ON u2.id = gp2.user_id
-            WHERE g.state = 'terminee'
+            FROM projection_duo_notes p
+            JOIN users u1 ON u1.id = p.user1_id
+            JOIN users u2 ON u2.id = p.user2_id
+            WHERE p.finished = 1
             """
         )
         for updated_at, team_points, total_points, u1_id, u1_name, u2_id, u2_name in cur.fetchall():
@@ -144,7 +141,22 @@ def get_duo_rankings(
     }
     """
     # 1) Récup toutes les notes par duo/partie
-    entries = _fetch_duo_game_notes(db)
+    entries = fetch_duo_game_notes(db)
+    return rank_duo_entries(entries, alpha=alpha, lambda_=lambda_, k=k, A=A, B=B, min_games=min_games, limit=limit)
+
+
+def rank_duo_entries(
+    entries: List[DuoEntry],
+    *,
+    alpha: float = 2.0,
+    lambda_: float = -0.2,
+    k: float = 0.3,
+    A: float = 100.0,
+    B: float = 100.0,
+    min_games: int = 1,
+    limit: int = 50,
+) -> List[Dict]:
+    """Classe des entrées déjà chargées (permet de recalculer un classement passé sans relire la base)."""
     # 2) regrouper par duo
     grouped = _group_duo_entries(entries)
 
@@ -0,0 +1,157 @@
+"""File d'envoi des emails (table email_outbox) et expéditeur en arrière-plan.
+
+Les requêtes web se contentent d'insérer le message (``enqueue_email``) ; un thread
+dédié (ou la commande ``flask outbox run``) réclame les messages dus par lots et les
+envoie sur une seule connexion SMTP authentifiée, avec nouvelles tentatives espacées
+exponentiellement en cas d'échec. En multi-club, le même thread parcourt la file de
+chaque base de club.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from db import outbox as outbox_repo
+from db.transactions import configure_connection
+from services.email_service import MESSAGE_ERRORS, SmtpSession
+
+logger = logging.getLogger(__name__)
+
+# Un message resté 'sending' plus longtemps appartient à un expéditeur arrêté brutalement
+STALE_CLAIM_DELAY = timedelta(minutes=10)
+
+_wake = threading.Event()
+_worker = None
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+def _iso(dt: datetime) -> str:
+    return dt.isoformat(timespec='seconds')
+
+
+def enqueue_email(db, to_email: str, subject: str, body: str):
+    email_id = outbox_repo.enqueue_email(db, to_email, subject, body, _iso(datetime.utcnow()))
+    _wake.set()
+    return email_id
+
+
+def _record_failure(db, row, error: Exception, now: datetime, max_attempts: int, retry_base: float) -> str:
+    email_id, attempts = row[0], row[4] + 1
+    message = f"{type(error).__name__}: {error}"[:500]
+    if attempts >= max_attempts:
+        outbox_repo.mark_failed(db, email_id, message)
+        return 'failed'
+    delay = retry_base * (2 ** (attempts - 1))
+    outbox_repo.mark_retry(db, email_id, message, _iso(now + timedelta(seconds=delay)))
+    return 'retried'
+
+
+def process_outbox(db, *, batch_size: int = 50, max_attempts: int = 5, retry_base: float = 60.0,
+                   session_factory=SmtpSession, now: datetime = None) -> dict:
+    """Envoie un lot d'emails dus sur une seule session SMTP.
+
+    Retourne les compteurs {'sent', 'retried', 'failed'} du lot.
+    """
+    now = now or datetime.utcnow()
+    result = {'sent': 0, 'retried': 0, 'failed': 0}
+    outbox_repo.release_stale_claims(db, _iso(now - STALE_CLAIM_DELAY))
+    rows = outbox_repo.claim_due_emails(db, uuid.uuid4().hex, _iso(now), batch_size)
+    if not rows:
+        return result
+
+    try:
+        session = session_factory()
+    except Exception as e:
+        for row in rows:
+            result[_record_failure(db, row, e, now, max_attempts, retry_base)] += 1
+        return result
+
+    with session:
+        for index, row in enumerate(rows):
+            email_id, to_email, subject, body, _attempts = row
+            try:
+                session.send(to_email, subject, body)
+            except MESSAGE_ERRORS as e:
+                result[_record_failure(db, row, e, now, max_attempts, retry_base)] += 1
+                continue
+            except Exception as e:
+                # Serveur injoignable ou connexion perdue : le reste du lot est reporté
+                for pending in rows[index:]:
+                    result[_record_failure(db, pending, e, now, max_attempts, retry_base)] += 1
+                break
+            outbox_repo.mark_sent(db, email_id, _iso(datetime.utcnow()))
+            result['sent'] += 1
+    return result
+
+
+class OutboxWorker(threading.Thread):
+    def __init__(self, db_paths, *, poll_interval: float, batch_size: int, max_attempts: int, retry_base: float):
+        super().__init__(name='email-outbox', daemon=True)
+        self.db_paths = list(db_paths)
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        _wake.set()
+
+    def _connection(self, connections: dict, db_path: str):
+        db = connections.get(db_path)
+        # Une base de club jamais ouverte n'a pas encore de file (ni de schéma)
+        if db is None and os.path.exists(db_path):
+            db = connections[db_path] = sqlite3.connect(db_path)
+            configure_connection(db)
+        return db
+
+    def run(self):
+        connections = {}
+        try:
+            while not self._stop_event.is_set():
+                full_batch = False
+                for db_path in self.db_paths:
+                    db = self._connection(connections, db_path)
+                    if db is None:
+                        continue
+                    try:
+                        result = process_outbox(
+                            db,
+                            batch_size=self.batch_size,
+                            max_attempts=self.max_attempts,
+                            retry_base=self.retry_base,
+                        )
+                        full_batch = full_batch or sum(result.values()) >= self.batch_size
+                    except Exception:
+                        logger.exception("Échec du traitement de la file d'emails (%s)", db_path)
+                if not full_batch:
+                    _wake.wait(self.poll_interval)
+                    _wake.clear()
+        finally:
+            for db in connections.values():
+                db.close()
+
+
+def start_outbox_worker(app):
+    """Démarre (une fois par processus) le thread d'envoi des emails."""
+    global _worker, _worker_pid
+    pid = os.getpid()
+    if _worker is not None and _worker_pid == pid and _worker.is_alive():
+        return _worker
+    with _worker_lock:
+        if _worker is None or _worker_pid != pid or not _worker.is_alive():
+            registry = app.extensions.get('tenants')
+            _worker = OutboxWorker(
+                [registry.path(slug) for slug in registry.slugs()] if registry is not None else [app.config['DATABASE']],
+                poll_interval=app.config['EMAIL_OUTBOX_POLL_INTERVAL'],
+                batch_size=app.config['EMAIL_OUTBOX_BATCH_SIZE'],
+                max_attempts=app.config['EMAIL_OUTBOX_MAX_ATTEMPTS'],
+                retry_base=app.config['EMAIL_OUTBOX_RETRY_BASE'],
+            )
+            _worker_pid = pid
+            _worker.start()
+    return _worker
@@ -4,6 +4,10 @@ from typing import Optional
 from email.message import EmailMessage
 
 
+# Errors tied to a single message: the connection can still be used for the next ones
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, ValueError)
+
+
 def _get_bool_env(name: str, default: bool = False) -> bool:
     val = os.environ.get(name)
     if val is None:
@@ -65,64 +69,108 @@ def _build_test_message(sender: str, to_email: str, username: Optional[str] = No
     return msg
 
 
-def send_test_email(to_email: str, username: Optional[str] = None):
-    if not to_email:
-        raise ValueError("Adresse email du destinataire manquante")
-
-    cfg = _load_smtp_config()
-    msg = _build_test_message(cfg['sender'] or cfg['user'], to_email, username=username)
-
+def _open_connection(cfg):
+    """Open an SMTP/SMTP_SSL connection, negotiate TLS and log in if credentials are set."""
     if cfg['use_ssl']:
-        with smtplib.SMTP_SSL(cfg['host'], cfg['port'], timeout=cfg['timeout']) as server:
-            if cfg['user'] and cfg['password']:
-                server.login(cfg['user'], cfg['password'])
-            server.send_message(msg)
-            return True
+        server = smtplib.SMTP_SSL(cfg['host'], cfg['port'], timeout=cfg['timeout'])
     else:
-        with smtplib.SMTP(cfg['host'], cfg['port'], timeout=cfg['timeout']) as server:
+        server = smtplib.SMTP(cfg['host'], cfg['port'], timeout=cfg['timeout'])
+    try:
+        if not cfg['use_ssl']:
             server.ehlo()
             if cfg['use_tls']:
                 server.starttls()
                 server.ehlo()
-            if cfg['user'] and cfg['password']:
-                server.login(cfg['user'], cfg['password'])
-            server.send_message(msg)
-            return True
+        if cfg['user'] and cfg['password']:
+            server.login(cfg['user'], cfg['password'])
+    except Exception:
+        server.close()
+        raise
+    return server
 
 
-def send_email(to_email: str, subject: str, body_text: str):
-    """Send a plain-text email using SMTP config from environment."""
-    if not to_email:
-        raise ValueError("Adresse email du destinataire manquante")
-    cfg = _load_smtp_config()
-    sender = cfg['sender'] or cfg['user']
-    if not sender:
-        raise ValueError("Adresse d'expédition introuvable (SMTP_FROM ou SMTP_USER)")
+def _build_message(sender: str, to_email: str, subject: str, body_text: str) -> EmailMessage:
     msg = EmailMessage()
     msg['From'] = sender
     msg['To'] = to_email
     msg['Subject'] = subject
     msg.set_content(body_text)
+    return msg
 
-    if cfg['use_ssl']:
-        with smtplib.SMTP_SSL(cfg['host'], cfg['port'], timeout=cfg['timeout']) as server:
-            if cfg['user'] and cfg['password']:
-                server.login(cfg['user'], cfg['password'])
-            server.send_message(msg)
-            return True
-    else:
-        with smtplib.SMTP(cfg['host'], cfg['port'], timeout=cfg['timeout']) as server:
-            server.ehlo()
-            if cfg['use_tls']:
-                server.starttls()
-                server.ehlo()
-            if cfg['user'] and cfg['password']:
-                server.login(cfg['user'], cfg['password'])
-            server.send_message(msg)
-            return True
+
+class SmtpSession:
+    """Authenticated SMTP connection reused for several messages.
+
+    The connection is opened lazily on the first send and reopened once if the
+    server dropped it in between.
+    """
+
+    def __init__(self, cfg=None):
+        self.cfg = cfg or _load_smtp_config()
+        self.sender = self.cfg['sender'] or self.cfg['user']
+        if not self.sender:
+            raise ValueError("Adresse d'expédition introuvable (SMTP_FROM ou SMTP_USER)")
+        self._server = None
+
+    def send(self, to_email: str, subject: str, body_text: str):
+        if not to_email:
+            raise ValueError("Adresse email du destinataire manquante")
+        msg = _build_message(self.sender, to_email, subject, body_text)
+        if self._server is None:
+            self._server = _open_connection(self.cfg)
+        try:
+            self._server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self._server = _open_connection(self.cfg)
+            self._server.send_message(msg)
+        return True
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                self._server.close()
+            self._server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def send_test_email(to_email: str, username: Optional[str] = None):
+    if not to_email:
+        raise ValueError("Adresse email du destinataire manquante")
+
+    cfg = _load_smtp_config()
+    msg = _build_test_message(cfg['sender'] or cfg['user'], to_email, username=username)
+
+    server = _open_connection(cfg)
+    try:
+        server.send_message(msg)
+        return True
+    finally:
+        server.quit()
+
+
+def send_email(to_email: str, subject: str, body_text: str, db=None):
+    """Send a plain-text email using SMTP config from environment.
+
+    When a database connection is given, the message is only queued in the
+    email_outbox table and delivered later by the background sender.
+    """
+    if not to_email:
+        raise ValueError("Adresse email du destinataire manquante")
+    if db is not None:
+        from services.email_outbox import enqueue_email
+        return enqueue_email(db, to_email, subject, body_text)
+    with SmtpSession() as smtp:
+        return smtp.send(to_email, subject, body_text)
 
 
-def send_registration_email(to_email: str, username: Optional[str] = None):
+def send_registration_email(to_email: str, username: Optional[str] = None, db=None):
     subject = 'Création de votre compte SansCoeurCDX'
     lines = [
         'Bonjour' + (f' {username}' if username else '') + ',',
@@ -132,10 +180,10 @@ def send_registration_email(to_email: str, username: Optional[str] = None):
         '',
         'Merci et à bientôt !',
     ]
-    return send_email(to_email, subject, '\n'.join(lines))
+    return send_email(to_email, subject, '\n'.join(lines), db=db)
 
 
-def send_account_activated_email(to_email: str, username: Optional[str] = None):
+def send_account_activated_email(to_email: str, username: Optional[str] = None, db=None):
     subject = 'Votre compte SansCoeurCDX est activé'
     lines = [
         'Bonjour' + (f' {username}' if username else '') + ',',
@@ -145,10 +193,10 @@ def send_account_activated_email(to_email: str, username: Optional[str] = None):
         '',
         'Bon jeu !',
     ]
-    return send_email(to_email, subject, '\n'.join(lines))
+    return send_email(to_email, subject, '\n'.join(lines), db=db)
 
 
-def send_email_update_confirmation(to_email: str, username: Optional[str] = None, old_email: Optional[str] = None):
+def send_email_update_confirmation(to_email: str, username: Optional[str] = None, old_email: Optional[str] = None, db=None):
     subject = 'Confirmation de modification de votre adresse email'
     lines = [
         'Bonjour' + (f' {username}' if username else '') + ',',
@@ -162,10 +210,10 @@ def send_email_update_confirmation(to_email: str, username: Optional[str] = None
         '',
         'Si vous n\'êtes pas à l\'origine de ce changement, veuillez contacter un administrateur au plus vite.',
     ])
-    return send_email(to_email, subject, '\n'.join(lines))
+    return send_email(to_email, subject, '\n'.join(lines), db=db)
 
 
-def send_password_reset_email(to_email: str, username: Optional[str], reset_url: str):
+def send_password_reset_email(to_email: str, username: Optional[str], reset_url: str, db=None):
     subject = 'Réinitialisation de votre mot de passe'
     lines = [
         'Bonjour' + (f' {username}' if username else '') + ',',
@@ -176,4 +224,4 @@ def send_password_reset_email(to_email: str, username: Optional[str], reset_url:
         '',
         'Si vous n’êtes pas à l’origine de cette demande, vous pouvez ignorer cet email.',
     ]
-    return send_email(to_email, subject, '\n'.join(lines))
+    return send_email(to_email, subject, '\n'.join(lines), db=db)
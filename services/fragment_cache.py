@@ -0,0 +1,86 @@
+"""Cache de fragments de templates rendus.
+
+Extension Jinja fournissant un bloc ``{% cache 'nom', cle1, cle2 %}...{% endcache %}`` :
+le HTML produit est conservé en mémoire (LRU par processus) sous la clé formée par
+le nom et les valeurs des expressions. Les clés incluent la version des données
+(``app_meta.data_version``), donc une écriture invalide naturellement les fragments
+partagés ; les parties personnalisées restent en dehors des blocs ``cache``.
+En multi-club, la clé est préfixée par le club courant (``g.tenant``).
+"""
+import threading
+from collections import OrderedDict
+
+from flask import g, has_app_context
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+class FragmentStore:
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(self.max_entries, 1):
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total * 100, 2) if total else 0,
+            }
+
+
+fragment_store = FragmentStore()
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render_cached', [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, key_parts, caller):
+        tenant = g.get('tenant') if has_app_context() else None
+        key = '|'.join('' if p is None else str(p) for p in [tenant, *key_parts])
+        cached = fragment_store.get(key)
+        if cached is not None:
+            return cached
+        rendered = Markup(caller())
+        fragment_store.set(key, rendered)
+        return rendered
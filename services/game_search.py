@@ -0,0 +1,130 @@
+"""Recherche de parties (page /games/search et /games/search.json).
+
+Lit les filtres de la query string, pagine par curseur (created_at, id) et mesure le
+temps de chaque requête ; les compteurs sont exposés dans ``/admin/metrics``.
+"""
+import threading
+import time
+from datetime import date
+
+from db import games as games_repo
+
+STATES = ('en_cours', 'terminee', 'annulee')
+
+
+def _int_arg(args, name, errors):
+    raw = (args.get(name) or '').strip()
+    if not raw:
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        errors.append(f"Valeur invalide pour {name}.")
+        return None
+
+
+def _date_arg(args, name, errors):
+    raw = (args.get(name) or '').strip()
+    if not raw:
+        return None
+    try:
+        return date.fromisoformat(raw).isoformat()
+    except ValueError:
+        errors.append(f"Date invalide pour {name} (AAAA-MM-JJ).")
+        return None
+
+
+def _user_ids(args, name, errors):
+    ids = []
+    for raw in args.getlist(name):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            ids.append(int(raw))
+        except ValueError:
+            errors.append(f"Joueur invalide pour {name}.")
+    return ids
+
+
+def parse_filters(args):
+    """Build the search_games filters from request args. Returns (filters, errors)."""
+    errors = []
+    filters = {
+        'player': _int_arg(args, 'player', errors),
+        'partners': _user_ids(args, 'partner', errors),
+        'opponents': _user_ids(args, 'opponent', errors),
+        'date_from': _date_arg(args, 'from', errors),
+        'date_to': _date_arg(args, 'to', errors),
+        'state': (args.get('state') or '').strip() or None,
+        'target': _int_arg(args, 'target', errors),
+        'min_margin': _int_arg(args, 'min_margin', errors),
+        'max_margin': _int_arg(args, 'max_margin', errors),
+    }
+    if filters['state'] is not None and filters['state'] not in STATES:
+        errors.append("État inconnu.")
+        filters['state'] = None
+    if (filters['partners'] or filters['opponents']) and not filters['player']:
+        errors.append("Choisissez un joueur pour filtrer par partenaire ou adversaire.")
+        filters['partners'] = filters['opponents'] = []
+    return filters, errors
+
+
+def encode_cursor(row) -> str:
+    return f"{row[1]}_{row[0]}"
+
+
+def decode_cursor(raw):
+    """'<created_at>_<id>' -> (created_at, id), or None if missing/invalid."""
+    created_at, sep, game_id = (raw or '').rpartition('_')
+    if not sep or not created_at or not game_id.isdigit():
+        return None
+    return created_at, int(game_id)
+
+
+class SearchTimings:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.slow = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms: float, slow_ms: float) -> bool:
+        """Record one query; return True if it took at least slow_ms."""
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+            is_slow = elapsed_ms >= slow_ms
+            if is_slow:
+                self.slow += 1
+            return is_slow
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'queries': self.count,
+                'slow_queries': self.slow,
+                'avg_ms': round(self.total_ms / self.count, 2) if self.count else 0,
+                'max_ms': round(self.max_ms, 2),
+            }
+
+
+search_timings = SearchTimings()
+
+
+def run_search(db, filters: dict, per_page: int, cursor=None, slow_ms: float = 200.0) -> dict:
+    """One page of results: {'rows', 'next_cursor', 'elapsed_ms', 'slow'}."""
+    started = time.perf_counter()
+    rows = games_repo.search_games(db, filters, per_page, after=decode_cursor(cursor))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    slow = search_timings.record(elapsed_ms, slow_ms)
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    return {
+        'rows': rows,
+        'next_cursor': encode_cursor(rows[-1]) if has_next else None,
+        'elapsed_ms': round(elapsed_ms, 2),
+        'slow': slow,
+    }
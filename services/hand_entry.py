@@ -0,0 +1,161 @@
+"""Validation et calcul d'une manche saisie (formulaires et envoi groupé).
+
+``build_hand`` applique les règles de saisie (contrat, belotes selon l'atout, preneur
+joueur de la partie) puis calcule le score avec ``compute_score`` ; les formulaires
+d'ajout et de modification et l'envoi groupé de ``/games/<id>/hands.json`` (saisie hors
+ligne) partagent ainsi exactement les mêmes messages d'erreur.
+"""
+import re
+
+from services.scores import compute_score
+
+SPECIAL_CONTRACTS = ('Capot', 'Générale')
+# Clés d'idempotence générées par le client (crypto.randomUUID() ou équivalent)
+CLIENT_KEY_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+_TRUE = (True, 1, '1', 'on', 'true')
+
+
+class InvalidHand(ValueError):
+    """Manche refusée; category est la catégorie du message flash."""
+
+    def __init__(self, message: str, category: str = 'danger'):
+        super().__init__(message)
+        self.category = category
+
+
+def _flag(value) -> int:
+    return 1 if value in _TRUE else 0
+
+
+def _int(value) -> int:
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)
+    return int(value or 0)
+
+
+def form_fields(form) -> dict:
+    """The hand fields of a submitted form (request.form)."""
+    return {
+        name: form.get(name)
+        for name in ('taker_user_id', 'contract', 'trump', 'score_team_a', 'score_team_b',
+                     'belote_a', 'belote_b', 'coinche', 'surcoinche', 'general')
+    }
+
+
+def build_hand(data: dict, players) -> dict:
+    """Validate the fields of one hand and score it.
+
+    data: form_fields() or one hand of a JSON batch (same keys, flags as booleans or 'on').
+    players: rows of games.load_players (user_id, username, team).
+    Returns the columns of hands.insert_hand: taker_user_id, contract, trump, score_a,
+    score_b, pre_a, pre_b, coinche, surcoinche, capot_team, belote_a, belote_b, general.
+    Raises InvalidHand.
+    """
+    try:
+        taker_user_id = _int(data.get('taker_user_id')) or None
+        pre_a = _int(data.get('score_team_a'))
+        pre_b = _int(data.get('score_team_b'))
+    except (TypeError, ValueError):
+        raise InvalidHand('Scores invalides.')
+    contract_raw = str(data.get('contract') or '').strip()
+    trump = str(data.get('trump') or '').strip() or None
+    coinche = _flag(data.get('coinche'))
+    surcoinche = _flag(data.get('surcoinche'))
+    try:
+        belote_a = _int(data.get('belote_a'))
+        belote_b = _int(data.get('belote_b'))
+    except (TypeError, ValueError):
+        raise InvalidHand('Belotes invalides.')
+    general = _flag(data.get('general'))
+    contract = None
+    if contract_raw:
+        if contract_raw in SPECIAL_CONTRACTS:
+            contract = contract_raw
+        else:
+            try:
+                c_val = int(contract_raw)
+                if c_val < 80 or c_val > 180 or (c_val % 10 != 0):
+                    raise ValueError()
+                contract = str(c_val)
+            except ValueError:
+                raise InvalidHand('Contrat invalide: choisissez un nombre entre 80 et 180 (pas de 10) ou un contrat spécial.')
+    trump_norm = (trump or '').lower()
+    if trump_norm == 'sans atout':
+        if belote_a > 0 or belote_b > 0:
+            raise InvalidHand('En Sans atout, aucune belote n\'est autorisée.', 'warning')
+    elif trump_norm == 'tout atout':
+        if (belote_a + belote_b) > 4:
+            raise InvalidHand('En Tout atout, il ne peut y avoir que 4 belotes au total (cumulé A+B).', 'warning')
+    elif (belote_a + belote_b) > 1:
+        raise InvalidHand('Avec un atout couleur, une seule belote au total (A+B) est autorisée.', 'warning')
+    taker_team = None
+    if taker_user_id:
+        taker_team = next((p[2] for p in players if p[0] == taker_user_id), None)
+        if taker_team is None:
+            raise InvalidHand("Le preneur doit être un joueur de la partie.")
+    if not contract:
+        raise InvalidHand('Veuillez choisir un contrat.', 'warning')
+    if not taker_team:
+        raise InvalidHand('Veuillez choisir un preneur.', 'warning')
+    computed = compute_score({
+        "A": {"pre_score": pre_a, "belote": belote_a},
+        "B": {"pre_score": pre_b, "belote": belote_b},
+        "coinche": coinche,
+        "surcoinche": surcoinche,
+        "general": general,
+        "taker_team": taker_team,
+        "contract": contract,
+        "trump": trump,
+    })
+    capot_team = None
+    if pre_a == 162 and pre_b == 0:
+        capot_team = 'A'
+    elif pre_b == 162 and pre_a == 0:
+        capot_team = 'B'
+    return {
+        'taker_user_id': taker_user_id,
+        'contract': contract,
+        'trump': trump,
+        'score_a': int(computed.get("A", 0)),
+        'score_b': int(computed.get("B", 0)),
+        'pre_a': pre_a,
+        'pre_b': pre_b,
+        'coinche': coinche,
+        'surcoinche': surcoinche,
+        'capot_team': capot_team,
+        'belote_a': belote_a,
+        'belote_b': belote_b,
+        'general': general,
+    }
+
+
+def build_batch(items, players, max_hands: int):
+    """Validate a JSON batch: returns (hands, results).
+
+    hands: [(client key, hand dict)] ready for hands.insert_hands, in submission order.
+    results: {client key: {'status': 'invalid', 'error': message}} for refused hands.
+    Raises InvalidHand when the batch itself is malformed.
+    """
+    if not isinstance(items, list) or not items:
+        raise InvalidHand('Aucune manche à enregistrer.')
+    if len(items) > max_hands:
+        raise InvalidHand(f'Trop de manches dans un envoi (maximum {max_hands}).')
+    hands = []
+    results = {}
+    seen = set()
+    for item in items:
+        key = item.get('key') if isinstance(item, dict) else None
+        if not isinstance(key, str) or not CLIENT_KEY_RE.match(key):
+            raise InvalidHand("Chaque manche doit avoir une clé d'envoi valide.")
+        if key in seen:
+            # Same hand queued twice on the client: the first copy decides
+            continue
+        seen.add(key)
+        try:
+            hands.append((key, build_hand(item, players)))
+        except InvalidHand as exc:
+            results[key] = {'status': 'invalid', 'error': str(exc)}
+    return hands, results
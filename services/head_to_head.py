@@ -0,0 +1,172 @@
+"""Matrice des confrontations entre tous les joueurs, calculée en une passe.
+
+Une seule lecture des parties terminées remplit des matrices carrées NumPy indexées par joueur :
+parties et victoires côte à côte (partenaires) et face à face (adversaires), du point de
+vue du joueur en ligne. La matrice est gardée en mémoire pour une version des données
+(``app_meta.data_version``), par club ; les statistiques personnelles et la heatmap de
+``/statistiques`` en sont extraites sans autre requête.
+"""
+import threading
+from contextlib import closing
+from itertools import groupby
+
+import numpy as np
+
+
+def _square(n):
+    return np.zeros((n, n), dtype=np.int32)
+
+
+class HeadToHead:
+    def __init__(self, players):
+        self.players = list(players)
+        self.index = {user_id: i for i, (user_id, _username) in enumerate(self.players)}
+        n = len(self.players)
+        self.games_played = np.zeros(n, dtype=np.int32)
+        self.partner_games = _square(n)
+        self.partner_wins = _square(n)
+        self.opponent_games = _square(n)
+        self.opponent_wins = _square(n)
+        self.opponent_losses = _square(n)
+
+    def add_game(self, seats, winner):
+        """seats: [(player index, team)] of one finished game; winner: 'A', 'B' or None (draw)."""
+        if not seats:
+            return
+        players = np.array([i for i, _team in seats], dtype=np.intp)
+        teams = np.array([team for _i, team in seats])
+        won = teams == winner
+        lost = ~won if winner is not None else np.zeros(len(seats), dtype=bool)
+        np.add.at(self.games_played, players, 1)
+        # Every ordered pair of distinct seats, split into partners and opponents
+        same_team = teams[:, None] == teams[None, :]
+        rows, cols = np.nonzero(same_team & ~np.eye(len(seats), dtype=bool))
+        partners = (players[rows], players[cols])
+        np.add.at(self.partner_games, partners, 1)
+        np.add.at(self.partner_wins, partners, won[rows])
+        rows, cols = np.nonzero(~same_team)
+        opponents = (players[rows], players[cols])
+        np.add.at(self.opponent_games, opponents, 1)
+        np.add.at(self.opponent_wins, opponents, won[rows])
+        np.add.at(self.opponent_losses, opponents, lost[rows])
+
+
+def compute_head_to_head(db) -> HeadToHead:
+    with closing(db.cursor()) as cur:
+        cur.execute("SELECT id, username FROM users ORDER BY username")
+        matrix = HeadToHead(cur.fetchall())
+        cur.execute(
+            """
+            SELECT gp.game_id, gp.user_id, gp.team, g.winner_team
+            FROM games g
+            JOIN game_players gp ON gp.game_id = g.id
+            WHERE g.state = 'terminee'
+            ORDER BY gp.game_id
+            """
+        )
+        for _game_id, rows in groupby(cur, key=lambda row: row[0]):
+            rows = list(rows)
+            winner = rows[0][3]
+            seats = [(matrix.index[user_id], team) for _gid, user_id, team, _winner in rows if user_id in matrix.index]
+            matrix.add_game(seats, winner)
+    return matrix
+
+
+class HeadToHeadCache:
+    """Dernière matrice calculée par club, valable tant que data_version ne change pas."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db, data_version):
+        scope = getattr(db, 'tenant', None)
+        with self._lock:
+            entry = self._entries.get(scope)
+            if entry is not None and entry[0] == data_version:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        matrix = compute_head_to_head(db)
+        with self._lock:
+            self._entries[scope] = (data_version, matrix)
+        return matrix
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+head_to_head_cache = HeadToHeadCache()
+
+
+def _rate(wins, games):
+    return round((wins / games * 100), 2) if games > 0 else 0
+
+
+def player_view(matrix: HeadToHead, user_id: int) -> dict:
+    """Same result as statistics.get_player_vs_player_statistics, sliced from the matrix."""
+    i = matrix.index.get(user_id)
+    if i is None:
+        return {'opponents': [], 'partners': []}
+    opponents = []
+    partners = []
+    for j, (other_id, other_name) in enumerate(matrix.players):
+        games = int(matrix.opponent_games[i, j])
+        if games:
+            wins = int(matrix.opponent_wins[i, j])
+            opponents.append({
+                'opponent_id': other_id,
+                'opponent_name': other_name,
+                'games_played': games,
+                'wins': wins,
+                'losses': int(matrix.opponent_losses[i, j]),
+                'win_rate': _rate(wins, games),
+            })
+        games = int(matrix.partner_games[i, j])
+        if games:
+            wins = int(matrix.partner_wins[i, j])
+            partners.append({
+                'partner_id': other_id,
+                'partner_name': other_name,
+                'games_played': games,
+                'wins': wins,
+                'win_rate': _rate(wins, games),
+            })
+    opponents.sort(key=lambda o: (o['wins'], o['games_played']), reverse=True)
+    partners.sort(key=lambda p: (p['wins'], p['games_played']), reverse=True)
+    return {'opponents': opponents, 'partners': partners}
+
+
+def heatmap(matrix: HeadToHead, limit: int = 20) -> dict:
+    """Win rates of the most active players against / alongside each other.
+
+    Cells are None on the diagonal and for pairs that never met, else {'games', 'wins', 'rate'}.
+    """
+    ranked = sorted(
+        (i for i, played in enumerate(matrix.games_played.tolist()) if played),
+        key=lambda i: (-matrix.games_played[i], matrix.players[i][1].lower()),
+    )[:limit]
+
+    def grid(games, wins):
+        games, wins = games.tolist(), wins.tolist()
+        return [
+            [
+                {'games': games[i][j], 'wins': wins[i][j], 'rate': _rate(wins[i][j], games[i][j])}
+                if i != j and games[i][j] else None
+                for j in ranked
+            ]
+            for i in ranked
+        ]
+
+    return {
+        'players': [matrix.players[i][1] for i in ranked],
+        'opponents': grid(matrix.opponent_games, matrix.opponent_wins),
+        'partners': grid(matrix.partner_games, matrix.partner_wins),
+    }
@@ -0,0 +1,85 @@
+"""Histogrammes des points du preneur, regroupés en SQL.
+
+Les points exacts marqués par l'équipe du preneur sont comptés par mois dans
+``monthly_rollups`` (dimension ``taker_points``, et ``taker_points:<dimension>`` par
+preneur, atout ou contrat, voir db/rollups.py) ; une seule requête les regroupe par
+tranches de ``width`` points sur la période demandée (ou tous les mois). Le résultat est
+fait de tableaux alignés sur les tranches, prêts pour Chart.js.
+"""
+from contextlib import closing
+
+from db.rollups import HISTOGRAM_DIMENSIONS
+
+DIMENSIONS = tuple(HISTOGRAM_DIMENSIONS)
+# Bornes de la largeur des tranches (points)
+MIN_WIDTH = 1
+MAX_WIDTH = 500
+
+
+def _month_filter(window):
+    if window is None:
+        return "", ()
+    return " AND month BETWEEN ? AND ?", tuple(window)
+
+
+def _rows(cur, width: int, by, window):
+    """(key, bucket start, count) ordered by key then bucket; key is '' without dimension."""
+    months, params = _month_filter(window)
+    if by is None:
+        key = "''"
+        points = "CAST(bucket AS INTEGER)"
+        dimension = 'taker_points'
+    else:
+        # bucket is '<key>|<points>'; keys (users, trumps, contracts) never contain '|'
+        key = "substr(bucket, 1, instr(bucket, '|') - 1)"
+        points = "CAST(substr(bucket, instr(bucket, '|') + 1) AS INTEGER)"
+        dimension = f'taker_points:{by}'
+    cur.execute(
+        f"""
+        SELECT {key} AS key, ({points} / ?) * ? AS start, SUM(n)
+        FROM monthly_rollups
+        WHERE dimension = ?{months}
+        GROUP BY key, start
+        HAVING SUM(n) > 0
+        ORDER BY key, start
+        """,
+        (width, width, dimension, *params),
+    )
+    return cur.fetchall()
+
+
+def _labels(cur, by, keys):
+    if by != 'taker':
+        return {key: key for key in keys}
+    ids = [int(key) for key in keys]
+    names = {}
+    if ids:
+        cur.execute(f"SELECT id, username FROM users WHERE id IN ({','.join('?' * len(ids))})", ids)
+        names = {str(user_id): username for user_id, username in cur.fetchall()}
+    return {key: names.get(key, f"#{key}") for key in keys}
+
+
+def taker_points_histogram(db, width: int = 10, by=None, window=None, max_series: int = 8) -> dict:
+    """Histogram of the points made by the taker's team per hand.
+
+    by: None, 'taker', 'trump' or 'contract' (one series per value, the max_series most frequent).
+    window: (first month, last month) as returned by statistics.parse_window, or None for all time.
+    Returns {'width', 'buckets': [bucket starts], 'series': [{'key', 'label', 'counts', 'total'}]},
+    each counts list aligned on buckets.
+    """
+    if by is not None and by not in HISTOGRAM_DIMENSIONS:
+        raise ValueError(f"Dimension inconnue: {by!r}")
+    width = max(MIN_WIDTH, min(MAX_WIDTH, int(width)))
+    with closing(db.cursor()) as cur:
+        rows = _rows(cur, width, by, window)
+        per_key = {}
+        for key, start, count in rows:
+            per_key.setdefault(key, {})[start] = count
+        ranked = sorted(per_key, key=lambda key: (-sum(per_key[key].values()), key))[:max(1, max_series)]
+        labels = _labels(cur, by, ranked)
+    buckets = sorted({start for key in ranked for start in per_key[key]})
+    series = []
+    for key in ranked:
+        counts = [per_key[key].get(start, 0) for start in buckets]
+        series.append({'key': key, 'label': labels[key], 'counts': counts, 'total': sum(counts)})
+    return {'width': width, 'buckets': buckets, 'series': series}
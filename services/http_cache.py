@@ -0,0 +1,68 @@
+"""Requêtes conditionnelles (ETag) pour les pages en lecture seule.
+
+Le validateur d'une vue est calculé avant la vue elle-même (requête SQL triviale) :
+si le client possède déjà la bonne version, on répond 304 sans exécuter les
+requêtes lourdes ni rendre le template.
+
+Aucun ``Last-Modified`` n'est envoyé : les dates de la base sont à la seconde près et ne
+suivent pas tout ce qui entre dans l'ETag (mois en cours, filtres), si bien qu'un client
+ne revalidant qu'avec ``If-Modified-Since`` recevrait un 304 périmé.
+"""
+import hashlib
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+
+
+def compute_etag(*parts) -> str:
+    raw = '|'.join('' if p is None else str(p) for p in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _is_not_modified(etag: str) -> bool:
+    return bool(request.if_none_match) and request.if_none_match.contains_weak(etag)
+
+
+def conditional_get(validator):
+    """Décorateur de vue Flask.
+
+    validator(*args, **kwargs) reçoit les mêmes arguments que la vue et retourne
+    les parts de l'ETag (tuple) ou None si la ressource ne peut pas être validée
+    (la vue est alors exécutée normalement, sans en-têtes de cache).
+
+    L'ETag combine les parts, l'endpoint et l'identité de session (la barre de
+    navigation et certains blocs dépendent de l'utilisateur connecté).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pas de validation pour les écritures ni quand un message flash attend d'être affiché
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(*args, **kwargs)
+            parts = validator(*args, **kwargs)
+            if parts is None:
+                return view(*args, **kwargs)
+            user_id = session.get('user_id')
+            etag = compute_etag(
+                request.endpoint, *parts,
+                user_id, session.get('user'), session.get('is_admin'),
+            )
+
+            if _is_not_modified(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if user_id:
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            else:
+                response.cache_control.public = True
+                response.cache_control.max_age = current_app.config.get('HTTP_CACHE_MAX_AGE', 0)
+                response.cache_control.must_revalidate = True
+            return response
+        return wrapper
+    return decorator
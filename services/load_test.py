@@ -0,0 +1,435 @@
+"""Test de charge HTTP : plusieurs tables qui comptent leurs points en même temps.
+
+``run_load_test`` démarre l'application sur un port local, avec une base jetable,
+puis fait jouer des clients HTTP (threads, ``urllib``) comme le ferait un soir de club :
+
+- chaque table connecte l'un de ses joueurs, crée sa partie par ``/games/new``, ajoute
+  ses manches par le formulaire de ``/games/<id>`` (puis recharge la page, comme le
+  navigateur après la redirection), en corrige ou en supprime parfois, et recommence une
+  partie quand la sienne est terminée ;
+- des spectateurs parcourent ``/games``, ``/statistiques`` et les parties en cours.
+
+Le scénario est un fichier JSON versionné (voir load_scenarios/). Le rapport donne
+le débit, les latences (p50/p95/p99) par opération, les réponses en erreur, les écritures
+abandonnées ou rejouées faute de verrou, la croissance de la base et la cohérence des
+totaux. Il est lui aussi en JSON, pour comparer deux versions (``compare_reports``).
+"""
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import closing
+from datetime import datetime
+
+from werkzeug.security import generate_password_hash
+
+from db import games as games_repo
+from db import hands as hands_repo
+from db import users as users_repo
+from db.group_commit import group_commit
+from db.schema import migrate
+from db.transactions import configure_connection, write_policy
+from services.write_stress import _percentile
+
+DEFAULTS = {
+    'name': 'sans-nom',
+    'tables': 4,
+    'spectators': 2,
+    'duration_s': 10.0,
+    # Une table commence une nouvelle partie quand la sienne est terminée, ou au plus tard
+    # après hands_per_game ajouts
+    'hands_per_game': 30,
+    'target_points': 1000,
+    'mix': {'add_hand': 0.8, 'edit_hand': 0.1, 'delete_hand': 0.1},
+    'spectator_pages': ['/games', '/statistiques', 'game'],
+    'think_time_ms': [0, 0],
+    'seed_games': 20,
+    'seed_hands': 10,
+    'seed': 1,
+    # Variables d'environnement de l'application testée (SQLITE_GROUP_COMMIT, ...)
+    'env': {},
+}
+
+PASSWORD = 'charge-test'
+TRUMPS = ('Pique', 'Trèfle', 'Carreau', 'Coeur', 'Sans atout', 'Tout atout')
+_HAND_LINK = re.compile(r'/games/\d+/hands/(\d+)/edit')
+
+
+def load_scenario(path: str) -> dict:
+    """Read a scenario file; missing keys take DEFAULTS. Raises ValueError on unknown keys."""
+    with open(path, encoding='utf-8') as fh:
+        data = json.load(fh)
+    unknown = sorted(set(data) - set(DEFAULTS))
+    if unknown:
+        raise ValueError(f"Clé(s) inconnue(s) dans le scénario: {', '.join(unknown)}")
+    scenario = {**DEFAULTS, **data}
+    scenario['mix'] = {**DEFAULTS['mix'], **data.get('mix', {})}
+    if scenario['tables'] < 1:
+        raise ValueError("Le scénario doit avoir au moins une table.")
+    return scenario
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Time the POST itself: redirects are reported as responses, not followed."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Client:
+    """One browser: its own cookies (session), timings recorded in the shared Recorder."""
+
+    def __init__(self, base_url: str, recorder):
+        self.base_url = base_url
+        self.recorder = recorder
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+
+    def request(self, operation: str, path: str, data: dict = None):
+        """Returns (status, body text); status 0 when the connection itself failed."""
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        try:
+            with self._opener.open(self.base_url + path, data=body, timeout=60) as response:
+                status, text = response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as exc:
+            status, text = exc.code, exc.read().decode('utf-8', 'replace')
+        except OSError:
+            status, text = 0, ''
+        self.recorder.record(operation, status, (time.perf_counter() - started) * 1000)
+        return status, text
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+
+    def record(self, operation: str, status: int, elapsed_ms: float):
+        with self._lock:
+            self.latencies.setdefault(operation, []).append(elapsed_ms)
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+            if status == 0 or status >= 400:
+                self.errors[operation] = self.errors.get(operation, 0) + 1
+
+
+def _connect(path):
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute('PRAGMA foreign_keys = ON')
+    configure_connection(db)
+    return db
+
+
+def _seed(path: str, scenario: dict, rng: random.Random):
+    """Players (4 per table, plus spectators) and some finished games for /statistiques."""
+    db = _connect(path)
+    try:
+        migrate(db)
+        now = '2025-01-01T00:00:00'
+        password_hash = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+        count = max(4, scenario['tables'] * 4 + scenario['spectators'])
+        users = [
+            users_repo.create_user_with_admin(db, f'charge{i}', password_hash, now, i == 0)
+            for i in range(count)
+        ]
+        for index in range(scenario['seed_games']):
+            players = rng.sample(users, 4)
+            game_id = games_repo.create_game(db, players[0], 1000, players, now)
+            for number in range(1, scenario['seed_hands'] + 1):
+                points_a = rng.randint(0, 162)
+                hands_repo.insert_hand(
+                    db, game_id, number, rng.choice(players), str(rng.choice(range(80, 170, 10))),
+                    rng.choice(TRUMPS[:4]), points_a, 162 - points_a, points_a, 162 - points_a,
+                    0, 0, None, 0, 0, 0, now,
+                )
+            games_repo.recompute_totals_and_update_game(db, game_id, 1000, now)
+        return users
+    finally:
+        db.close()
+
+
+def _hand_form(rng: random.Random, players) -> dict:
+    points_a = rng.randint(0, 162)
+    return {
+        'taker_user_id': rng.choice(players),
+        'contract': str(rng.choice(range(80, 170, 10))),
+        'trump': rng.choice(TRUMPS[:4]),
+        'score_team_a': points_a,
+        'score_team_b': 162 - points_a,
+        'belote_a': 0,
+        'belote_b': 0,
+    }
+
+
+def _db_size(path: str) -> int:
+    return sum(os.path.getsize(path + suffix) for suffix in ('', '-wal', '-journal') if os.path.exists(path + suffix))
+
+
+def _serve(app):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, name='load-test-server', daemon=True)
+    thread.start()
+    return server, thread
+
+
+def _set_env(overrides: dict) -> dict:
+    previous = {name: os.environ.get(name) for name in overrides}
+    for name, value in overrides.items():
+        os.environ[name] = str(value)
+    return previous
+
+
+def _restore_env(previous: dict):
+    for name, value in previous.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+
+def run_load_test(scenario: dict, app_factory) -> dict:
+    """Serve app_factory() on a throwaway database and play the scenario against it."""
+    rng = random.Random(scenario['seed'])
+    workdir = tempfile.mkdtemp(prefix='load-test-')
+    path = os.path.join(workdir, 'coinche.db')
+    env = {
+        'DATABASE': path,
+        'TENANTS': '',
+        'DEBUG': 'false',
+        'EMAIL_OUTBOX_WORKER': 'false',
+        # Every client logs in from 127.0.0.1
+        'AUTH_RATE_LIMIT_IP': 1000000,
+        'AUTH_RATE_LIMIT_USER': 1000000,
+        **scenario['env'],
+    }
+    previous = _set_env(env)
+    server = None
+    try:
+        users = _seed(path, scenario, rng)
+        size_before = _db_size(path)
+        app = app_factory()
+        # Plain HTTP on localhost: the session cookie must not be Secure
+        app.config['SESSION_COOKIE_SECURE'] = False
+        server, _thread = _serve(app)
+        base_url = f'http://127.0.0.1:{server.server_port}'
+        write_policy.reset()
+        recorder = Recorder()
+        active_games = []
+        lock = threading.Lock()
+        tables = [users[i * 4:(i + 1) * 4] for i in range(scenario['tables'])]
+        spectators = [users[(scenario['tables'] * 4 + i) % len(users)] for i in range(scenario['spectators'])]
+        low_ms, high_ms = scenario['think_time_ms']
+        mix = scenario['mix']
+        start = threading.Barrier(len(tables) + len(spectators) + 1)
+        deadline = [None]
+
+        def think(worker_rng):
+            if high_ms > 0:
+                time.sleep(worker_rng.uniform(low_ms, high_ms) / 1000)
+
+        def login(client, user_id):
+            client.request('login', '/login', {'username': f'charge{users.index(user_id)}', 'password': PASSWORD})
+
+        def table(index, players):
+            worker_rng = random.Random(scenario['seed'] * 1000 + index)
+            client = Client(base_url, recorder)
+            start.wait()
+            login(client, players[0])
+            game_id, hands_left, page = None, 0, ''
+            while time.monotonic() < deadline[0]:
+                if game_id is None or hands_left <= 0:
+                    client.request('create_game', '/games/new', {
+                        'team_a_player1': players[0], 'team_a_player2': players[1],
+                        'team_b_player1': players[2], 'team_b_player2': players[3],
+                        'target_points': scenario['target_points'],
+                    })
+                    status, text = client.request('find_game', f'/games/search.json?player={players[0]}&state=en_cours')
+                    found = json.loads(text).get('games') if status == 200 else None
+                    if not found:
+                        think(worker_rng)
+                        continue
+                    game_id, hands_left, page = found[0]['id'], scenario['hands_per_game'], ''
+                    with lock:
+                        active_games.append(game_id)
+                action = worker_rng.choices(list(mix), weights=list(mix.values()))[0]
+                hand_ids = _HAND_LINK.findall(page)
+                if action == 'add_hand' or not hand_ids:
+                    client.request('add_hand', f'/games/{game_id}', _hand_form(worker_rng, players))
+                    hands_left -= 1
+                elif action == 'edit_hand':
+                    client.request('edit_hand', f'/games/{game_id}/hands/{worker_rng.choice(hand_ids)}/edit', _hand_form(worker_rng, players))
+                else:
+                    client.request('delete_hand', f'/games/{game_id}/hands/{worker_rng.choice(hand_ids)}/delete', {})
+                _status, page = client.request('view_game', f'/games/{game_id}')
+                if 'id="handForm"' not in page:
+                    # Target reached: the add-hand form is gone
+                    with lock:
+                        if game_id in active_games:
+                            active_games.remove(game_id)
+                    game_id = None
+                think(worker_rng)
+
+        def spectator(index, user_id):
+            worker_rng = random.Random(scenario['seed'] * 1000 + 500 + index)
+            client = Client(base_url, recorder)
+            start.wait()
+            login(client, user_id)
+            while time.monotonic() < deadline[0]:
+                page = worker_rng.choice(scenario['spectator_pages'])
+                if page == 'game':
+                    with lock:
+                        game_id = worker_rng.choice(active_games) if active_games else None
+                    if game_id is not None:
+                        client.request('spectate:game', f'/games/{game_id}')
+                else:
+                    client.request(f'spectate:{page}', page)
+                think(worker_rng)
+
+        workers = [threading.Thread(target=table, args=(i, players)) for i, players in enumerate(tables)]
+        workers += [threading.Thread(target=spectator, args=(i, user_id)) for i, user_id in enumerate(spectators)]
+        for worker in workers:
+            worker.start()
+        deadline[0] = time.monotonic() + scenario['duration_s']
+        started = time.perf_counter()
+        start.wait()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        writes = write_policy.stats()
+        server.shutdown()
+        server = None
+
+        db = _connect(path)
+        try:
+            with closing(db.cursor()) as cur:
+                counts = {}
+                for table_name in ('games', 'hands', 'events'):
+                    cur.execute(f"SELECT COUNT(*) FROM {table_name}")
+                    counts[table_name] = cur.fetchone()[0]
+                cur.execute(
+                    """
+                    SELECT COUNT(*) FROM games g
+                    WHERE g.points_team_a != (SELECT COALESCE(SUM(score_team_a), 0) FROM hands h WHERE h.game_id = g.id)
+                       OR g.points_team_b != (SELECT COALESCE(SUM(score_team_b), 0) FROM hands h WHERE h.game_id = g.id)
+                    """
+                )
+                inconsistent = cur.fetchone()[0]
+        finally:
+            db.close()
+        size_after = _db_size(path)
+        return _report(scenario, recorder, elapsed, writes, counts, inconsistent, size_before, size_after)
+    finally:
+        if server is not None:
+            server.shutdown()
+        # The group commit writers of the throwaway database
+        group_commit.stop()
+        _restore_env(previous)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _summary(latencies) -> dict:
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'p50_ms': round(_percentile(values, 50), 2),
+        'p95_ms': round(_percentile(values, 95), 2),
+        'p99_ms': round(_percentile(values, 99), 2),
+        'max_ms': round(values[-1], 2) if values else 0,
+    }
+
+
+def _report(scenario, recorder, elapsed, writes, counts, inconsistent, size_before, size_after) -> dict:
+    all_latencies = [value for values in recorder.latencies.values() for value in values]
+    operations = {}
+    for name, values in sorted(recorder.latencies.items()):
+        operations[name] = {**_summary(values), 'errors': recorder.errors.get(name, 0)}
+    write_ops = ('create_game', 'add_hand', 'edit_hand', 'delete_hand')
+    writes_count = sum(operations.get(name, {}).get('count', 0) for name in write_ops)
+    return {
+        'scenario': scenario['name'],
+        'config': scenario,
+        'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'elapsed_s': round(elapsed, 2),
+        'requests': len(all_latencies),
+        'requests_per_s': round(len(all_latencies) / elapsed, 1) if elapsed else 0,
+        'writes_per_s': round(writes_count / elapsed, 1) if elapsed else 0,
+        'latency': _summary(all_latencies),
+        'operations': operations,
+        'status_codes': dict(sorted(recorder.statuses.items())),
+        'errors': sum(recorder.errors.values()),
+        'lock_errors': {
+            'busy_responses': recorder.statuses.get('503', 0),
+            'write_failures': writes['failures'],
+            'write_retries': writes['retries'],
+        },
+        'db': {
+            'size_before': size_before,
+            'size_after': size_after,
+            'growth_bytes': size_after - size_before,
+            'bytes_per_write': round((size_after - size_before) / writes_count, 1) if writes_count else 0,
+            **counts,
+        },
+        'inconsistent_games': inconsistent,
+    }
+
+
+# (metric path, higher is better) compared by compare_reports
+_COMPARED = (
+    (('requests_per_s',), True),
+    (('writes_per_s',), True),
+    (('latency', 'p95_ms'), False),
+    (('latency', 'p99_ms'), False),
+    (('errors',), False),
+    (('lock_errors', 'write_failures'), False),
+    (('db', 'bytes_per_write'), False),
+)
+
+
+def _get(report, keys):
+    value = report
+    for key in keys:
+        value = (value or {}).get(key)
+    return value
+
+
+def compare_reports(baseline: dict, current: dict, threshold_pct: float = 20.0) -> list:
+    """[(metric, baseline, current, change %, regressed)]; p99 of each operation included.
+
+    A metric regresses when it gets worse by more than threshold_pct (any increase for
+    error counters that were 0).
+    """
+    metrics = list(_COMPARED)
+    for name in sorted(set(baseline.get('operations', {})) | set(current.get('operations', {}))):
+        metrics.append((('operations', name, 'p99_ms'), False))
+    rows = []
+    for keys, higher_is_better in metrics:
+        before, after = _get(baseline, keys), _get(current, keys)
+        if before is None or after is None:
+            continue
+        if before:
+            change = (after - before) / before * 100
+        else:
+            change = 0.0 if after == before else float('inf')
+        worse = -change if higher_is_better else change
+        rows.append(('.'.join(keys), before, after, round(change, 1), worse > threshold_pct))
+    return rows
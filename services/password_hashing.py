@@ -0,0 +1,103 @@
+"""Hachage et vérification des mots de passe dans un pool borné.
+
+pbkdf2 est coûteux en CPU : les appels sont exécutés par un pool de taille fixe
+(threads, hashlib libérant le GIL, ou processus) avec une file d'attente limitée.
+Au-delà, ``HashPoolBusy`` est levée immédiatement plutôt que d'empiler le travail
+et d'affamer les autres requêtes.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+HASH_METHOD = 'pbkdf2:sha256'
+
+
+class HashPoolBusy(Exception):
+    """Le pool de hachage est saturé (ou n'a pas répondu à temps)."""
+
+
+def _generate(password: str) -> str:
+    return generate_password_hash(password, method=HASH_METHOD)
+
+
+class PasswordHasher:
+    def __init__(self, max_workers: int = 2, max_queue: int = 8, timeout: float = 10.0, use_processes: bool = False):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.use_processes = use_processes
+        # Un jeton par tâche en cours ou en attente; rendu quand la tâche se termine réellement
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=500)
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        pid = os.getpid()
+        with self._lock:
+            if self._executor is None or self._executor_pid != pid:
+                if self.use_processes:
+                    # multiprocessing n'est importé que si le pool de processus est demandé
+                    from concurrent.futures import ProcessPoolExecutor
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+                self._executor_pid = pid
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashPoolBusy()
+        started = time.perf_counter()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _f: self._slots.release())
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self.rejected += 1
+            raise HashPoolBusy()
+        with self._lock:
+            self.completed += 1
+            self._latencies.append(time.perf_counter() - started)
+        return result
+
+    def check(self, pwhash: str, password: str) -> bool:
+        return self._run(check_password_hash, pwhash, password)
+
+    def generate(self, password: str) -> str:
+        return self._run(_generate, password)
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = sorted(self._latencies)
+            completed, rejected = self.completed, self.rejected
+
+        def pct(p):
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+
+        return {
+            'workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'executor': 'process' if self.use_processes else 'thread',
+            'completed': completed,
+            'rejected': rejected,
+            'latency_ms_p50': pct(0.50),
+            'latency_ms_p95': pct(0.95),
+            'latency_ms_max': round(samples[-1] * 1000, 1) if samples else None,
+        }
@@ -0,0 +1,55 @@
+"""Limiteur en mémoire à fenêtre glissante (par processus)."""
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class SlidingWindowLimiter:
+    """Autorise au plus max_attempts tentatives par clé sur les window_seconds dernières secondes.
+
+    Le nombre de clés suivies est borné (les moins récemment utilisées sont oubliées).
+    """
+
+    def __init__(self, max_attempts: int, window_seconds: float, max_keys: int = 10000):
+        self.max_attempts = max_attempts
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._hits = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def hit(self, key: str) -> bool:
+        """Enregistre une tentative; retourne False si la clé a dépassé sa limite."""
+        if self.max_attempts <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+            self._hits.move_to_end(key)
+            while hits and now - hits[0] >= self.window_seconds:
+                hits.popleft()
+            if len(hits) >= self.max_attempts:
+                self.rejected += 1
+                return False
+            hits.append(now)
+            self.allowed += 1
+            while len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+            return True
+
+    def reset(self, key: str):
+        with self._lock:
+            self._hits.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'max_attempts': self.max_attempts,
+                'window_seconds': self.window_seconds,
+                'tracked_keys': len(self._hits),
+                'allowed': self.allowed,
+                'rejected': self.rejected,
+            }
@@ -1,29 +1,161 @@
-import json
+"""Vérification reCAPTCHA Enterprise.
+
+Le client réutilise une session HTTP keep-alive, borne les temps de connexion et de
+lecture, et protège l'inscription par un disjoncteur : après plusieurs échecs
+consécutifs de l'API, les appels sont court-circuités pendant un délai et la
+politique configurée (fail-open : on laisse passer, fail-closed : on refuse)
+s'applique sans attendre le réseau.
+"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
 import requests
+from requests.adapters import HTTPAdapter
 
-def verify_recaptcha(site_key: str, api_key: str, project_id: str, token: str, action: str = "REGISTER") -> dict:
+DEFAULT_ENDPOINT = "https://recaptchaenterprise.googleapis.com/v1/projects/{project_id}/assessments?key={api_key}"
 
-    url = f"https://recaptchaenterprise.googleapis.com/v1/projects/{project_id}/assessments?key={api_key}"
 
-    request_data = {
-        "event": {
-            "token": token,
-            "expectedAction": action,
-            "siteKey": site_key
-        }
-    }
+@dataclass
+class RecaptchaVerdict:
+    allowed: bool
+    # 'human', 'bot' ou 'unavailable' (API injoignable, réponse invalide, disjoncteur ouvert)
+    reason: str
+    score: Optional[float] = None
+
+
+class CircuitBreaker:
+    """Disjoncteur simple: fermé -> ouvert après N échecs consécutifs -> semi-ouvert après reset_timeout."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                # Un seul appel d'essai à la fois pour sonder l'API
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
 
-    headers = {
-        "Content-Type": "application/json"
-    }
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
 
-    try:
-        response = requests.post(url, headers=headers, json=request_data)
+
+class RecaptchaClient:
+    def __init__(self, site_key: str, api_key: str, project_id: str, *,
+                 endpoint: str = DEFAULT_ENDPOINT,
+                 connect_timeout: float = 2.0, read_timeout: float = 3.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 fail_open: bool = True, min_score: float = 0.3):
+        self.site_key = site_key
+        self.url = endpoint.format(project_id=project_id, api_key=api_key)
+        self.timeout = (connect_timeout, read_timeout)
+        self.fail_open = fail_open
+        self.min_score = min_score
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=10))
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=10))
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=500)
+        self._counters = {'calls': 0, 'human': 0, 'bot': 0, 'errors': 0, 'timeouts': 0, 'short_circuited': 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._counters[key] += 1
+
+    def _unavailable(self) -> RecaptchaVerdict:
+        return RecaptchaVerdict(allowed=self.fail_open, reason='unavailable')
+
+    def assess(self, token: str, action: str = "REGISTER") -> dict:
+        """Appelle l'API d'évaluation et retourne la réponse JSON (lève requests.RequestException ou ValueError)."""
+        request_data = {
+            "event": {
+                "token": token,
+                "expectedAction": action,
+                "siteKey": self.site_key
+            }
+        }
+        response = self.session.post(self.url, json=request_data, timeout=self.timeout)
         response.raise_for_status()
         return response.json()
-    except requests.RequestException as e:
-        return {
-            "success": False,
-            "error": str(e),
-            "status_code": response.status_code if 'response' in locals() else None
-        }
+
+    def verify(self, token: str, action: str = "REGISTER") -> RecaptchaVerdict:
+        if not self.breaker.allow_request():
+            self._count('short_circuited')
+            return self._unavailable()
+        self._count('calls')
+        started = time.perf_counter()
+        try:
+            data = self.assess(token, action)
+            score = float(data["riskAnalysis"]["score"])
+        except requests.Timeout:
+            self._count('timeouts')
+            self.breaker.record_failure()
+            return self._unavailable()
+        except (requests.RequestException, ValueError, KeyError, TypeError):
+            self._count('errors')
+            self.breaker.record_failure()
+            return self._unavailable()
+        finally:
+            with self._lock:
+                self._latencies.append(time.perf_counter() - started)
+        self.breaker.record_success()
+        if score <= self.min_score:
+            self._count('bot')
+            return RecaptchaVerdict(allowed=False, reason='bot', score=score)
+        self._count('human')
+        return RecaptchaVerdict(allowed=True, reason='human', score=score)
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = sorted(self._latencies)
+            counters = dict(self._counters)
+
+        def pct(p):
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+
+        counters.update({
+            'circuit': self.breaker.state,
+            'fail_open': self.fail_open,
+            'latency_ms_p50': pct(0.50),
+            'latency_ms_p95': pct(0.95),
+            'latency_ms_max': round(samples[-1] * 1000, 1) if samples else None,
+        })
+        return counters
@@ -0,0 +1,130 @@
+"""Mesure du temps de démarrage de l'application.
+
+``StartupTimings`` note la durée des étapes de ``create_app`` ; ``measure_cold_start``
+relance l'import de l'application dans un interpréteur neuf avec ``-X importtime``
+et ne garde que les modules de l'application et leurs dépendances directes.
+"""
+import json
+import os
+import sys
+import time
+
+# Modules chargés à la première utilisation (hors du chemin de démarrage)
+LAZY_MODULES = (
+    'services.scores',
+    'services.get_day_heatmap',
+    'services.statistics',
+    'services.duo_ranking',
+    'services.email_service',
+    'services.email_outbox',
+    'services.digest',
+    'services.recaptcha_check',
+    'services.game_search',
+    'services.head_to_head',
+    'services.histograms',
+    'services.win_probability',
+    'services.hand_entry',
+)
+
+APP_PACKAGES = ('app', 'db', 'services')
+
+_LAZY_MARKER = '--startup-report-lazy--'
+
+_PROBE = """
+import importlib, json, sys, time
+started = time.perf_counter()
+import {module} as target
+imported = time.perf_counter()
+app = target.{factory}()
+created = time.perf_counter()
+timings = app.extensions.get('startup_timings')
+sys.stderr.write({marker!r} + '\\n')
+sys.stderr.flush()
+lazy = {{}}
+for name in {lazy!r}:
+    t = time.perf_counter()
+    importlib.import_module(name)
+    lazy[name] = (time.perf_counter() - t) * 1000
+print(json.dumps({{
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'phases': timings.as_list() if timings else [],
+    'lazy': lazy,
+}}))
+"""
+
+
+class StartupTimings:
+    """Durées successives des étapes de create_app (chaque ``mark`` clôt l'étape en cours)."""
+
+    def __init__(self):
+        self._last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, name: str):
+        now = time.perf_counter()
+        self.phases.append((name, (now - self._last) * 1000))
+        self._last = now
+
+    def as_list(self) -> list:
+        return [[name, round(ms, 2)] for name, ms in self.phases]
+
+
+def _is_app_module(name: str) -> bool:
+    return name.split('.', 1)[0] in APP_PACKAGES
+
+
+def parse_importtime(lines) -> list:
+    """Parse ``-X importtime`` lines into (module, self_ms, cumulative_ms, parent) tuples."""
+    entries = []
+    for line in lines:
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            prefix, cumulative_us, name = line.rstrip('\n').split('|', 2)
+            self_us = int(prefix.split(':', 1)[1])
+            cumulative_us = int(cumulative_us)
+        except ValueError:
+            continue
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        entries.append([name.strip(), self_us / 1000, cumulative_us / 1000, depth, None])
+    # La sortie est en ordre postfixe : le parent d'un module est la ligne suivante de profondeur inférieure
+    pending = {}
+    for entry in entries:
+        for depth in [d for d in pending if d > entry[3]]:
+            for child in pending.pop(depth):
+                child[4] = entry[0]
+        pending.setdefault(entry[3], []).append(entry)
+    return [(name, self_ms, cumulative_ms, parent) for name, self_ms, cumulative_ms, _depth, parent in entries]
+
+
+def measure_cold_start(root_path: str, module: str = 'app', factory: str = 'create_app',
+                       lazy_modules=LAZY_MODULES, timeout: float = 120.0) -> dict:
+    """Import the application in a fresh interpreter and return its startup timings.
+
+    Only the application's own modules and the modules they import directly are kept,
+    sorted by cumulative import time.
+    """
+    import subprocess
+
+    script = _PROBE.format(module=module, factory=factory, marker=_LAZY_MARKER, lazy=tuple(lazy_modules))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        cwd=root_path, env=dict(os.environ), capture_output=True, text=True, timeout=timeout,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'startup probe failed')
+    stderr = proc.stderr.split(_LAZY_MARKER, 1)[0]
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['modules'] = sorted(
+        (
+            (name, round(self_ms, 2), round(cumulative_ms, 2))
+            for name, self_ms, cumulative_ms, parent in parse_importtime(stderr.splitlines())
+            if _is_app_module(name) or (parent is not None and _is_app_module(parent))
+        ),
+        key=lambda item: item[2],
+        reverse=True,
+    )
+    result['total_ms'] = result['import_ms'] + result['create_app_ms']
+    return result
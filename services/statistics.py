@@ -1,67 +1,177 @@
-"""Service pour calculer les statistiques du jeu de Contrée"""
+"""Service pour calculer les statistiques du jeu de Contrée
+
+Chaque fonction accepte un paramètre ``window`` optionnel : ``None`` pour toutes les
+parties, ou un couple de mois ``('AAAA-MM', 'AAAA-MM')`` (bornes incluses, voir
+``parse_window``) pour les seules parties créées pendant cette période. Les statistiques
+d'une période sont assemblées à partir de ``monthly_rollups`` (db/rollups.py), sans relire
+les manches.
+"""
 from contextlib import closing
+from datetime import date
+
+from services.histograms import taker_points_histogram
+
+
+def _rollups(cur, dimension, window=None):
+    """{bucket: (n, successes, points)}
+
+    Sans window : contribution des manches archivées (hand_rollups), à ajouter aux requêtes
+    sur les tables. Avec window : total de la période (monthly_rollups), qui remplace ces requêtes.
+    """
+    if window is None:
+        cur.execute("SELECT bucket, n, successes, points FROM hand_rollups WHERE dimension = ?", (dimension,))
+    else:
+        cur.execute(
+            """
+            SELECT bucket, SUM(n), SUM(successes), SUM(points)
+            FROM monthly_rollups
+            WHERE dimension = ? AND month BETWEEN ? AND ?
+            GROUP BY bucket
+            """,
+            (dimension, window[0], window[1]),
+        )
+    return {row[0]: (row[1], row[2], row[3]) for row in cur.fetchall()}
+
+
+def _rollup_count(cur, dimension, bucket='', window=None):
+    return _rollups(cur, dimension, window).get(bucket, (0, 0, 0))[0]
+
+
+def _month_shift(year, month, delta):
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
 
 
-def get_global_statistics(db):
+def _month(year, month):
+    return f"{year:04d}-{month:02d}"
+
+
+WINDOW_CHOICES = (
+    ('', 'Depuis toujours'),
+    ('month', 'Ce mois-ci'),
+    ('3m', '3 derniers mois'),
+    ('12m', '12 derniers mois'),
+    ('season', 'Saison en cours'),
+    ('year', 'Cette année'),
+)
+
+
+def parse_window(value, today=None, season_start_month=9):
+    """Turn a window= value into (first month, last month), or None for all time.
+
+    Accepted values: '' / 'all', 'month', '<N>m' (last N months including the current one),
+    'season' (since the last season start month), 'year', 'AAAA', 'AAAA-MM' and
+    'AAAA-MM..AAAA-MM'. Raises ValueError for anything else.
+    """
+    value = (value or '').strip().lower()
+    if value in ('', 'all'):
+        return None
+    today = today or date.today()
+    current = _month(today.year, today.month)
+    if value == 'month':
+        return current, current
+    if value.endswith('m') and value[:-1].isdigit() and 1 <= int(value[:-1]) <= 240:
+        return _month(*_month_shift(today.year, today.month, 1 - int(value[:-1]))), current
+    if value == 'season':
+        start_year = today.year if today.month >= season_start_month else today.year - 1
+        return _month(start_year, season_start_month), current
+    if value == 'year':
+        return _month(today.year, 1), current
+    if len(value) == 4 and value.isdigit():
+        return f"{value}-01", f"{value}-12"
+    start, sep, end = value.partition('..')
+    try:
+        first = date.fromisoformat(f"{start}-01")
+        last = date.fromisoformat(f"{end}-01") if sep else first
+    except ValueError:
+        raise ValueError(f"Période invalide: {value!r}") from None
+    if last < first:
+        raise ValueError(f"Période invalide: {value!r}")
+    return _month(first.year, first.month), _month(last.year, last.month)
+
+
+def get_global_statistics(db, window=None):
     """Récupère les statistiques globales de toutes les parties"""
     stats = {}
     
     with closing(db.cursor()) as cur:
-        cur.execute("SELECT COUNT(*) FROM games")
-        stats['total_games'] = cur.fetchone()[0]
-        
-        cur.execute("SELECT state, COUNT(*) FROM games GROUP BY state")
-        stats['games_by_state'] = {row[0]: row[1] for row in cur.fetchall()}
-        
-        cur.execute("SELECT COUNT(*) FROM hands")
-        stats['total_hands'] = cur.fetchone()[0]
+        if window:
+            games = _rollups(cur, 'games', window)
+            stats['games_by_state'] = {state: count for state, (count, _successes, _points) in games.items()}
+            stats['total_games'] = sum(stats['games_by_state'].values())
+            hands = games_with_hands = 0
+        else:
+            cur.execute("SELECT COUNT(*) FROM games")
+            stats['total_games'] = cur.fetchone()[0]
+            
+            cur.execute("SELECT state, COUNT(*) FROM games GROUP BY state")
+            stats['games_by_state'] = {row[0]: row[1] for row in cur.fetchall()}
+            
+            cur.execute("SELECT COUNT(*), COUNT(DISTINCT game_id) FROM hands")
+            hands, games_with_hands = cur.fetchone()
+        stats['total_hands'] = hands + _rollup_count(cur, 'hands', window=window)
+        games_with_hands += _rollup_count(cur, 'games_with_hands', window=window)
         
         cur.execute("SELECT COUNT(*) FROM users WHERE is_active = 1")
         stats['total_active_users'] = cur.fetchone()[0]
         
-        cur.execute("""
-            SELECT AVG(hand_count) 
-            FROM (SELECT game_id, COUNT(*) as hand_count FROM hands GROUP BY game_id)
-        """)
-        result = cur.fetchone()[0]
+        result = stats['total_hands'] / games_with_hands if games_with_hands else 0
         stats['avg_hands_per_game'] = round(result, 2) if result else 0
         
-        cur.execute("SELECT AVG(points_team_a + points_team_b) FROM games WHERE state = 'terminee'")
-        result = cur.fetchone()[0]
+        if window:
+            finished, _successes, points = games.get('terminee', (0, 0, 0))
+            result = points / finished if finished else 0
+        else:
+            cur.execute("SELECT AVG(points_team_a + points_team_b) FROM games WHERE state = 'terminee'")
+            result = cur.fetchone()[0]
         stats['avg_total_points'] = round(result, 2) if result else 0
         
     return stats
 
 
-def get_player_statistics(db):
+def _windowed_player_rows(cur, window):
+    """Rows of get_player_statistics' query for a window, from monthly_rollups."""
+    played = _rollups(cur, 'player', window)
+    finished = _rollups(cur, 'player_finished', window)
+    cur.execute("SELECT id, username FROM users WHERE is_active = 1")
+    rows = []
+    for user_id, username in cur.fetchall():
+        games_played, games_won, total_points = played.get(str(user_id), (0, 0, 0))
+        games_finished = finished.get(str(user_id), (0, 0, 0))[0]
+        rows.append((user_id, username, games_played, games_finished, games_won, total_points))
+    rows.sort(key=lambda row: (row[4], row[2]), reverse=True)
+    return rows
+
+
+def get_player_statistics(db, window=None):
     """Récupère les statistiques par joueur"""
     with closing(db.cursor()) as cur:
-        cur.execute("""
-            SELECT 
-                u.id,
-                u.username,
-                COUNT(DISTINCT gp.game_id) as games_played,
-                SUM(CASE WHEN g.state = 'terminee' THEN 1 ELSE 0 END) as games_finished,
-                SUM(CASE 
-                    WHEN g.state = 'terminee' AND gp.team = 'A' AND g.points_team_a > g.points_team_b THEN 1
-                    WHEN g.state = 'terminee' AND gp.team = 'B' AND g.points_team_b > g.points_team_a THEN 1
-                    ELSE 0
-                END) as games_won,
-                SUM(CASE 
-                    WHEN gp.team = 'A' THEN g.points_team_a
-                    WHEN gp.team = 'B' THEN g.points_team_b
-                    ELSE 0
-                END) as total_points_scored
-            FROM users u
-            LEFT JOIN game_players gp ON gp.user_id = u.id
-            LEFT JOIN games g ON g.id = gp.game_id
-            WHERE u.is_active = 1
-            GROUP BY u.id, u.username
-            ORDER BY games_won DESC, games_played DESC
-        """)
+        if window:
+            rows = _windowed_player_rows(cur, window)
+        else:
+            cur.execute("""
+                SELECT 
+                    u.id,
+                    u.username,
+                    COUNT(DISTINCT gp.game_id) as games_played,
+                    SUM(CASE WHEN g.state = 'terminee' THEN 1 ELSE 0 END) as games_finished,
+                    SUM(CASE WHEN gp.team = g.winner_team THEN 1 ELSE 0 END) as games_won,
+                    SUM(CASE 
+                        WHEN gp.team = 'A' THEN g.points_team_a
+                        WHEN gp.team = 'B' THEN g.points_team_b
+                        ELSE 0
+                    END) as total_points_scored
+                FROM users u
+                LEFT JOIN game_players gp ON gp.user_id = u.id
+                LEFT JOIN games g ON g.id = gp.game_id
+                WHERE u.is_active = 1
+                GROUP BY u.id, u.username
+                ORDER BY games_won DESC, games_played DESC
+            """)
+            rows = cur.fetchall()
         
         players = []
-        for row in cur.fetchall():
+        for row in rows:
             user_id, username, games_played, games_finished, games_won, total_points = row
             win_rate = round((games_won / games_finished * 100), 2) if games_finished > 0 else 0
             avg_points = round(total_points / games_played, 2) if games_played > 0 else 0
@@ -80,38 +190,49 @@ def get_player_statistics(db):
         return players
 
 
-def get_contract_statistics(db):
+def get_contract_statistics(db, window=None):
     """Récupère les statistiques sur les contrats"""
     with closing(db.cursor()) as cur:
-        cur.execute("""
-            SELECT contract, COUNT(*) as count
-            FROM hands
-            WHERE contract IS NOT NULL
-            GROUP BY contract
-            ORDER BY contract
-        """)
-        contracts_distribution = {row[0]: row[1] for row in cur.fetchall()}
+        contracts_distribution = {}
+        if not window:
+            cur.execute("""
+                SELECT contract, COUNT(*) as count
+                FROM hands
+                WHERE contract IS NOT NULL
+                GROUP BY contract
+                ORDER BY contract
+            """)
+            contracts_distribution = {row[0]: row[1] for row in cur.fetchall()}
+        for contract, (count, _successes, _points) in _rollups(cur, 'contract', window).items():
+            contracts_distribution[contract] = contracts_distribution.get(contract, 0) + count
+        contracts_distribution = dict(sorted(contracts_distribution.items()))
         
-        cur.execute("""
-            SELECT 
-                h.contract,
-                COUNT(*) as total,
-                SUM(CASE 
-                    WHEN gp.team = 'A' AND h.points_made_team_a >= CAST(h.contract AS INTEGER) THEN 1
-                    WHEN gp.team = 'B' AND h.points_made_team_b >= CAST(h.contract AS INTEGER) THEN 1
-                    ELSE 0
-                END) as success
-            FROM hands h
-            JOIN game_players gp ON gp.user_id = h.taker_user_id AND gp.game_id = h.game_id
-            WHERE h.contract NOT IN ('Capot', 'Générale')
-              AND h.contract IS NOT NULL
-            GROUP BY h.contract
-            ORDER BY h.contract
-        """)
+        totals = {}
+        if not window:
+            cur.execute("""
+                SELECT 
+                    h.contract,
+                    COUNT(*) as total,
+                    SUM(CASE 
+                        WHEN h.taker_team = 'A' AND h.points_made_team_a >= CAST(h.contract AS INTEGER) THEN 1
+                        WHEN h.taker_team = 'B' AND h.points_made_team_b >= CAST(h.contract AS INTEGER) THEN 1
+                        ELSE 0
+                    END) as success
+                FROM hands h
+                WHERE h.taker_team IS NOT NULL
+                  AND h.contract NOT IN ('Capot', 'Générale')
+                  AND h.contract IS NOT NULL
+                GROUP BY h.contract
+                ORDER BY h.contract
+            """)
+            totals = {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+        for contract, (count, successes, _points) in _rollups(cur, 'contract_success', window).items():
+            total, success = totals.get(contract, (0, 0))
+            totals[contract] = (total + count, success + successes)
         
         contract_success = []
-        for row in cur.fetchall():
-            contract, total, success = row
+        for contract in sorted(totals):
+            total, success = totals[contract]
             success_rate = round((success / total * 100), 2) if total > 0 else 0
             contract_success.append({
                 'contract': contract,
@@ -126,28 +247,28 @@ def get_contract_statistics(db):
         }
 
 
-def get_trump_statistics(db):
+def get_trump_statistics(db, window=None):
     """Récupère les statistiques sur les atouts"""
     with closing(db.cursor()) as cur:
-        cur.execute("""
-            SELECT trump, COUNT(*) as count
-            FROM hands
-            WHERE trump IS NOT NULL
-            GROUP BY trump
-            ORDER BY count DESC
-        """)
-        trump_distribution = {row[0]: row[1] for row in cur.fetchall()}
+        totals = {}
+        if not window:
+            cur.execute("""
+                SELECT trump, COUNT(*) as count, SUM(points_made_team_a + points_made_team_b) as total_points
+                FROM hands
+                WHERE trump IS NOT NULL
+                GROUP BY trump
+            """)
+            totals = {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+        for trump, (count, _successes, points) in _rollups(cur, 'trump', window).items():
+            total, total_points = totals.get(trump, (0, 0))
+            totals[trump] = (total + count, total_points + points)
         
-        cur.execute("""
-            SELECT 
-                trump,
-                AVG(points_made_team_a + points_made_team_b) as avg_points
-            FROM hands
-            WHERE trump IS NOT NULL
-            GROUP BY trump
-            ORDER BY avg_points DESC
-        """)
-        trump_avg_points = {row[0]: round(row[1], 2) for row in cur.fetchall()}
+        by_count = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
+        trump_distribution = {trump: count for trump, (count, _points) in by_count}
+        
+        averages = {trump: points / count for trump, (count, points) in totals.items()}
+        by_average = sorted(averages.items(), key=lambda item: item[1], reverse=True)
+        trump_avg_points = {trump: round(avg, 2) for trump, avg in by_average}
         
         return {
             'distribution': trump_distribution,
@@ -155,46 +276,60 @@ def get_trump_statistics(db):
         }
 
 
-def get_special_events_statistics(db):
+def get_special_events_statistics(db, window=None):
     """Récupère les statistiques sur les événements spéciaux"""
     with closing(db.cursor()) as cur:
-        cur.execute("SELECT COUNT(*) FROM hands WHERE coinche = 1")
-        coinches = cur.fetchone()[0]
-        
-        cur.execute("SELECT COUNT(*) FROM hands WHERE surcoinche = 1")
-        surcoinches = cur.fetchone()[0]
-        
-        cur.execute("SELECT COUNT(*) FROM hands WHERE capot_team IS NOT NULL")
-        capots = cur.fetchone()[0]
-        
-        cur.execute("""
-            SELECT capot_team, COUNT(*) as count
-            FROM hands
-            WHERE capot_team IS NOT NULL
-            GROUP BY capot_team
-        """)
-        capots_by_team = {row[0]: row[1] for row in cur.fetchall()}
+        archived = {event: count for event, (count, _successes, _points) in _rollups(cur, 'event', window).items()}
+        coinches = surcoinches = generales = total_belotes = 0
+        capots_by_team = {}
+        coinche_total = coinche_success = 0
         
-        cur.execute("SELECT COUNT(*) FROM hands WHERE general = 1")
-        generales = cur.fetchone()[0]
-        
-        cur.execute("SELECT SUM(belote_a + belote_b) FROM hands")
-        total_belotes = cur.fetchone()[0] or 0
+        if not window:
+            cur.execute("SELECT COUNT(*) FROM hands WHERE coinche = 1")
+            coinches = cur.fetchone()[0]
+            
+            cur.execute("SELECT COUNT(*) FROM hands WHERE surcoinche = 1")
+            surcoinches = cur.fetchone()[0]
+            
+            cur.execute("""
+                SELECT capot_team, COUNT(*) as count
+                FROM hands
+                WHERE capot_team IS NOT NULL
+                GROUP BY capot_team
+            """)
+            capots_by_team = {row[0]: row[1] for row in cur.fetchall()}
+            
+            cur.execute("SELECT COUNT(*) FROM hands WHERE general = 1")
+            generales = cur.fetchone()[0]
+            
+            cur.execute("SELECT SUM(belote_a + belote_b) FROM hands")
+            total_belotes = cur.fetchone()[0] or 0
+            
+            cur.execute("""
+                SELECT 
+                    COUNT(*) as total,
+                    SUM(CASE 
+                        WHEN h.taker_team = 'A' AND h.score_team_a > h.score_team_b THEN 1
+                        WHEN h.taker_team = 'B' AND h.score_team_b > h.score_team_a THEN 1
+                        ELSE 0
+                    END) as success
+                FROM hands h
+                WHERE h.coinche = 1
+                  AND h.taker_team IS NOT NULL
+            """)
+            coinche_stats = cur.fetchone()
+            coinche_total, coinche_success = coinche_stats if coinche_stats else (0, 0)
         
-        cur.execute("""
-            SELECT 
-                COUNT(*) as total,
-                SUM(CASE 
-                    WHEN gp.team = 'A' AND h.score_team_a > h.score_team_b THEN 1
-                    WHEN gp.team = 'B' AND h.score_team_b > h.score_team_a THEN 1
-                    ELSE 0
-                END) as success
-            FROM hands h
-            JOIN game_players gp ON gp.user_id = h.taker_user_id AND gp.game_id = h.game_id
-            WHERE h.coinche = 1
-        """)
-        coinche_stats = cur.fetchone()
-        coinche_total, coinche_success = coinche_stats if coinche_stats else (0, 0)
+        coinches += archived.get('coinche', 0)
+        surcoinches += archived.get('surcoinche', 0)
+        generales += archived.get('general', 0)
+        total_belotes += archived.get('belotes', 0)
+        for team, (count, _successes, _points) in _rollups(cur, 'capot_team', window).items():
+            capots_by_team[team] = capots_by_team.get(team, 0) + count
+        capots = sum(capots_by_team.values())
+        archived_total, archived_success, _points = _rollups(cur, 'coinche_taker', window).get('', (0, 0, 0))
+        coinche_total += archived_total
+        coinche_success = (coinche_success or 0) + archived_success
         coinche_success_rate = round((coinche_success / coinche_total * 100), 2) if coinche_total > 0 else 0
         
         return {
@@ -216,16 +351,8 @@ def get_player_vs_player_statistics(db, user_id):
                 u2.id,
                 u2.username,
                 COUNT(DISTINCT g.id) as games_played,
-                SUM(CASE 
-                    WHEN g.state = 'terminee' AND gp1.team = 'A' AND gp2.team = 'B' AND g.points_team_a > g.points_team_b THEN 1
-                    WHEN g.state = 'terminee' AND gp1.team = 'B' AND gp2.team = 'A' AND g.points_team_b > g.points_team_a THEN 1
-                    ELSE 0
-                END) as wins,
-                SUM(CASE 
-                    WHEN g.state = 'terminee' AND gp1.team = 'A' AND gp2.team = 'B' AND g.points_team_a < g.points_team_b THEN 1
-                    WHEN g.state = 'terminee' AND gp1.team = 'B' AND gp2.team = 'A' AND g.points_team_b < g.points_team_a THEN 1
-                    ELSE 0
-                END) as losses
+                SUM(CASE WHEN g.winner_team = gp1.team THEN 1 ELSE 0 END) as wins,
+                SUM(CASE WHEN g.winner_team = gp2.team THEN 1 ELSE 0 END) as losses
             FROM game_players gp1
             JOIN games g ON g.id = gp1.game_id
             JOIN game_players gp2 ON gp2.game_id = g.id AND gp2.team != gp1.team
@@ -254,11 +381,7 @@ def get_player_vs_player_statistics(db, user_id):
                 u2.id,
                 u2.username,
                 COUNT(DISTINCT g.id) as games_played,
-                SUM(CASE 
-                    WHEN g.state = 'terminee' AND gp1.team = 'A' AND g.points_team_a > g.points_team_b THEN 1
-                    WHEN g.state = 'terminee' AND gp1.team = 'B' AND g.points_team_b > g.points_team_a THEN 1
-                    ELSE 0
-                END) as wins
+                SUM(CASE WHEN g.winner_team = gp1.team THEN 1 ELSE 0 END) as wins
             FROM game_players gp1
             JOIN games g ON g.id = gp1.game_id
             JOIN game_players gp2 ON gp2.game_id = g.id AND gp2.team = gp1.team AND gp2.user_id != gp1.user_id
@@ -287,37 +410,55 @@ def get_player_vs_player_statistics(db, user_id):
         }
 
 
-def get_player_taking_statistics(db):
+def get_player_taking_statistics(db, window=None):
     """Récupère les statistiques sur les preneurs"""
     with closing(db.cursor()) as cur:
-        cur.execute("""
-            SELECT 
-                u.id,
-                u.username,
-                COUNT(*) as times_taken,
-                SUM(CASE 
-                    WHEN gp.team = 'A' AND h.points_made_team_a >= CAST(CASE WHEN h.contract IN ('Capot', 'Générale') THEN '162' ELSE h.contract END AS INTEGER) THEN 1
-                    WHEN gp.team = 'B' AND h.points_made_team_b >= CAST(CASE WHEN h.contract IN ('Capot', 'Générale') THEN '162' ELSE h.contract END AS INTEGER) THEN 1
-                    ELSE 0
-                END) as contracts_made,
-                AVG(CASE 
-                    WHEN gp.team = 'A' THEN h.points_made_team_a
-                    WHEN gp.team = 'B' THEN h.points_made_team_b
-                    ELSE 0
-                END) as avg_points_made
-            FROM hands h
-            JOIN users u ON u.id = h.taker_user_id
-            JOIN game_players gp ON gp.user_id = h.taker_user_id AND gp.game_id = h.game_id
-            WHERE h.taker_user_id IS NOT NULL
-            GROUP BY u.id, u.username
-            HAVING times_taken > 0
-            ORDER BY contracts_made DESC, times_taken DESC
-        """)
+        totals = {}
+        if not window:
+            cur.execute("""
+                SELECT 
+                    u.id,
+                    u.username,
+                    COUNT(*) as times_taken,
+                    SUM(CASE 
+                        WHEN h.taker_team = 'A' AND h.points_made_team_a >= CAST(CASE WHEN h.contract IN ('Capot', 'Générale') THEN '162' ELSE h.contract END AS INTEGER) THEN 1
+                        WHEN h.taker_team = 'B' AND h.points_made_team_b >= CAST(CASE WHEN h.contract IN ('Capot', 'Générale') THEN '162' ELSE h.contract END AS INTEGER) THEN 1
+                        ELSE 0
+                    END) as contracts_made,
+                    SUM(CASE 
+                        WHEN h.taker_team = 'A' THEN h.points_made_team_a
+                        WHEN h.taker_team = 'B' THEN h.points_made_team_b
+                        ELSE 0
+                    END) as points_made
+                FROM hands h
+                JOIN users u ON u.id = h.taker_user_id
+                WHERE h.taker_team IS NOT NULL
+                GROUP BY u.id, u.username
+                HAVING times_taken > 0
+            """)
+            totals = {row[0]: [row[1], row[2], row[3], row[4]] for row in cur.fetchall()}
+        
+        archived = {int(user_id): values for user_id, values in _rollups(cur, 'taker', window).items()}
+        missing = [user_id for user_id in archived if user_id not in totals]
+        if missing:
+            cur.execute(
+                f"SELECT id, username FROM users WHERE id IN ({','.join('?' * len(missing))})",
+                missing,
+            )
+            for user_id, username in cur.fetchall():
+                totals[user_id] = [username, 0, 0, 0]
+        for user_id, (count, successes, points) in archived.items():
+            if user_id in totals:
+                totals[user_id][1] += count
+                totals[user_id][2] += successes
+                totals[user_id][3] += points
+        
+        ranked = sorted(totals.items(), key=lambda item: (item[1][2], item[1][1]), reverse=True)
         
         takers = []
-        for row in cur.fetchall():
-            user_id, username, times_taken, contracts_made, avg_points = row
+        for user_id, (username, times_taken, contracts_made, points_made) in ranked:
             success_rate = round((contracts_made / times_taken * 100), 2) if times_taken > 0 else 0
+            avg_points = points_made / times_taken if times_taken > 0 else 0
             takers.append({
                 'user_id': user_id,
                 'username': username,
@@ -330,66 +471,61 @@ def get_player_taking_statistics(db):
         return takers
 
 
-def get_score_distribution(db):
-    """Récupère la distribution des scores par manche"""
-    with closing(db.cursor()) as cur:
-        cur.execute("""
-            SELECT 
-                CASE 
-                    WHEN gp.team = 'A' THEN h.points_made_team_a
-                    WHEN gp.team = 'B' THEN h.points_made_team_b
-                    ELSE 0
-                END as points_made,
-                COUNT(*) as count
-            FROM hands h
-            JOIN game_players gp ON gp.user_id = h.taker_user_id AND gp.game_id = h.game_id
-            WHERE h.taker_user_id IS NOT NULL
-            GROUP BY points_made
-            ORDER BY points_made
-        """)
-        
-        points_distribution = {}
-        for row in cur.fetchall():
-            points, count = row
-            bucket = (points // 10) * 10
-            points_distribution[bucket] = points_distribution.get(bucket, 0) + count
-        
-        return points_distribution
+def get_score_distribution(db, window=None, width=10):
+    """Récupère la distribution des scores par manche : {début de tranche: nombre de manches}"""
+    histogram = taker_points_histogram(db, width=width, window=window)
+    if not histogram['series']:
+        return {}
+    return dict(zip(histogram['buckets'], histogram['series'][0]['counts']))
+
 
+def _windowed_pair_rows(cur, window):
+    """Rows of get_team_performance's query for a window, from the 'duo' monthly rollups."""
+    duos = _rollups(cur, 'duo', window)
+    cur.execute("SELECT id, username FROM users")
+    names = dict(cur.fetchall())
+    rows = []
+    for duo, (games_played, games_won, points) in duos.items():
+        first, second = (int(user_id) for user_id in duo.split(':'))
+        if games_played > 0 and first in names and second in names:
+            rows.append((f"{names[first]} & {names[second]}", games_played, games_won, points / games_played))
+    rows.sort(key=lambda row: (row[2], row[1]), reverse=True)
+    return rows[:10]
 
-def get_team_performance(db):
+
+def get_team_performance(db, window=None):
     """Analyse la performance des paires de joueurs"""
     with closing(db.cursor()) as cur:
-        cur.execute("""
-            SELECT 
-                u1.username || ' & ' || u2.username as pair_name,
-                COUNT(DISTINCT g.id) as games_played,
-                SUM(CASE 
-                    WHEN g.state = 'terminee' AND gp1.team = 'A' AND g.points_team_a > g.points_team_b THEN 1
-                    WHEN g.state = 'terminee' AND gp1.team = 'B' AND g.points_team_b > g.points_team_a THEN 1
-                    ELSE 0
-                END) as games_won,
-                AVG(CASE 
-                    WHEN gp1.team = 'A' THEN g.points_team_a
-                    WHEN gp1.team = 'B' THEN g.points_team_b
-                    ELSE 0
-                END) as avg_points
-            FROM game_players gp1
-            JOIN game_players gp2 ON gp2.game_id = gp1.game_id 
-                AND gp2.team = gp1.team 
-                AND gp2.user_id > gp1.user_id
-            JOIN users u1 ON u1.id = gp1.user_id
-            JOIN users u2 ON u2.id = gp2.user_id
-            JOIN games g ON g.id = gp1.game_id
-            WHERE g.state = 'terminee'
-            GROUP BY gp1.user_id, gp2.user_id, u1.username, u2.username
-            HAVING games_played > 0
-            ORDER BY games_won DESC, games_played DESC
-            LIMIT 10
-        """)
+        if window:
+            rows = _windowed_pair_rows(cur, window)
+        else:
+            cur.execute("""
+                SELECT 
+                    u1.username || ' & ' || u2.username as pair_name,
+                    COUNT(DISTINCT g.id) as games_played,
+                    SUM(CASE WHEN g.winner_team = gp1.team THEN 1 ELSE 0 END) as games_won,
+                    AVG(CASE 
+                        WHEN gp1.team = 'A' THEN g.points_team_a
+                        WHEN gp1.team = 'B' THEN g.points_team_b
+                        ELSE 0
+                    END) as avg_points
+                FROM game_players gp1
+                JOIN game_players gp2 ON gp2.game_id = gp1.game_id 
+                    AND gp2.team = gp1.team 
+                    AND gp2.user_id > gp1.user_id
+                JOIN users u1 ON u1.id = gp1.user_id
+                JOIN users u2 ON u2.id = gp2.user_id
+                JOIN games g ON g.id = gp1.game_id
+                WHERE g.state = 'terminee'
+                GROUP BY gp1.user_id, gp2.user_id, u1.username, u2.username
+                HAVING games_played > 0
+                ORDER BY games_won DESC, games_played DESC
+                LIMIT 10
+            """)
+            rows = cur.fetchall()
         
         pairs = []
-        for row in cur.fetchall():
+        for row in rows:
             pair_name, games_played, games_won, avg_points = row
             win_rate = round((games_won / games_played * 100), 2) if games_played > 0 else 0
             pairs.append({
@@ -0,0 +1,54 @@
+"""Routage des requêtes vers un club (multi-club).
+
+``TenantMiddleware`` détermine le club d'une requête avant Flask, soit par sous-domaine
+(``club1.exemple.fr``), soit par préfixe d'URL (``/club1/...``). En mode préfixe, le
+préfixe est déplacé dans ``SCRIPT_NAME`` : les routes restent inchangées et ``url_for``
+produit des liens préfixés. Un club inconnu répond 404.
+"""
+from flask import request
+from flask.sessions import SecureCookieSessionInterface
+from werkzeug.exceptions import NotFound
+
+ENVIRON_KEY = 'sanscoeur.tenant'
+
+
+class TenantMiddleware:
+    def __init__(self, wsgi_app, registry, routing: str = 'prefix', base_domain: str = ''):
+        self.wsgi_app = wsgi_app
+        self.registry = registry
+        self.routing = routing
+        self.base_domain = base_domain.lower().lstrip('.')
+
+    def _from_host(self, environ):
+        host = (environ.get('HTTP_HOST') or environ.get('SERVER_NAME') or '').split(':', 1)[0].lower()
+        suffix = '.' + self.base_domain
+        if self.base_domain and host.endswith(suffix):
+            return host[:-len(suffix)]
+        return None
+
+    def _from_prefix(self, environ):
+        path = environ.get('PATH_INFO') or '/'
+        slug, _, rest = path.lstrip('/').partition('/')
+        if slug not in self.registry:
+            return None
+        environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '').rstrip('/') + '/' + slug
+        environ['PATH_INFO'] = '/' + rest
+        return slug
+
+    def __call__(self, environ, start_response):
+        slug = self._from_host(environ) if self.routing == 'subdomain' else self._from_prefix(environ)
+        if slug not in self.registry:
+            return NotFound('Club inconnu.')(environ, start_response)
+        environ[ENVIRON_KEY] = slug
+        return self.wsgi_app(environ, start_response)
+
+
+def current_tenant():
+    return request.environ.get(ENVIRON_KEY)
+
+
+class TenantSessionInterface(SecureCookieSessionInterface):
+    """Cookie de session limité au préfixe du club, pour qu'une connexion par club coexiste."""
+
+    def get_cookie_path(self, app):
+        return app.config['SESSION_COOKIE_PATH'] or request.script_root or '/'
@@ -0,0 +1,218 @@
+"""Probabilité de victoire des parties en cours, estimée par simulation (Monte Carlo).
+
+Les manches restantes sont tirées au hasard parmi les scores de manche déjà joués au
+club (``score_team_a``/``score_team_b``, manches archivées comprises), jusqu'à ce qu'une
+équipe atteigne l'objectif, comme dans ``db.games.recompute_totals_and_update_game``. Toutes
+les simulations avancent ensemble avec NumPy : tirage d'un bloc de manches par simulation,
+sommes cumulées, puis première manche où une équipe atteint l'objectif. Quand les deux équipes de la
+partie ont assez de manches derrière elles, le tirage se fait dans l'historique de ces
+deux duos plutôt que dans celui de tout le club.
+
+Les scores de manche du club sont chargés une fois par version des données
+(``app_meta.data_version``) et par club ; une estimation est gardée en mémoire pour un
+couple (partie, ``games.version``), qui change à chaque écriture de la partie ou de ses manches
+(``updated_at``, à la seconde près, ne distingue pas deux écritures rapprochées). Le tirage est
+initialisé à partir de ce couple : deux
+processus donnent le même résultat pour la même partie.
+"""
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from contextlib import closing, nullcontext
+
+import numpy as np
+
+# Borne du nombre de manches simulées par partie (scores de manche tous nuls, objectif énorme...)
+MAX_HANDS = 500
+# Manches tirées par simulation au premier bloc, puis doublées pour les simulations non finies
+_FIRST_BLOCK = 8
+
+
+class HandSamples:
+    """Per-hand (score A, score B) pairs of the club, seen from both sides, and per duo."""
+
+    def __init__(self):
+        self.club = []
+        # (user_id, user_id) -> [(points of the duo, points of its opponents)]
+        self.duos = defaultdict(list)
+
+    def add(self, score_a, score_b, duo_a, duo_b):
+        self.club.append((score_a, score_b))
+        self.club.append((score_b, score_a))
+        self.duos[duo_a].append((score_a, score_b))
+        self.duos[duo_b].append((score_b, score_a))
+
+    def for_game(self, duo_a, duo_b, min_samples):
+        """Samples oriented as (team A, team B) for this matchup, and whether they are duo-specific."""
+        own_a = self.duos.get(duo_a, ())
+        own_b = self.duos.get(duo_b, ())
+        if min_samples > 0 and len(own_a) >= min_samples and len(own_b) >= min_samples:
+            return list(own_a) + [(theirs, ours) for ours, theirs in own_b], True
+        return self.club, False
+
+
+def _duo(user_ids):
+    return tuple(sorted(user_ids))
+
+
+def load_hand_samples(db) -> HandSamples:
+    """Hand scores of the club, archived hands included."""
+    from db.archive import attached_archive, has_archive
+
+    samples = HandSamples()
+    archived = has_archive(db)
+    tables = ('main.hands', 'archive.hands') if archived else ('main.hands',)
+    hands = ' UNION ALL '.join(f"SELECT game_id, score_team_a, score_team_b FROM {table}" for table in tables)
+    with attached_archive(db) if archived else nullcontext():
+        with closing(db.cursor()) as cur:
+            cur.execute(
+                f"""
+                WITH teams AS (
+                    SELECT game_id, team, MIN(user_id) AS u1, MAX(user_id) AS u2
+                    FROM main.game_players
+                    GROUP BY game_id, team
+                )
+                SELECT h.score_team_a, h.score_team_b, a.u1, a.u2, b.u1, b.u2
+                FROM ({hands}) h
+                JOIN teams a ON a.game_id = h.game_id AND a.team = 'A'
+                JOIN teams b ON b.game_id = h.game_id AND b.team = 'B'
+                """
+            )
+            for score_a, score_b, a1, a2, b1, b2 in cur.fetchall():
+                samples.add(score_a, score_b, (a1, a2), (b1, b2))
+    return samples
+
+
+def simulate(samples, score_a: int, score_b: int, target: int, simulations: int, rng: np.random.Generator) -> dict:
+    """Play `simulations` endings of a game from (score_a, score_b) with hands drawn from samples.
+
+    Hands are drawn as a (simulations, hands) index array; the cumulative sums along each row
+    give the first hand where a team reaches the target. Unfinished simulations draw another,
+    twice larger block. Returns {'a', 'b', 'draw'} as percentages; games still unfinished
+    after MAX_HANDS count as draws.
+    """
+    deltas = np.asarray(samples, dtype=np.int64)
+    deltas_a, deltas_b = deltas[:, 0], deltas[:, 1]
+    totals_a = np.full(simulations, score_a, dtype=np.int64)
+    totals_b = np.full(simulations, score_b, dtype=np.int64)
+    wins_a = wins_b = 0
+    played = 0
+    block = _FIRST_BLOCK
+    while len(totals_a) and played < MAX_HANDS:
+        block = min(block, MAX_HANDS - played)
+        picks = rng.integers(len(deltas), size=(len(totals_a), block))
+        running_a = totals_a[:, None] + np.cumsum(deltas_a[picks], axis=1)
+        running_b = totals_b[:, None] + np.cumsum(deltas_b[picks], axis=1)
+        reached = (running_a >= target) | (running_b >= target)
+        first = reached.argmax(axis=1)
+        rows = np.arange(len(totals_a))
+        finished = reached[rows, first]
+        final_a, final_b = running_a[rows, first], running_b[rows, first]
+        wins_a += int(np.count_nonzero(finished & (final_a > final_b)))
+        wins_b += int(np.count_nonzero(finished & (final_b > final_a)))
+        totals_a, totals_b = running_a[~finished, -1], running_b[~finished, -1]
+        played += block
+        block *= 2
+    draw = simulations - wins_a - wins_b
+    return {
+        'a': round(wins_a / simulations * 100, 1),
+        'b': round(wins_b / simulations * 100, 1),
+        'draw': round(draw / simulations * 100, 1),
+    }
+
+
+def _seed(game_id, version) -> int:
+    return zlib.crc32(f"{game_id}:{version}".encode())
+
+
+def _load_duos(db, game_id):
+    teams = {'A': [], 'B': []}
+    with closing(db.cursor()) as cur:
+        cur.execute("SELECT team, user_id FROM game_players WHERE game_id = ?", (game_id,))
+        for team, user_id in cur.fetchall():
+            teams.setdefault(team, []).append(user_id)
+    return _duo(teams['A']), _duo(teams['B'])
+
+
+class WinProbabilityCache:
+    """Estimates per (club, game, version), plus the club's hand samples per data_version."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._samples = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.simulated_ms = 0.0
+
+    def samples(self, db, data_version) -> HandSamples:
+        scope = getattr(db, 'tenant', None)
+        with self._lock:
+            entry = self._samples.get(scope)
+            if entry is not None and entry[0] == data_version:
+                return entry[1]
+        samples = load_hand_samples(db)
+        with self._lock:
+            self._samples[scope] = (data_version, samples)
+        return samples
+
+    def get(self, db, game: dict, data_version, simulations: int = 5000, min_samples: int = 30):
+        """Estimate for an ongoing game dict (id, version, score_a, score_b, target_points), or None."""
+        key = (getattr(db, 'tenant', None), game['id'], game['version'])
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        duo_a, duo_b = _load_duos(db, game['id'])
+        samples, conditioned = self.samples(db, data_version).for_game(duo_a, duo_b, min_samples)
+        estimate = None
+        if samples and simulations > 0:
+            started = time.perf_counter()
+            rng = np.random.default_rng(_seed(game['id'], game['version']))
+            estimate = simulate(samples, game['score_a'], game['score_b'], game['target_points'], simulations, rng)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            estimate.update({'simulations': simulations, 'conditioned': conditioned, 'elapsed_ms': round(elapsed_ms, 2)})
+        with self._lock:
+            if estimate is not None:
+                self.simulated_ms += elapsed_ms
+            self._entries[key] = estimate
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return estimate
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._samples.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'simulated_ms': round(self.simulated_ms, 2),
+            }
+
+
+win_probability_cache = WinProbabilityCache()
+
+
+def benchmark(samples, simulations: int, repeat: int = 5, target: int = 1000) -> dict:
+    """Time simulate() from 0-0 to `target`. Returns {'best_ms', 'mean_ms', 'games_per_s'}."""
+    timings = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        simulate(samples, 0, 0, target, simulations, np.random.default_rng(i))
+        timings.append((time.perf_counter() - started) * 1000)
+    best = min(timings)
+    return {
+        'best_ms': round(best, 2),
+        'mean_ms': round(sum(timings) / len(timings), 2),
+        'games_per_s': round(simulations / best * 1000) if best else 0,
+    }
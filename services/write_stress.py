@@ -0,0 +1,187 @@
+"""Test de charge des écritures concurrentes (commande ``flask stress-writes``).
+
+Des dizaines de threads, chacun avec sa propre connexion, écrivent en même temps dans
+une base SQLite jetable comme le feraient plusieurs tables de jeu et un administrateur :
+ajout de manches et recalcul des totaux, changement d'objectif, activation de comptes.
+À la fin, le nombre de manches enregistrées doit être égal au nombre d'ajouts réussis,
+chaque partie doit avoir ses manches numérotées 1..n sans doublon, et les agrégats
+mensuels doivent correspondre à un recalcul complet.
+
+``compare_write_modes`` rejoue le même scénario en écriture directe puis avec l'écrivain
+unique à commits groupés (db/group_commit.py) pour comparer débit et latence.
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing
+
+from db import games as games_repo
+from db import hands as hands_repo
+from db import users as users_repo
+from db.rollups import rebuild_monthly_rollups
+from db.schema import migrate
+from db.group_commit import group_commit
+from db.transactions import DatabaseBusy, configure_connection, write_policy
+
+
+def _connect(path):
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute('PRAGMA foreign_keys = ON')
+    configure_connection(db)
+    return db
+
+
+def _seed(path, tables: int):
+    db = _connect(path)
+    try:
+        migrate(db)
+        now = '2025-01-01T00:00:00'
+        users = [
+            users_repo.create_user_with_admin(db, f'stress{i}', 'x', now, i == 0)
+            for i in range(max(4, tables * 2))
+        ]
+        games = []
+        for table in range(tables):
+            players = [users[(table * 2 + k) % len(users)] for k in range(4)]
+            if len(set(players)) < 4:
+                players = random.Random(table).sample(users, 4)
+            games.append((games_repo.create_game(db, users[0], 100000, players, now), players))
+        return users, games
+    finally:
+        db.close()
+
+
+def _rollups_snapshot(db):
+    with closing(db.cursor()) as cur:
+        cur.execute("SELECT dimension, month, bucket, n, successes, points FROM monthly_rollups ORDER BY 1, 2, 3")
+        return cur.fetchall()
+
+
+def _percentile(values, pct):
+    """pct-th percentile of sorted values (nearest rank)."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))]
+
+
+def random_hand(rng, players) -> dict:
+    """A hand as services.hand_entry.build_hand returns it, with random scores."""
+    points_a = rng.randint(0, 162)
+    return {
+        'taker_user_id': rng.choice(players), 'contract': str(rng.choice(range(80, 170, 10))), 'trump': 'Coeur',
+        'score_a': points_a, 'score_b': 162 - points_a, 'pre_a': points_a, 'pre_b': 162 - points_a,
+        'coinche': 0, 'surcoinche': 0, 'capot_team': None, 'belote_a': 0, 'belote_b': 0, 'general': 0,
+    }
+
+
+def run_write_stress(threads: int = 32, writes: int = 20, tables: int = 8, path: str = None) -> dict:
+    """Run `threads` writers doing `writes` operations each; returns counters and checks."""
+    owns_path = path is None
+    if owns_path:
+        fd, path = tempfile.mkstemp(suffix='.db', prefix='stress-')
+        os.close(fd)
+        os.unlink(path)
+    users, games = _seed(path, tables)
+    write_policy.reset()
+    counters = {'hands': 0, 'admin': 0, 'busy': 0, 'errors': 0}
+    errors = []
+    latencies = []
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def writer(index):
+        rng = random.Random(index)
+        db = _connect(path)
+        try:
+            start.wait()
+            for _ in range(writes):
+                game_id, players = games[rng.randrange(len(games))]
+                now = time.strftime('%Y-%m-%dT%H:%M:%S')
+                op_started = time.perf_counter()
+                try:
+                    if rng.random() < 0.9:
+                        hands_repo.add_hand(db, game_id, 100000, random_hand(rng, players), now)
+                        key = 'hands'
+                    elif rng.random() < 0.5:
+                        games_repo.update_target_points(db, game_id, 100000 + rng.randint(0, 10), now)
+                        key = 'admin'
+                    else:
+                        users_repo.toggle_user_status(db, rng.choice(users[1:]))
+                        key = 'admin'
+                except DatabaseBusy:
+                    key = 'busy'
+                except Exception as exc:
+                    key = 'errors'
+                    errors.append(repr(exc))
+                with lock:
+                    latencies.append((time.perf_counter() - op_started) * 1000)
+                    if key is not None:
+                        counters[key] += 1
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    db = _connect(path)
+    try:
+        with closing(db.cursor()) as cur:
+            cur.execute("SELECT COUNT(*) FROM hands")
+            stored_hands = cur.fetchone()[0]
+            cur.execute(
+                "SELECT COUNT(*) FROM (SELECT game_id FROM hands GROUP BY game_id HAVING COUNT(DISTINCT number) != COUNT(*) OR MAX(number) != COUNT(*))"
+            )
+            misnumbered_games = cur.fetchone()[0]
+        before = _rollups_snapshot(db)
+        rebuild_monthly_rollups(db)
+        rollups_consistent = before == _rollups_snapshot(db)
+    finally:
+        db.close()
+        if owns_path:
+            for suffix in ('', '-wal', '-shm', '-journal'):
+                if os.path.exists(path + suffix):
+                    os.unlink(path + suffix)
+
+    total = threads * writes
+    latencies.sort()
+    return {
+        'threads': threads,
+        'operations': total,
+        'elapsed_s': round(elapsed, 2),
+        'ops_per_s': round(total / elapsed, 1) if elapsed else 0,
+        'latency_ms': {
+            'p50': round(_percentile(latencies, 50), 2),
+            'p95': round(_percentile(latencies, 95), 2),
+            'max': round(latencies[-1], 2) if latencies else 0,
+        },
+        'counters': counters,
+        'stored_hands': stored_hands,
+        'hands_consistent': stored_hands == counters['hands'],
+        'numbers_consistent': misnumbered_games == 0,
+        'rollups_consistent': rollups_consistent,
+        'errors': errors[:5],
+        'writes': write_policy.stats(),
+    }
+
+
+def compare_write_modes(threads: int = 32, writes: int = 20, tables: int = 8,
+                        window_ms: float = 5.0, max_batch: int = 64) -> dict:
+    """Run the same stress test with direct writes then with group commit: {'direct', 'group_commit'}."""
+    previous = (group_commit.enabled, group_commit.window_ms, group_commit.max_batch)
+    try:
+        group_commit.configure(False)
+        direct = run_write_stress(threads, writes, tables)
+        group_commit.configure(True, window_ms, max_batch)
+        grouped = run_write_stress(threads, writes, tables)
+        grouped['batches'] = group_commit.stats()['databases']
+    finally:
+        group_commit.configure(*previous)
+    return {'direct': direct, 'group_commit': grouped}
@@ -1,51 +1,190 @@
 (function () {
-        const dataEl = document.getElementById('hands-data');
-        if (!dataEl) return;
-        let rows = [];
-        try { rows = JSON.parse(dataEl.textContent || '[]'); } catch (e) { rows = []; }
-        if (!rows.length) return;
-        const labels = rows.map(h => h[1]);
-        const ptsA = rows.map(h => h[6]);
-        const ptsB = rows.map(h => h[7]);
-        const cumA = [], cumB = [];
-        let sa = 0, sb = 0;
-        for (let i = 0; i < labels.length; i++) {
-          sa += Number(ptsA[i] || 0);
-          sb += Number(ptsB[i] || 0);
-          cumA.push(sa);
-          cumB.push(sb);
-        }
         const ctx = document.getElementById('scoreProgress');
-        if (!ctx) return;
-        new Chart(ctx, {
-          type: 'line',
-          data: {
-            labels: labels.map(n => 'Manche ' + n),
-            datasets: [
-              {
-                label: 'Équipe A',
-                data: cumA,
-                borderColor: 'rgb(13, 110, 253)',
-                backgroundColor: 'rgba(13, 110, 253, 0.2)',
-                tension: 0.2
+        if (!ctx || !ctx.dataset.seriesUrl) return;
+        // Cumulative totals are computed server-side: {hands: [...], a: [...], b: [...]}
+        fetch(ctx.dataset.seriesUrl, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+          .then(r => (r.ok ? r.json() : null))
+          .then(series => {
+            if (!series || !series.hands || !series.hands.length) return;
+            new Chart(ctx, {
+              type: 'line',
+              data: {
+                labels: series.hands.map(n => 'Manche ' + n),
+                datasets: [
+                  {
+                    label: 'Équipe A',
+                    data: series.a,
+                    borderColor: 'rgb(13, 110, 253)',
+                    backgroundColor: 'rgba(13, 110, 253, 0.2)',
+                    tension: 0.2
+                  },
+                  {
+                    label: 'Équipe B',
+                    data: series.b,
+                    borderColor: 'rgb(220, 53, 69)',
+                    backgroundColor: 'rgba(220, 53, 69, 0.2)',
+                    tension: 0.2
+                  }
+                ]
               },
-              {
-                label: 'Équipe B',
-                data: cumB,
-                borderColor: 'rgb(220, 53, 69)',
-                backgroundColor: 'rgba(220, 53, 69, 0.2)',
-                tension: 0.2
+              options: {
+                responsive: true,
+                interaction: { mode: 'index', intersect: false },
+                plugins: { legend: { position: 'top' } },
+                scales: {
+                  y: { beginAtZero: true, title: { display: true, text: 'Points cumulés' } },
+                  x: { title: { display: true, text: 'Manche' } }
+                }
               }
-            ]
-          },
-          options: {
-            responsive: true,
-            interaction: { mode: 'index', intersect: false },
-            plugins: { legend: { position: 'top' } },
-            scales: {
-              y: { beginAtZero: true, title: { display: true, text: 'Points cumulés' } },
-              x: { title: { display: true, text: 'Manche' } }
+            });
+          })
+          .catch(() => {});
+      })();
+
+(function () {
+        // Offline-first hand entry: every hand goes through a queue kept in localStorage, with
+        // a client-generated key, and is sent in batches to /games/<id>/hands.json. Resending
+        // a batch never records a hand twice; the queue is flushed on load and when back online.
+        const form = document.getElementById('handForm');
+        if (!form || !form.dataset.queueUrl || !window.fetch || !window.localStorage) return;
+        const url = form.dataset.queueUrl;
+        const batchMax = parseInt(form.dataset.batchMax || '50', 10) || 50;
+        const storageKey = 'hands-queue:' + url;
+        const status = document.getElementById('handQueueStatus');
+        const RETRY_MS = 15000;
+        let flushing = false;
+        let retryTimer = null;
+        // Outcome of the batches sent since the queue was last emptied
+        let created = 0;
+        let errors = [];
+
+        function load() {
+          try {
+            return JSON.parse(localStorage.getItem(storageKey)) || [];
+          } catch (e) {
+            return [];
+          }
+        }
+
+        function save(queue) {
+          if (queue.length) localStorage.setItem(storageKey, JSON.stringify(queue));
+          else localStorage.removeItem(storageKey);
+        }
+
+        function show(message) {
+          if (!status) return;
+          status.textContent = message || '';
+          status.hidden = !message;
+        }
+
+        function showPending(queue) {
+          if (!queue.length) return show('');
+          const label = queue.length === 1 ? '1 manche en attente' : queue.length + ' manches en attente';
+          show(label + (navigator.onLine ? ' : envoi en cours…' : ' : hors ligne, envoi au retour du réseau.'));
+        }
+
+        function newKey() {
+          if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+          return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 12);
+        }
+
+        function snapshot() {
+          const hand = { key: newKey() };
+          new FormData(form).forEach((value, name) => { hand[name] = value; });
+          return hand;
+        }
+
+        function scheduleRetry() {
+          if (retryTimer) return;
+          retryTimer = setTimeout(() => { retryTimer = null; flush(); }, RETRY_MS);
+        }
+
+        function settle(results) {
+          // Drop only the hands the server recorded (created, or already recorded by an earlier
+          // send) or rejected as invalid; the others stay queued. Returns the number dropped.
+          const done = new Set();
+          Object.entries(results || {}).forEach(([key, result]) => {
+            if (result.status === 'created' || result.status === 'duplicate') {
+              if (result.status === 'created') created += 1;
+              done.add(key);
+            } else if (result.status === 'invalid') {
+              errors.push(result.error);
+              done.add(key);
+            } else if (result.status === 'finished') {
+              errors.push("Partie terminée : manche gardée en attente (modifiez l'objectif pour l'enregistrer).");
             }
+          });
+          save(load().filter(hand => !done.has(hand.key)));
+          return done.size;
+        }
+
+        function describe(hand) {
+          const contract = [hand.contract, hand.trump].filter(Boolean).join(' ') || 'Manche';
+          return contract + ' (' + (hand.score_team_a || 0) + '-' + (hand.score_team_b || 0) + ')';
+        }
+
+        function report() {
+          const done = created;
+          const messages = errors;
+          const waiting = load();
+          created = 0;
+          errors = [];
+          if (done && !messages.length && !waiting.length) return window.location.reload();
+          if (waiting.length) {
+            const label = waiting.length === 1 ? '1 manche toujours en attente' : waiting.length + ' manches toujours en attente';
+            messages.push(label + ' : ' + waiting.map(describe).join(', ') + '.');
           }
+          if (done) messages.push('Actualisez la page pour voir les manches enregistrées.');
+          show(messages.join(' '));
+        }
+
+        function flush() {
+          const queue = load();
+          if (flushing || !queue.length) return showPending(queue);
+          if (!navigator.onLine) return showPending(queue);
+          flushing = true;
+          showPending(queue);
+          const batch = queue.slice(0, batchMax);
+          fetch(url, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: { 'Content-Type': 'application/json', 'Accept': 'application/json' },
+            body: JSON.stringify({ hands: batch })
+          })
+            .then(r => r.json().catch(() => ({})).then(body => ({ status: r.status, body })))
+            .then(({ status: code, body }) => {
+              flushing = false;
+              if (code === 401 || code >= 500) {
+                // Not logged in anymore or server busy: keep the queue and try again later
+                show((body && body.error) || 'Envoi impossible pour le moment, nouvel essai bientôt.');
+                return scheduleRetry();
+              }
+              if (code !== 200) {
+                // Batch refused as a whole (403, 409, 413...): nothing was recorded, keep it queued
+                errors.push((body && body.error) || 'Manches refusées.');
+                return report();
+              }
+              // Send the next batch only if this one made progress (refused hands stay queued)
+              if (settle(body.results) && load().length) return flush();
+              report();
+            })
+            .catch(() => {
+              flushing = false;
+              showPending(load());
+              scheduleRetry();
+            });
+        }
+
+        form.addEventListener('submit', event => {
+          event.preventDefault();
+          const queue = load();
+          queue.push(snapshot());
+          save(queue);
+          form.reset();
+          form.dispatchEvent(new Event('change'));
+          flush();
         });
-      })();
\ No newline at end of file
+        window.addEventListener('online', flush);
+        window.addEventListener('offline', () => showPending(load()));
+        flush();
+      })();
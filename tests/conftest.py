@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from db import games as games_repo, hands as hands_repo, users as users_repo  # noqa: E402
+from db.core import get_db  # noqa: E402
+from services.fragment_cache import fragment_store  # noqa: E402
+from services.win_probability import win_probability_cache  # noqa: E402
+
+NOW = '2025-03-01T20:00:00'
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE', str(tmp_path / 'coinche.db'))
+    monkeypatch.setenv('EMAIL_OUTBOX_WORKER', 'false')
+    fragment_store.clear()
+    win_probability_cache.clear()
+    app = create_app()
+    app.config['TESTING'] = True
+    yield app
+    fragment_store.clear()
+    win_probability_cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def game(app):
+    """An ongoing game with one hand: {'id', 'players', 'hand_id'}."""
+    with app.app_context():
+        db = get_db(app)
+        password = generate_password_hash('password1', method='pbkdf2:sha256:1000')
+        players = [
+            users_repo.create_user_with_admin(db, f'joueur{i}', password, NOW, i == 0)
+            for i in range(4)
+        ]
+        game_id = games_repo.create_game(db, players[0], 1000, players, NOW)
+        hands_repo.insert_hand(db, game_id, 1, players[0], '80', 'Pique', 180, 0, 100, 62, 0, 0, None, 0, 0, 0, NOW)
+        games_repo.recompute_totals_and_update_game(db, game_id, 1000, NOW)
+        hand_id = hands_repo.list_hands(db, game_id)[0][0]
+        db.close()
+    return {'id': game_id, 'players': players, 'hand_id': hand_id}
+
+
+def edit_hand_same_second(app, game):
+    """Change the game's only hand without moving games.updated_at (same second)."""
+    with app.app_context():
+        db = get_db(app)
+        hands_repo.update_hand(db, game['hand_id'], game['players'][0], '120', 'Coeur', 190, 50, 110, 52, 0, 0, None, 0, 0, 0)
+        games_repo.recompute_totals_and_update_game(db, game['id'], 1000, NOW)
+        db.close()
@@ -0,0 +1,12 @@
+from conftest import edit_hand_same_second
+
+
+def test_game_hands_fragment_follows_write_in_same_second(app, client, game):
+    url = f"/games/{game['id']}"
+    assert '<td>80</td>' in client.get(url).get_data(as_text=True)
+
+    edit_hand_same_second(app, game)
+    page = client.get(url).get_data(as_text=True)
+
+    assert '<td>120</td>' in page
+    assert '<td>80</td>' not in page
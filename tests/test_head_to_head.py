@@ -0,0 +1,29 @@
+import json
+
+from conftest import NOW
+from db import games as games_repo
+from db.core import get_db
+from services.head_to_head import compute_head_to_head, heatmap, player_view
+from services.statistics import get_player_vs_player_statistics
+
+
+def _sorted(rows):
+    return sorted(sorted(row.items()) for row in rows)
+
+
+def test_matrix_matches_player_statistics(app, game):
+    with app.app_context():
+        db = get_db(app)
+        games_repo.update_target_points(db, game['id'], 150, NOW)
+        matrix = compute_head_to_head(db)
+        for user_id in game['players']:
+            expected = get_player_vs_player_statistics(db, user_id)
+            view = player_view(matrix, user_id)
+            assert _sorted(view['opponents']) == _sorted(expected['opponents'])
+            assert _sorted(view['partners']) == _sorted(expected['partners'])
+            json.dumps(view)
+        grid = heatmap(matrix)
+        db.close()
+
+    assert len(grid['players']) == 4
+    json.dumps(grid)
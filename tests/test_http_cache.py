@@ -0,0 +1,103 @@
+from unittest import mock
+
+import pytest
+
+from db import hands as hands_repo
+from services import statistics
+
+from conftest import edit_hand_same_second
+
+STATISTICS_FUNCTIONS = (
+    'get_global_statistics',
+    'get_player_statistics',
+    'get_contract_statistics',
+    'get_trump_statistics',
+    'get_special_events_statistics',
+    'get_player_taking_statistics',
+    'get_score_distribution',
+    'get_team_performance',
+)
+
+
+def _revalidate(client, url, etag):
+    return client.get(url, headers={'If-None-Match': f'"{etag}"'})
+
+
+def test_statistics_304_skips_statistics_queries(client, game, monkeypatch):
+    first = client.get('/statistiques')
+    assert first.status_code == 200
+    mocks = {}
+    for name in STATISTICS_FUNCTIONS:
+        mocks[name] = mock.Mock(side_effect=AssertionError(name))
+        monkeypatch.setattr(statistics, name, mocks[name])
+
+    response = _revalidate(client, '/statistiques', first.get_etag()[0])
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert all(m.call_count == 0 for m in mocks.values())
+
+
+@pytest.mark.parametrize('url, function', [
+    ('/games/{id}', 'list_hands'),
+    ('/games/{id}/scores.json', 'cumulative_scores'),
+])
+def test_game_304_skips_hand_queries(client, game, monkeypatch, url, function):
+    url = url.format(id=game['id'])
+    first = client.get(url)
+    assert first.status_code == 200
+    spy = mock.Mock(side_effect=AssertionError(function))
+    monkeypatch.setattr(hands_repo, function, spy)
+
+    response = _revalidate(client, url, first.get_etag()[0])
+
+    assert response.status_code == 304
+    assert spy.call_count == 0
+
+
+@pytest.mark.parametrize('url', ['/games/{id}', '/games/{id}/scores.json'])
+def test_game_etag_changes_after_write_in_same_second(app, client, game, url):
+    url = url.format(id=game['id'])
+    first = client.get(url)
+    etag = first.get_etag()[0]
+
+    edit_hand_same_second(app, game)
+    response = _revalidate(client, url, etag)
+
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
+
+
+@pytest.mark.parametrize('url', ['/', '/games', '/statistiques', '/games/{id}', '/games/{id}/scores.json'])
+def test_if_modified_since_alone_never_validates(app, client, game, url):
+    url = url.format(id=game['id'])
+    first = client.get(url)
+    assert first.last_modified is None
+
+    # Second write within the same second, then a client revalidating by date only
+    edit_hand_same_second(app, game)
+    response = client.get(url, headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+
+    assert response.status_code == 200
+    assert response.get_etag()[0] != first.get_etag()[0]
+
+
+def test_scores_json_reflects_write_in_same_second(app, client, game):
+    url = f"/games/{game['id']}/scores.json"
+    assert client.get(url).get_json()['a'] == [180]
+
+    edit_hand_same_second(app, game)
+
+    assert client.get(url).get_json() == {'hands': [1], 'a': [190], 'b': [50]}
+
+
+def test_chart_url_follows_the_rendered_table(app, client, game):
+    url = f"/games/{game['id']}"
+    before = client.get(url).get_data(as_text=True)
+
+    edit_hand_same_second(app, game)
+    after = client.get(url).get_data(as_text=True)
+
+    series_url = after.split('data-series-url="', 1)[1].split('"', 1)[0]
+    assert series_url not in before
+    assert client.get(series_url).get_json()['a'] == [190]
@@ -0,0 +1,41 @@
+from contextlib import closing
+
+from conftest import NOW, edit_hand_same_second
+from db import games as games_repo
+from db.core import get_db
+from db.projections import status, verify_duo_notes
+from services.duo_ranking import fetch_duo_game_notes
+
+
+def _duo_rows(db, game_id):
+    with closing(db.cursor()) as cur:
+        cur.execute(
+            "SELECT team, team_points, total_points, finished FROM projection_duo_notes WHERE game_id = ? ORDER BY team",
+            (game_id,),
+        )
+        return cur.fetchall()
+
+
+def test_duo_notes_follow_writes_without_catch_up(app, game):
+    with app.app_context():
+        db = get_db(app)
+        assert _duo_rows(db, game['id']) == [('A', 180, 180, 0), ('B', 0, 180, 0)]
+        assert fetch_duo_game_notes(db) == []
+
+        games_repo.update_target_points(db, game['id'], 150, NOW)
+        assert [entry.notes for entry in fetch_duo_game_notes(db)] == [[(NOW, 2.0)], [(NOW, 0.0)]]
+        db.close()
+
+    # Same-second edit, recomputed against the old target of 1000: the game is ongoing again
+    edit_hand_same_second(app, game)
+    with app.app_context():
+        db = get_db(app)
+        assert _duo_rows(db, game['id']) == [('A', 190, 240, 0), ('B', 50, 240, 0)]
+        assert fetch_duo_game_notes(db) == []
+        assert verify_duo_notes(db) == []
+        assert all(p['lag'] == 0 for p in status(db)['projections'].values())
+
+        assert games_repo.delete_game(db, game['id'])
+        assert _duo_rows(db, game['id']) == []
+        assert verify_duo_notes(db) == []
+        db.close()
@@ -0,0 +1,12 @@
+from services.startup import LAZY_MODULES, measure_cold_start
+
+
+def test_cold_start_within_budget(app, tmp_path, monkeypatch):
+    # Fresh interpreter: import app.py and run create_app against an empty temporary database
+    monkeypatch.setenv('DATABASE', str(tmp_path / 'startup.db'))
+    report = measure_cold_start(app.root_path)
+
+    assert report['total_ms'] <= app.config['STARTUP_BUDGET_MS']
+    assert [name for name, _ms in report['phases']][-1] == 'routes'
+    startup_modules = {name for name, _self_ms, _cumulative_ms in report['modules']}
+    assert startup_modules.isdisjoint(LAZY_MODULES)
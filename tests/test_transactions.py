@@ -0,0 +1,76 @@
+import random
+import sqlite3
+import threading
+
+import pytest
+
+from conftest import NOW
+from db import games as games_repo, hands as hands_repo
+from db.core import get_db
+from db.transactions import DatabaseBusy, configure_connection, write_policy
+from services.write_stress import random_hand
+
+
+@pytest.fixture
+def fast_retries():
+    saved = (write_policy.busy_timeout_ms, write_policy.attempts, write_policy.backoff_ms, write_policy.max_backoff_ms)
+    write_policy.configure(busy_timeout_ms=0, attempts=2, backoff_ms=0)
+    write_policy.reset()
+    yield
+    write_policy.configure(*saved)
+    write_policy.reset()
+
+
+def test_delete_game_retries_while_database_is_locked(app, game, fast_retries):
+    # An open read transaction keeps the delete from committing (rollback journal)
+    reader = sqlite3.connect(app.config['DATABASE'], isolation_level=None)
+    reader.execute('BEGIN')
+    reader.execute('SELECT COUNT(*) FROM games').fetchone()
+    try:
+        with app.app_context():
+            db = get_db(app)
+            with pytest.raises(DatabaseBusy):
+                games_repo.delete_game(db, game['id'])
+            assert write_policy.stats()['operations']['games.delete_game']['retries'] == 1
+
+            reader.execute('ROLLBACK')
+            assert games_repo.delete_game(db, game['id']) is True
+            assert games_repo.load_game_basics(db, game['id']) is None
+            db.close()
+    finally:
+        reader.close()
+
+
+def test_concurrent_hand_additions_get_distinct_numbers(app, game):
+    threads, writes = 8, 5
+    start = threading.Barrier(threads)
+    errors = []
+
+    def writer(index):
+        rng = random.Random(index)
+        db = sqlite3.connect(app.config['DATABASE'], check_same_thread=False)
+        configure_connection(db)
+        try:
+            start.wait()
+            for _ in range(writes):
+                hands_repo.add_hand(db, game['id'], 100000, random_hand(rng, game['players']), NOW)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            db.close()
+
+    workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert errors == []
+    with app.app_context():
+        db = get_db(app)
+        numbers = [row[1] for row in hands_repo.list_hands(db, game['id'])]
+        points_a, points_b = db.execute("SELECT points_team_a, points_team_b FROM games WHERE id = ?", (game['id'],)).fetchone()
+        scores = db.execute("SELECT SUM(score_team_a), SUM(score_team_b) FROM hands WHERE game_id = ?", (game['id'],)).fetchone()
+        db.close()
+    assert sorted(numbers) == list(range(1, threads * writes + 2))
+    assert (points_a, points_b) == scores
@@ -0,0 +1,42 @@
+import numpy as np
+
+from conftest import NOW, edit_hand_same_second
+from db import games as games_repo
+from db.archive import archive_games
+from db.core import get_db
+from services.win_probability import load_hand_samples, simulate, win_probability_cache
+
+
+def _misses():
+    return win_probability_cache.stats()['misses']
+
+
+def test_estimate_recomputed_after_write_in_same_second(app, client, game):
+    url = f"/games/{game['id']}"
+    start = _misses()
+    client.get(url)
+    client.get(url)
+    assert _misses() == start + 1
+
+    edit_hand_same_second(app, game)
+    client.get(url)
+
+    assert _misses() == start + 2
+
+
+def test_hand_samples_include_archived_hands(app, game):
+    with app.app_context():
+        db = get_db(app)
+        games_repo.update_target_points(db, game['id'], 150, NOW)
+        assert len(load_hand_samples(db).club) == 2
+
+        assert archive_games(db, '2100-01-01T00:00:00', NOW)['hands'] == 1
+        assert load_hand_samples(db).club == [(180, 0), (0, 180)]
+        db.close()
+
+
+def test_simulation_is_reproducible():
+    samples = [(160, 0), (0, 160), (90, 72), (72, 90)]
+    first = simulate(samples, 500, 400, 1000, 2000, np.random.default_rng(7))
+    assert first == simulate(samples, 500, 400, 1000, 2000, np.random.default_rng(7))
+    assert first['a'] > first['b'] and first['a'] + first['b'] + first['draw'] == 100.0